@@ -0,0 +1,130 @@
+"""
+Cooperative cancellation of the installation for GhostBSD Install Station.
+
+The installation runs on a worker thread. A CancelToken is shared between
+that thread and the interface: the worker marks each phase it enters and
+checks the token between phases, the interface cancels the token with the
+Cancel button of the progress page or when the window is closed. Commands run by CommandRunner with the token are started
+in their own process group, and cancelling kills the whole group, so
+nothing pc-sysinstall started is left running.
+"""
+import os
+import signal
+from threading import Event, Lock, Timer
+from install_station.commands import CommandRunner
+
+
+class InstallCancelled(Exception):
+    """The installation was cancelled during a phase."""
+
+    def __init__(self, phase: str | None):
+        self.phase = phase
+        super().__init__(f'Installation cancelled during {phase}')
+
+
+class CancelToken:
+    """
+    Cancellation state of an installation and the commands it runs.
+
+    Attributes:
+        phase (str or None): Phase the installation is in
+        grace (float): Seconds between SIGTERM and SIGKILL of the commands
+    """
+    grace: float = 5.0
+
+    def __init__(self):
+        self.phase = None
+        self._event = Event()
+        self._lock = Lock()
+        self._processes = {}
+
+    @property
+    def cancelled(self) -> bool:
+        """bool: True once cancel() was called."""
+        return self._event.is_set()
+
+    def check(self) -> None:
+        """
+        Stop the installation if it was cancelled.
+
+        Raises:
+            InstallCancelled: With the current phase if cancel() was called
+        """
+        if self.cancelled:
+            raise InstallCancelled(self.phase)
+
+    def enter(self, phase: str) -> None:
+        """
+        Start a phase, unless the installation was cancelled before it.
+
+        Args:
+            phase: Phase name reported if the installation is cancelled
+
+        Raises:
+            InstallCancelled: With the previous phase if cancel() was called
+        """
+        self.check()
+        self.phase = phase
+
+    def cancel(self) -> None:
+        """Cancel the installation and terminate the commands it runs."""
+        self._event.set()
+        with self._lock:
+            processes = list(self._processes.values())
+        for process, privileged in processes:
+            self._signal(process, privileged, signal.SIGTERM)
+        if processes:
+            timer = Timer(self.grace, self._kill_remaining, args=(processes,))
+            timer.daemon = True
+            timer.start()
+
+    def track(self, process, privileged: bool) -> None:
+        """
+        Terminate a command with the installation.
+
+        The command must lead its own process group. A command started
+        after cancel() is terminated right away.
+
+        Args:
+            process: Popen object of the command
+            privileged: Whether the command runs through sudo
+        """
+        with self._lock:
+            self._processes[process.pid] = (process, privileged)
+        if self.cancelled:
+            self._signal(process, privileged, signal.SIGTERM)
+
+    def untrack(self, process) -> None:
+        """
+        Forget a command that has exited.
+
+        Args:
+            process: Popen object given to track()
+        """
+        with self._lock:
+            self._processes.pop(process.pid, None)
+
+    def _kill_remaining(self, processes: list) -> None:
+        """Kill what is left of the process groups after the grace time."""
+        for process, privileged in processes:
+            self._signal(process, privileged, signal.SIGKILL)
+
+    @staticmethod
+    def _signal(process, privileged: bool, signum: int) -> None:
+        """
+        Send a signal to the process group of a command.
+
+        The group is signalled even if the command itself has exited, the
+        processes it started may still be running.
+        """
+        if privileged:
+            # The group holds processes of root, only root can signal them all.
+            CommandRunner.run(
+                ['pkill', f'-{signal.Signals(signum).name[3:]}', '-g', str(process.pid)],
+                privileged=True
+            )
+            return
+        try:
+            os.killpg(process.pid, signum)
+        except ProcessLookupError:
+            pass
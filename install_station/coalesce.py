@@ -0,0 +1,91 @@
+"""
+Coalescing of UI updates for GhostBSD Install Station.
+
+The installation output is read on a worker thread and can print tens of
+thousands of lines. Scheduling a GTK callback for each of them floods the
+main loop, so the reader posts its status to an UpdateCoalescer instead.
+Only the latest status is kept, and it is shown by a timer on the main
+loop at a fixed rate.
+"""
+from threading import Lock
+
+
+class UpdateCoalescer:
+    """
+    Keep the latest posted update and apply it at most once per interval.
+
+    post() can be called from any thread. flush() runs on the main loop,
+    from a timer such as GLib.timeout_add(coalescer.milliseconds,
+    coalescer.flush), and returns whether the timer should keep running.
+
+    Attributes:
+        apply (callable): Called on the main loop with the posted arguments
+        interval (float): Seconds between flushes
+        posted (int): Updates posted
+        delivered (int): Updates applied
+        dropped (int): Updates replaced by a newer one before being applied
+    """
+
+    def __init__(self, apply, interval=0.1):
+        self.apply = apply
+        self.interval = interval
+        self.posted = 0
+        self.delivered = 0
+        self.dropped = 0
+        self._pending = None
+        self._closed = False
+        self._lock = Lock()
+
+    @property
+    def milliseconds(self):
+        """int: Flush interval in milliseconds, for GLib.timeout_add()."""
+        return max(1, round(self.interval * 1000))
+
+    def post(self, *args):
+        """
+        Replace the pending update.
+
+        Args:
+            *args: Arguments for apply
+        """
+        with self._lock:
+            self.posted += 1
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = args
+
+    def flush(self):
+        """
+        Apply the pending update, if any.
+
+        Returns:
+            bool: False once the coalescer is closed, to stop the timer
+        """
+        with self._lock:
+            args = self._pending
+            self._pending = None
+            closed = self._closed
+            if args is not None:
+                self.delivered += 1
+        if args is not None:
+            self.apply(*args)
+        return not closed
+
+    def close(self):
+        """Stop the timer at its next flush, which still applies the last update."""
+        with self._lock:
+            self._closed = True
+
+    def stats(self):
+        """
+        Get the update counters.
+
+        Returns:
+            dict: posted, delivered and dropped counts
+        """
+        with self._lock:
+            return {
+                'posted': self.posted,
+                'delivered': self.delivered,
+                'dropped': self.dropped
+            }
@@ -0,0 +1,420 @@
+"""External command runner for GhostBSD Install Station.
+
+Every external program the installer calls goes through CommandRunner so
+commands can be timed, recorded and replayed.
+
+Modes:
+    live: Run the commands.
+    record: Run the commands and append each one with its output, exit
+        code and duration to a JSON lines fixture file.
+    replay: Do not run anything, serve the output of the commands from a
+        fixture file made in record mode.
+
+The mode is picked from the environment when the module is loaded:
+INSTALL_STATION_RECORD=<file> records to the file and
+INSTALL_STATION_REPLAY=<file> replays it. record_to() and replay_from()
+switch mode at runtime, which lets probing and configuration be run and
+timed away from FreeBSD hardware.
+
+stream() can run the command under a pseudo-terminal, so programs that
+buffer their output when it goes to a pipe print it line by line.
+
+While the privileged helper runs (see helper.py), privileged argument
+lists are sent to it instead of each being run through sudo.
+"""
+import codecs
+import errno
+import json
+import os
+import pty
+import re
+import selectors
+import shlex
+import signal
+from collections import deque
+from subprocess import Popen, PIPE, DEVNULL, STDOUT, TimeoutExpired
+from threading import Lock
+from time import monotonic
+from typing import NamedTuple
+
+
+class CommandResult(NamedTuple):
+    """Outcome of an external command."""
+    command: str
+    stdout: str
+    stderr: str
+    returncode: int
+    duration: float
+
+
+class CommandTimeout(TimeoutError):
+    """A command did not finish in time and was killed."""
+
+    def __init__(self, command: str, timeout: float):
+        self.command = command
+        self.timeout = timeout
+        super().__init__(f'{command} did not finish within {timeout:g} seconds')
+
+
+def command_line(command: list[str] | str, privileged: bool = False) -> str:
+    """Render a command as the shell line used to identify it.
+
+    Args:
+        command: Argument list, or a shell command line
+        privileged: Whether the command runs through sudo
+
+    Returns:
+        str: Command line, used as the key of recordings
+    """
+    if not isinstance(command, str):
+        command = shlex.join(command)
+    return f'sudo {command}' if privileged else command
+
+
+class CommandRunner:
+    """
+    Single entry point for external commands.
+
+    Commands are argument lists run without a shell. Plain strings are
+    still accepted for the few commands that need shell syntax. With
+    privileged=True the command runs through sudo, or in the privileged
+    helper while it runs.
+    """
+    mode: str = 'live'
+    """'live', 'record' or 'replay'."""
+    fixture: str | None = None
+    """JSON lines file written in record mode and read in replay mode."""
+    recordings: dict = {}
+    """Recorded results by command line, served in order in replay mode."""
+    log: list = []
+    """(command line, exit code, seconds) of every command since the last reset."""
+    helper = None
+    """PrivilegedHelper running the privileged argument lists, None to use sudo."""
+    _lock = Lock()
+
+    @classmethod
+    def reset_log(cls) -> None:
+        """Forget the logged commands."""
+        cls.log = []
+
+    @classmethod
+    def _log(cls, result: CommandResult) -> CommandResult:
+        """Log the exit code and duration of a command."""
+        cls.log.append((result.command, result.returncode, result.duration))
+        return result
+
+    @classmethod
+    def record_to(cls, fixture: str) -> None:
+        """
+        Run commands and record them to a fixture file.
+
+        Args:
+            fixture: JSON lines file to append the recordings to
+        """
+        cls.mode = 'record'
+        cls.fixture = fixture
+        cls.recordings = {}
+
+    @classmethod
+    def replay_from(cls, fixture: str) -> None:
+        """
+        Serve commands from a fixture file instead of running them.
+
+        A command recorded several times is answered with its recordings
+        in order, the last one is repeated once they are used up.
+
+        Args:
+            fixture: JSON lines file made in record mode
+        """
+        recordings = {}
+        with open(fixture) as fixture_file:
+            for line in fixture_file:
+                if line.strip():
+                    record = json.loads(line)
+                    recordings.setdefault(record['command'], deque()).append(
+                        CommandResult(**record)
+                    )
+        cls.mode = 'replay'
+        cls.fixture = fixture
+        cls.recordings = recordings
+
+    @classmethod
+    def go_live(cls) -> None:
+        """Run commands again without recording them."""
+        cls.mode = 'live'
+        cls.fixture = None
+        cls.recordings = {}
+
+    @classmethod
+    def _replay(cls, line: str) -> CommandResult:
+        """Get the next recording of a command line."""
+        with cls._lock:
+            results = cls.recordings.get(line)
+            if not results:
+                raise RuntimeError(f'No recording for command: {line}')
+            return results.popleft() if len(results) > 1 else results[0]
+
+    @classmethod
+    def _record(cls, result: CommandResult) -> None:
+        """Append a result to the fixture file in record mode."""
+        if cls.mode != 'record':
+            return
+        with cls._lock:
+            with open(cls.fixture, 'a') as fixture_file:
+                fixture_file.write(json.dumps(result._asdict()) + '\n')
+
+    @classmethod
+    def _use_helper(cls, command: list[str] | str, privileged: bool) -> bool:
+        """Tell if a command is run by the privileged helper."""
+        return (privileged and not isinstance(command, str)
+                and cls.helper is not None and cls.helper.running())
+
+    @classmethod
+    def _submit(cls, command: list[str] | str, privileged: bool, **options):
+        """
+        Send a command to the privileged helper, if it runs it.
+
+        Returns:
+            HelperRequest or None: The started command, None if it must be
+            run with sudo, also when the helper exited meanwhile
+        """
+        if not cls._use_helper(command, privileged):
+            return None
+        try:
+            return cls.helper.submit(command, **options)
+        except OSError as e:
+            if e.errno != errno.EPIPE:
+                raise
+            print(f'Privileged helper exited, running through sudo: {command_line(command)}')
+            return None
+
+    @classmethod
+    def _popen(cls, command: list[str] | str, privileged: bool,
+               stdin, stderr, stdout=PIPE, new_session=False) -> Popen:
+        """Start a command in text mode with its output piped.
+
+        With new_session the command leads a new process group, so it can
+        be killed with everything it started.
+        """
+        shell = isinstance(command, str)
+        if privileged:
+            command = f'sudo {command}' if shell else ['sudo', *command]
+        return Popen(
+            command,
+            shell=shell,
+            stdin=stdin,
+            stdout=stdout,
+            stderr=stderr,
+            universal_newlines=True,
+            close_fds=True,
+            start_new_session=new_session
+        )
+
+    @classmethod
+    def _popen_terminal(cls, command: list[str] | str, privileged: bool,
+                        cancel=None) -> tuple[Popen, int]:
+        """Start a command with its output on a pseudo-terminal.
+
+        Returns:
+            tuple: Popen object and the non-blocking terminal descriptor
+                the output is read from
+        """
+        leader, follower = pty.openpty()
+        try:
+            process = cls._popen(
+                command, privileged, DEVNULL, follower, stdout=follower,
+                new_session=cancel is not None
+            )
+        except OSError:
+            os.close(leader)
+            raise
+        finally:
+            os.close(follower)
+        os.set_blocking(leader, False)
+        return process, leader
+
+    @staticmethod
+    def _terminal_lines(process: Popen, leader: int):
+        """
+        Read the lines of a command started by _popen_terminal().
+
+        The terminal is read as soon as output is available. Carriage
+        returns end a line too, so status lines rewritten in place come
+        through. The descriptor is closed once the output ends.
+
+        Yields:
+            str: Output lines, ending with a newline but for the last one
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        pending = ''
+        with selectors.DefaultSelector() as selector:
+            selector.register(leader, selectors.EVENT_READ)
+            while True:
+                if not selector.select(timeout=0.1):
+                    # Children the command left running may keep the
+                    # terminal open after it exited.
+                    if process.poll() is not None:
+                        break
+                    continue
+                try:
+                    data = os.read(leader, 65536)
+                except BlockingIOError:
+                    continue
+                except OSError as e:
+                    # Reading a terminal nobody holds open fails with EIO.
+                    if e.errno != errno.EIO:
+                        raise
+                    data = b''
+                if not data:
+                    break
+                pending += decoder.decode(data)
+                # The terminal turns newlines into CR LF, and carriage
+                # returns may be followed by a newline in the next read.
+                text = pending.rstrip('\r')
+                held = pending[len(text):]
+                text = re.sub('\r+\n', '\n', text)
+                *lines, pending = text.replace('\r', '\n').split('\n')
+                pending += held
+                for output_line in lines:
+                    yield f'{output_line}\n'
+        os.close(leader)
+        pending += decoder.decode(b'', final=True)
+        if pending.rstrip('\r'):
+            yield pending.rstrip('\r')
+
+    @classmethod
+    def _kill_group(cls, process: Popen, privileged: bool) -> None:
+        """
+        Kill a command leading its own process group, without waiting long.
+
+        A process stuck in the kernel on a dead device cannot be killed
+        or reaped, so it is left behind after a short wait.
+        """
+        if privileged:
+            cls.run(['pkill', '-KILL', '-g', str(process.pid)], privileged=True)
+        else:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        try:
+            process.communicate(timeout=1)
+        except TimeoutExpired:
+            pass
+
+    @classmethod
+    def run(cls, command: list[str] | str, privileged: bool = False,
+            input: str | None = None, cancel=None,
+            timeout: float | None = None) -> CommandResult:
+        """
+        Run a command to completion.
+
+        Args:
+            command: Argument list, or a shell command line
+            privileged: Run the command through sudo
+            input: Text written to the standard input of the command
+            cancel: CancelToken that terminates the command when cancelled
+            timeout: Seconds after which the command and what it started
+                are killed, no limit if None
+
+        Returns:
+            CommandResult: Output, exit code and duration of the command
+
+        Raises:
+            CommandTimeout: If the command did not finish within timeout
+        """
+        line = command_line(command, privileged)
+        if cls.mode == 'replay':
+            return cls._log(cls._replay(line))
+        if cancel is not None:
+            cancel.check()
+        start = monotonic()
+        process = cls._submit(command, privileged, input=input, timeout=timeout)
+        if process is None:
+            process = cls._popen(
+                command, privileged, DEVNULL if input is None else PIPE, PIPE,
+                new_session=cancel is not None or timeout is not None
+            )
+        if cancel is not None:
+            cancel.track(process, privileged)
+        try:
+            stdout, stderr = process.communicate(input, timeout=timeout)
+        except TimeoutExpired:
+            if isinstance(process, Popen):
+                # The helper kills the commands that time out itself.
+                cls._kill_group(process, privileged)
+            cls.log.append((line, None, monotonic() - start))
+            raise CommandTimeout(line, timeout) from None
+        finally:
+            if cancel is not None:
+                cancel.untrack(process)
+        result = CommandResult(
+            line, stdout, stderr, process.returncode, monotonic() - start
+        )
+        cls._record(result)
+        return cls._log(result)
+
+    @classmethod
+    def stream(cls, command: list[str] | str, privileged: bool = False,
+               terminal: bool = False, cancel=None):
+        """
+        Run a command and yield its output as it is printed.
+
+        Standard error is merged into the output, as for the installation
+        log. The command is recorded once its output is exhausted.
+
+        Args:
+            command: Argument list, or a shell command line
+            privileged: Run the command through sudo
+            terminal: Run the command on a pseudo-terminal so its output
+                is line buffered instead of coming in blocks
+            cancel: CancelToken that terminates the command when cancelled,
+                the output then ends early
+
+        Yields:
+            str: Output lines, with their line ending
+
+        Returns:
+            CommandResult: Result of the command, once the output is exhausted
+        """
+        line = command_line(command, privileged)
+        if cls.mode == 'replay':
+            result = cls._log(cls._replay(line))
+            yield from result.stdout.splitlines(keepends=True)
+            return result
+        if cancel is not None:
+            cancel.check()
+        start = monotonic()
+        output = []
+        process = cls._submit(command, privileged, stream=True, terminal=terminal)
+        if process is not None:
+            lines = iter(process)
+        elif terminal:
+            process, leader = cls._popen_terminal(command, privileged, cancel)
+            lines = cls._terminal_lines(process, leader)
+        else:
+            process = cls._popen(
+                command, privileged, DEVNULL, STDOUT, new_session=cancel is not None
+            )
+            lines = process.stdout
+        if cancel is not None:
+            cancel.track(process, privileged)
+        try:
+            for output_line in lines:
+                output.append(output_line)
+                yield output_line
+            process.wait()
+        finally:
+            if cancel is not None:
+                cancel.untrack(process)
+        result = CommandResult(
+            line, ''.join(output), '', process.returncode, monotonic() - start
+        )
+        cls._record(result)
+        return cls._log(result)
+
+
+if os.environ.get('INSTALL_STATION_REPLAY'):
+    CommandRunner.replay_from(os.environ['INSTALL_STATION_REPLAY'])
+elif os.environ.get('INSTALL_STATION_RECORD'):
+    CommandRunner.record_to(os.environ['INSTALL_STATION_RECORD'])
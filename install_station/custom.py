@@ -11,11 +11,28 @@ from install_station.partition import (
     CreatePartition,
     CreateLabel
 )
+from install_station.partition_model import sectors_to_mb
 from install_station.data import InstallationData, logo, get_text
+from install_station.disk_plan import planned_changes
+from install_station.disk_rescan import DiskRescan
 from install_station.interface_controller import Button
 
 
-bios_type = bios_or_uefi()
+def display_size(sectors, sectorsize):
+    """
+    Format a sector count as the MB shown in the partition tree.
+
+    Partitions smaller than 1 MB, like freebsd-boot, are shown as 1 MB.
+
+    Args:
+        sectors: Size in sectors
+        sectorsize: Sector size in bytes
+
+    Returns:
+        str: Size in MB
+    """
+    size = sectors_to_mb(sectors, sectorsize)
+    return str(1 if sectors and not size else size)
 
 cssProvider = Gtk.CssProvider()
 cssProvider.load_from_path('/usr/local/lib/install-station/ghostbsd-style.css')
@@ -59,6 +76,7 @@ class PartitionManager:
     store = None
     treeview = None
     tree_selection = None
+    scan_label = None
     
     # UI elements as class variables
     create_bt = None
@@ -109,10 +127,9 @@ class PartitionManager:
         Initialize the partition manager UI following the utility class pattern.
         
         Creates the main interface including the partition tree view, control buttons,
-        and sets up the partition database. This method is called automatically
-        by get_model() when the interface is first accessed.
+        and starts a background scan of the partition database. This method is called
+        automatically by get_model() when the interface is first accessed.
         """
-        DiskPartition.create_partition_database()
         cls.vbox1 = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, homogeneous=False, spacing=0)
         cls.vbox1.show()
         
@@ -120,7 +137,6 @@ class PartitionManager:
         sw = Gtk.ScrolledWindow(hexpand=True, vexpand=True)
         sw.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
         cls.store = Gtk.TreeStore(str, str, str, str, bool)
-        cls.tree_store()
         cls.treeview = Gtk.TreeView()
         cls.treeview.set_model(cls.store)
         cls.treeview.set_rules_hint(True)
@@ -144,6 +160,54 @@ class PartitionManager:
         hbox1.show()
         cls.scheme = 'GPT'
         hbox1.pack_start(cls.delete_create_button(), False, False, 10)
+        cls.scan_label = Gtk.Label()
+        hbox1.pack_end(cls.scan_label, False, False, 10)
+        cls.rescan()
+
+    @classmethod
+    def rescan(cls):
+        """
+        Rescan the disks in the background and refresh the tree when done.
+        
+        The partition tree and the buttons are insensitive while the scan runs,
+        so no partition operation can edit the database being rebuilt.
+        """
+        cls.treeview.set_sensitive(False)
+        cls.create_bt.set_sensitive(False)
+        cls.delete_bt.set_sensitive(False)
+        cls.auto_bt.set_sensitive(False)
+        cls.revert_bt.set_sensitive(False)
+        cls.scan_label.set_text(get_text("Scanning disks..."))
+        cls.scan_label.show()
+        DiskRescan.start(cls.on_rescan_done, cls.on_rescan_progress)
+
+    @classmethod
+    def on_rescan_progress(cls, done, total):
+        """
+        Show the progress of the background disk scan.
+        
+        Args:
+            done: Number of disks probed so far
+            total: Number of disks to probe
+        """
+        cls.scan_label.set_text(
+            get_text("Scanning disks ({done}/{total})").format(done=done, total=total)
+        )
+
+    @classmethod
+    def on_rescan_done(cls, error):
+        """
+        Refresh the partition tree once the background disk scan is published.
+        
+        Args:
+            error: Exception raised by the scan, or None on success
+        """
+        cls.scan_label.hide()
+        if error is not None:
+            print(f"Disk scan failed: {error}")
+        cls.tree_store()
+        cls.treeview.expand_all()
+        cls.treeview.set_sensitive(True)
 
     @classmethod
     def _setup_columns(cls):
@@ -184,6 +248,7 @@ class PartitionManager:
         - Labels/partitions (third level)
         
         Each level displays relevant information like size, mount points, and filesystem types.
+        A disk that stopped answering probes is listed as unresponsive, without partitions.
         
         Returns:
             Gtk.TreeStore: The populated tree store model
@@ -193,9 +258,13 @@ class PartitionManager:
         cls.disk_index = list(disk_db.keys())
         for disk in disk_db:
             disk_info = disk_db[disk]
+            if disk_info['stat'] == 'Unresponsive':
+                cls.store.append(None, [disk, '', '', get_text('Unresponsive'), False])
+                continue
             disk_scheme = disk_info['scheme']
             mount_point = ''
-            disk_size = str(disk_info['size'])
+            sectorsize = disk_info['sectorsize']
+            disk_size = display_size(disk_info['size'], sectorsize)
             disk_partitions = disk_info['partitions']
             partition_list = disk_info['partition-list']
             pinter1 = cls.store.append(None, [disk, disk_size, mount_point,
@@ -204,7 +273,7 @@ class PartitionManager:
                 partition_info = disk_partitions[partition]
                 file_system = partition_info['file-system']
                 mount_point = partition_info['mount-point']
-                partition_size = str(partition_info['size'])
+                partition_size = display_size(partition_info['size'], sectorsize)
                 partition_partitions = partition_info['partitions']
                 label_list = partition_info['partition-list']
                 pinter2 = cls.store.append(pinter1, [partition, partition_size, mount_point, file_system, True])
@@ -212,7 +281,7 @@ class PartitionManager:
                     label_info = partition_partitions[label]
                     file_system = label_info['file-system']
                     label_mount_point = label_info['mount-point']
-                    label_size = str(label_info['size'])
+                    label_size = display_size(label_info['size'], sectorsize)
                     cls.store.append(pinter2, [label, label_size, label_mount_point, file_system, True])
         return cls.store
 
@@ -349,7 +418,7 @@ class PartitionManager:
         
         # Set filesystem options based on scheme and existing partitions
         if scheme == 'GPT':
-            if bios_type == "UEFI":
+            if bios_or_uefi() == "UEFI":
                 cls.fs_type.append_text("UEFI")
                 if cls.efi_exist is False:
                     cls.fs_type.set_active(3)  # UEFI
@@ -480,7 +549,7 @@ class PartitionManager:
         Args:
             _widget: The add button widget (unused)
         """
-        DiskPartition.set_disk_scheme(cls.scheme, cls.disk, cls.size)
+        DiskPartition.set_disk_scheme(cls.scheme, cls.disk)
         cls.update()
         cls.window.hide()
 
@@ -645,23 +714,21 @@ class PartitionManager:
         Revert all partition changes and restore original state.
         
         Clears all partition configuration data from InstallationData and
-        recreates the original partition database, effectively undoing
-        all partition modifications.
+        rescans the original partition database, effectively undoing
+        all partition modifications. Unresponsive disks are probed again.
         
         Args:
             _widget: The revert button widget (unused)
         """
         # Reset all partition configuration data in InstallationData
-        InstallationData.create = []
         InstallationData.scheme = ""
         InstallationData.disk = ""
         InstallationData.slice = ""
-        InstallationData.delete = []
-        InstallationData.destroy = {}
         InstallationData.new_partition = []
-        DiskPartition.create_partition_database()
-        cls.tree_store()
-        cls.treeview.expand_all()
+        # Probe the unresponsive disks again, they may have recovered.
+        for disk in list(DiskPartition.quarantine):
+            DiskPartition.invalidate_cache(disk)
+        cls.rescan()
 
     @classmethod
     def create_partition(cls, _widget):
@@ -711,6 +778,8 @@ class PartitionManager:
             widget: TreeSelection widget that triggered the selection change
         """
         efi_already_exist = False
+        if DiskRescan.busy:
+            return None
         model, cls.iter, = widget.get_selected()
         if cls.iter is None:
             Button.next_button.set_sensitive(False)
@@ -804,7 +873,9 @@ class PartitionManager:
         else:
             cls.delete_bt.set_sensitive(False)
             cls.auto_bt.set_sensitive(False)
-            if DiskPartition.how_partition(cls.disk) == 0:
+            if cls.disk in DiskPartition.quarantine:
+                cls.create_bt.set_sensitive(False)
+            elif DiskPartition.how_partition(cls.disk) == 0:
                 cls.create_bt.set_sensitive(True)
             elif cls.change_schemes is True:
                 cls.create_bt.set_sensitive(True)
@@ -834,12 +905,12 @@ class PartitionManager:
                             efi_already_exist = False
                             break
                         num += 1
-                if 'BOOT' in cls.partitions[0] and bios_type == 'BIOS':
+                if 'BOOT' in cls.partitions[0] and bios_or_uefi() == 'BIOS':
                     if len(cls.partitions) >= 2 and 'ZFS' in cls.partitions[1]:
                         Button.next_button.set_sensitive(True)
                     else:
                         Button.next_button.set_sensitive(False)
-                elif efi_already_exist is True and bios_type == 'UEFI':
+                elif efi_already_exist is True and bios_or_uefi() == 'UEFI':
                     if 'ZFS' in cls.partitions[0]:
                         Button.next_button.set_sensitive(True)
                     else:
@@ -869,12 +940,10 @@ class PartitionManager:
                 
         # Check if any configuration exists to enable revert button
         path_exist = [
-            bool(InstallationData.create),
+            any(planned_changes()),
             bool(InstallationData.scheme),
             bool(InstallationData.disk),
             bool(InstallationData.slice),
-            bool(InstallationData.delete),
-            bool(InstallationData.destroy),
             bool(InstallationData.new_partition)
         ]
         if any(path_exist):
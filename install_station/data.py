@@ -29,10 +29,7 @@ class InstallationData:
     Centralized data storage for installation configuration
     """
     # Partition configuration
-    destroy: dict = {}
-    delete: list = []
     new_partition: list = []
-    create: list = []
     scheme: str = ""
     disk: str = ""
     slice: str = ""
@@ -68,10 +65,7 @@ class InstallationData:
     @classmethod
     def reset(cls) -> None:
         """Reset all installation data"""
-        cls.destroy = {}
-        cls.delete = []
         cls.new_partition = []
-        cls.create = []
         cls.scheme = ""
         cls.disk = ""
         cls.slice = ""
@@ -105,3 +99,19 @@ def get_text(text: str) -> str:
     gettext.bindtextdomain('install-station', '/usr/local/share/locale')
     gettext.textdomain('install-station')
     return gettext.gettext(text)
+
+
+def N_(text: str) -> str:
+    """
+    Mark text for translation without translating it.
+
+    For text kept in a variable and translated later with get_text, so
+    xgettext still finds it where it is defined.
+
+    Args:
+        text: Text to translate later
+
+    Returns:
+        str: The text, untranslated
+    """
+    return text
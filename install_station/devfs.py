@@ -0,0 +1,94 @@
+"""
+Device node waits for GhostBSD Install Station.
+
+GEOM creates and removes the /dev nodes of partitions asynchronously after
+gpart returns. Instead of sleeping a fixed time after each command, the
+partition operations wait for the node they expect to appear or disappear,
+polling devfs with a growing interval until a timeout.
+"""
+import os
+from time import monotonic, sleep
+from install_station.commands import CommandRunner
+
+
+class DeviceWait:
+    """
+    Wait for device nodes and keep how long each wait took.
+
+    The devfs directory can be moved with INSTALL_STATION_DEVFS, which the
+    simulated disk tools use. Nothing is waited for when commands are
+    replayed since nothing was run.
+    """
+    devfs: str = os.environ.get('INSTALL_STATION_DEVFS', '/dev')
+    """Directory holding the device nodes."""
+    timeout: float = 10.0
+    """Seconds to wait for a device before giving up."""
+    first_interval: float = 0.01
+    """First polling interval in seconds, doubled after each poll."""
+    max_interval: float = 0.25
+    """Longest polling interval in seconds."""
+    log: list = []
+    """(device, present, seconds) of every wait since the last reset."""
+
+    @classmethod
+    def until(cls, device: str, present: bool = True,
+              timeout: float | None = None) -> float:
+        """
+        Wait until a device node exists, or is gone.
+
+        Args:
+            device: Device name (e.g., 'ada0p1')
+            present: Wait for the node to appear if True, to go away if False
+            timeout: Seconds before giving up, defaults to timeout
+
+        Returns:
+            float: Seconds the wait took
+
+        Raises:
+            TimeoutError: If the device did not appear or disappear in time
+        """
+        if CommandRunner.mode == 'replay':
+            return 0.0
+        if timeout is None:
+            timeout = cls.timeout
+        path = os.path.join(cls.devfs, device)
+        start = monotonic()
+        interval = cls.first_interval
+        while os.path.exists(path) != present:
+            elapsed = monotonic() - start
+            if elapsed >= timeout:
+                state = 'appear' if present else 'go away'
+                raise TimeoutError(
+                    f'{path} did not {state} within {timeout:g} seconds'
+                )
+            sleep(min(interval, timeout - elapsed))
+            interval = min(interval * 2, cls.max_interval)
+        elapsed = monotonic() - start
+        cls.log.append((device, present, elapsed))
+        return elapsed
+
+    @classmethod
+    def until_gone(cls, device: str, timeout: float | None = None) -> float:
+        """
+        Wait until a device node and the nodes of its partitions are gone.
+
+        Args:
+            device: Disk or slice name (e.g., 'ada0')
+            timeout: Seconds before giving up, defaults to timeout
+
+        Returns:
+            float: Seconds the wait took
+        """
+        if CommandRunner.mode == 'replay':
+            return 0.0
+        start = monotonic()
+        for name in sorted(os.listdir(cls.devfs)):
+            if name.startswith(device) and name[len(device):][:1] in ('p', 's'):
+                remaining = cls.timeout if timeout is None else timeout
+                cls.until(name, False, max(0.0, remaining - (monotonic() - start)))
+        return monotonic() - start
+
+    @classmethod
+    def reset_log(cls) -> None:
+        """Forget the recorded waits."""
+        cls.log = []
@@ -0,0 +1,415 @@
+"""
+Partition plan executor for GhostBSD Install Station.
+
+Works out the partition changes by comparing the probed partition
+database with the edited one, compiles them into an ordered plan of
+commands per disk and applies each plan as one gpart transaction: the
+partition table changes are made with gpart's deferred commit mode
+(-f x) and written with a single gpart commit, or reverted with gpart
+undo if any step fails. Disks are independent, so their plans run
+concurrently while the steps of each disk keep their order.
+
+Only the partition table is transactional. Destroying the table of a disk
+that is wiped and the writes of zpool labelclear, dd and newfs_msdos
+happen right away and are not reverted by gpart undo.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+from install_station.commands import CommandRunner, command_line
+from install_station.data import InstallationData
+from install_station.devfs import DeviceWait
+from install_station.partition import (
+    DiskPartition,
+    bios_or_uefi,
+    get_disk_from_partition,
+    slice_number
+)
+
+plan_workers = 8
+"""Maximum number of disks changed concurrently."""
+
+
+class PartitionChanges(NamedTuple):
+    """Partition table changes from the probed to the edited disks."""
+    destroy: dict
+    """Partition scheme by disk whose table is recreated."""
+    delete: list
+    """Partitions to delete."""
+    create: list
+    """[name, size, start] of partitions the installer adds itself."""
+
+
+def created_type(partition, boot: str) -> str | None:
+    """
+    Get the gpart type of a new partition the installer adds itself.
+
+    Boot partitions and MBR slices are added by the installer, root, swap
+    and BSD labels are created later by pc-sysinstall.
+
+    Args:
+        partition: Partition record
+        boot: Boot manager, 'grub' uses a bios-boot partition
+
+    Returns:
+        str or None: gpart type, None if pc-sysinstall creates it
+    """
+    if partition.file_system == 'UEFI':
+        return 'efi'
+    if partition.file_system == 'BOOT':
+        return 'bios-boot' if boot == 'grub' else 'freebsd-boot'
+    if partition.file_system == 'BSD':
+        return 'freebsd'
+    return None
+
+
+def unchanged(probed, edited, boot: str) -> bool:
+    """
+    Tell if an edited partition is the probed one, or can stand for it.
+
+    A boot partition deleted and added again at the same place with the
+    same type needs neither the delete nor the add. An MBR slice is always
+    recreated since pc-sysinstall writes a new BSD label table into it.
+
+    Args:
+        probed: Partition record as probed
+        edited: Partition record of the same name after editing
+        boot: Boot manager
+
+    Returns:
+        bool: True if nothing has to be done on the disk
+    """
+    if edited.stat != 'New':
+        return (edited.start, edited.size) == (probed.start, probed.size)
+    partition_type = created_type(edited, boot)
+    if partition_type == 'freebsd':
+        return False
+    size = 512 if partition_type == 'freebsd-boot' else edited.size
+    return (
+        partition_type == probed.file_system
+        and (edited.start, size) == (probed.start, probed.size)
+    )
+
+
+def diff_layouts(probed: dict, edited: dict,
+                 boot: str | None = None) -> PartitionChanges:
+    """
+    Compute the smallest set of changes from the probed to the edited disks.
+
+    Partitions created and deleted again, and boot partitions deleted and
+    created again unchanged, are left out. The table of a disk is only
+    recreated if its scheme changes.
+
+    Args:
+        probed: Disk database as probed
+        edited: Disk database after editing
+        boot: Boot manager, defaults to InstallationData.boot
+
+    Returns:
+        PartitionChanges: Tables to recreate, partitions to delete and
+            partitions to add, disk by disk
+    """
+    if boot is None:
+        boot = InstallationData.boot
+    changes = PartitionChanges({}, [], [])
+    for disk, disk_info in edited.items():
+        original = probed.get(disk)
+        probed_partitions = {}
+        if original is not None:
+            probed_partitions = {
+                entry.name: entry
+                for entry in original.partitions.entries if not entry.is_free
+            }
+        if disk_info.scheme is not None and (
+                original is None or original.scheme != disk_info.scheme):
+            changes.destroy[disk] = disk_info.scheme
+            probed_partitions = {}
+        edited_partitions = {
+            entry.name: entry
+            for entry in disk_info.partitions.entries if not entry.is_free
+        }
+        for name, partition in probed_partitions.items():
+            if name not in edited_partitions or not unchanged(
+                    partition, edited_partitions[name], boot):
+                changes.delete.append(name)
+        for name, partition in edited_partitions.items():
+            if partition.stat != 'New' or created_type(partition, boot) is None:
+                continue
+            if name in probed_partitions and unchanged(
+                    probed_partitions[name], partition, boot):
+                continue
+            changes.create.append([name, partition.size, partition.start])
+    return changes
+
+
+def planned_changes(rescan: bool = False, boot: str | None = None) -> PartitionChanges:
+    """
+    Get the changes between the probed and the edited partition database.
+
+    A failed installation may have changed the disks after its plan was
+    committed, pc-sysinstall adds the partitions it creates itself. A
+    retry rescans the disks and diffs what is on them now, instead of
+    applying the first plan again on top of those partitions.
+
+    Args:
+        rescan: Probe the disks again instead of using probed_database
+        boot: Boot manager, defaults to InstallationData.boot
+
+    Returns:
+        PartitionChanges: Changes computed by diff_layouts()
+
+    Raises:
+        RuntimeError: If an edited disk does not respond to the rescan
+    """
+    probed = DiskPartition.probed_database
+    if rescan:
+        probed = DiskPartition.scan_database()
+        for disk, disk_info in DiskPartition.disk_database.items():
+            if disk_info.stat != 'Unresponsive' and disk in DiskPartition.quarantine:
+                raise RuntimeError(f'{disk} does not respond, its partitions cannot be checked')
+    return diff_layouts(probed, DiskPartition.disk_database, boot)
+
+
+class PlanStep(NamedTuple):
+    """A command of a disk plan."""
+    command: list
+    """Argument list, run through sudo."""
+    check: bool = True
+    """Whether a failure of the command aborts the plan."""
+    deferred: bool = False
+    """Whether the change is pending until gpart commit."""
+    wait: tuple | None = None
+    """(device, present) node to wait for after the command."""
+    wait_all_gone: str | None = None
+    """Disk whose partition nodes must go away after the command."""
+
+    def __str__(self):
+        return command_line(self.command, privileged=True)
+
+
+class DiskPlan(NamedTuple):
+    """Ordered steps applied to a disk as one gpart transaction."""
+    disk: str
+    steps: list
+
+
+class DiskPlanError(RuntimeError):
+    """A step of a disk plan failed and the plan was rolled back."""
+
+    def __init__(self, disk: str, step: PlanStep, output: str):
+        self.disk = disk
+        self.step = step
+        self.output = output
+        super().__init__(f'{disk}: {step} failed: {output.strip()}')
+
+
+class PlanErrors(RuntimeError):
+    """The plans of one or more disks failed, the other disks are committed."""
+
+    def __init__(self, errors: dict, committed: list):
+        self.errors = errors
+        self.committed = committed
+        super().__init__('\n'.join(str(error) for error in errors.values()))
+
+
+def _disk_plan(plans: dict, disk: str) -> DiskPlan:
+    """Get the plan of a disk, adding an empty one if needed."""
+    if disk not in plans:
+        plans[disk] = DiskPlan(disk, [])
+    return plans[disk]
+
+
+def compile_plan(bios_type: str | None = None,
+                 changes: PartitionChanges | None = None,
+                 boot: str | None = None) -> list[DiskPlan]:
+    """
+    Compile partition changes into one plan per disk.
+
+    For each disk the table is destroyed and wiped first if it is
+    recreated, then partitions are deleted, then new ones are added.
+
+    Args:
+        bios_type: 'BIOS' or 'UEFI', read from the system if omitted
+        changes: Changes to compile, defaults to planned_changes()
+        boot: Boot manager, 'grub' uses a bios-boot partition, defaults
+            to InstallationData.boot
+
+    Returns:
+        list: DiskPlan of each disk with changes, in disk order
+    """
+    if boot is None:
+        boot = InstallationData.boot
+    if changes is None:
+        changes = planned_changes()
+    if bios_type is None and changes.create:
+        bios_type = bios_or_uefi()
+    plans = {}
+    for drive, scheme in changes.destroy.items():
+        steps = _disk_plan(plans, drive).steps
+        # Fails harmlessly on a disk without a partition table.
+        steps.append(PlanStep(
+            ['gpart', 'destroy', '-F', drive], check=False, wait_all_gone=drive
+        ))
+        steps.append(PlanStep(
+            ['dd', 'if=/dev/zero', f'of=/dev/{drive}', 'bs=1m', 'count=1']
+        ))
+        steps.append(PlanStep(
+            ['gpart', 'create', '-s', scheme, '-f', 'x', drive], deferred=True
+        ))
+    for partition in changes.delete:
+        drive = get_disk_from_partition(partition)
+        steps = _disk_plan(plans, drive).steps
+        steps.append(PlanStep(['zpool', 'labelclear', '-f', partition], check=False))
+        steps.append(PlanStep(
+            ['gpart', 'delete', '-i', str(slice_number(partition)), '-f', 'x', drive],
+            deferred=True,
+            wait=(partition, False)
+        ))
+    for part, size, start in changes.create:
+        drive = get_disk_from_partition(part)
+        steps = _disk_plan(plans, drive).steps
+        sl = slice_number(part)
+        if set("p") & set(part):
+            if bios_type == 'UEFI':
+                partition_type = 'efi'
+            elif boot == "grub":
+                partition_type = 'bios-boot'
+            else:
+                # freebsd-boot partition must never be larger
+                # than 512B blocks.
+                partition_type = 'freebsd-boot'
+                size = 512
+            device = f'{drive}p{sl}'
+        else:
+            partition_type = 'freebsd'
+            device = f'{drive}s{sl}'
+        steps.append(PlanStep(
+            ['gpart', 'add', '-a', '4k', '-b', str(start), '-s', str(size),
+             '-t', partition_type, '-i', str(sl), '-f', 'x', drive],
+            deferred=True,
+            wait=(device, True)
+        ))
+        if partition_type != 'freebsd':
+            steps.append(PlanStep(['zpool', 'labelclear', '-f', device], check=False))
+        if partition_type == 'efi':
+            steps.append(PlanStep(['newfs_msdos', '-F', '16', device]))
+    return list(plans.values())
+
+
+def describe_plan(plans: list[DiskPlan]) -> list[str]:
+    """
+    Describe plans for a dry run.
+
+    Args:
+        plans: Plans from compile_plan()
+
+    Returns:
+        list: A 'disk:' line per plan followed by its commands, indented
+    """
+    lines = []
+    for plan in plans:
+        lines.append(f'{plan.disk}:')
+        lines.extend(f'    {step}' for step in plan.steps)
+    return lines
+
+
+def run_step(disk: str, step: PlanStep) -> None:
+    """
+    Run a step of a disk plan and wait for the device nodes it changes.
+
+    Args:
+        disk: Disk of the plan
+        step: Step to run
+
+    Raises:
+        DiskPlanError: If the step is checked and failed, or its device
+            node did not show up or go away in time
+    """
+    result = CommandRunner.run(step.command, privileged=True)
+    if result.returncode != 0 and step.check:
+        raise DiskPlanError(disk, step, result.stderr or result.stdout)
+    try:
+        if step.wait is not None:
+            DeviceWait.until(*step.wait)
+        if step.wait_all_gone is not None:
+            DeviceWait.until_gone(step.wait_all_gone)
+    except TimeoutError as e:
+        raise DiskPlanError(disk, step, str(e)) from e
+
+
+def execute_disk_plan(plan: DiskPlan) -> None:
+    """
+    Apply the plan of a disk and commit its partition table once.
+
+    Args:
+        plan: Plan of the disk
+
+    Raises:
+        DiskPlanError: If a step failed, or could not be run at all, after
+            gpart undo reverted the pending changes of the disk
+    """
+    pending = False
+    step = None
+    try:
+        for step in plan.steps:
+            pending = pending or step.deferred
+            run_step(plan.disk, step)
+        if pending:
+            step = PlanStep(['gpart', 'commit', plan.disk])
+            run_step(plan.disk, step)
+    except Exception as e:
+        if pending:
+            try:
+                CommandRunner.run(['gpart', 'undo', plan.disk], privileged=True)
+            except Exception as undo_error:
+                print(f'{plan.disk}: gpart undo failed: {undo_error}')
+        if isinstance(e, DiskPlanError):
+            raise
+        # e.g. a CommandTimeout, or an OSError if the command could not be started
+        raise DiskPlanError(plan.disk, step, str(e)) from e
+
+
+def execute_plan(plans: list[DiskPlan] | None = None,
+                 workers: int | None = None) -> list[str]:
+    """
+    Apply the partition changes of all disks concurrently.
+
+    A failed disk does not stop the others, every disk is either
+    committed or rolled back.
+
+    Args:
+        plans: Plans to apply, compiled from planned_changes() if omitted
+        workers: Maximum number of disks changed at once, defaults to
+            plan_workers. Use 1 to change one disk after the other.
+
+    Returns:
+        list: Disks committed, in plan order
+
+    Raises:
+        PlanErrors: If the plan of any disk failed, with the DiskPlanError
+            of each failed disk and the disks that were committed
+    """
+    if plans is None:
+        plans = compile_plan()
+    if workers is None:
+        workers = plan_workers
+    workers = max(1, min(workers, len(plans)))
+
+    def execute(plan):
+        try:
+            execute_disk_plan(plan)
+        except DiskPlanError as error:
+            return error
+        return None
+
+    if workers == 1:
+        outcomes = [execute(plan) for plan in plans]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(execute, plans))
+    errors = {
+        plan.disk: error for plan, error in zip(plans, outcomes) if error is not None
+    }
+    committed = [plan.disk for plan in plans if plan.disk not in errors]
+    if errors:
+        raise PlanErrors(errors, committed)
+    return committed
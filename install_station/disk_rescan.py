@@ -0,0 +1,100 @@
+"""
+Disk Rescan Module.
+
+This module runs the disk probe on a worker thread so the GTK main loop
+keeps running while gpart and diskinfo are called, and publishes the new
+partition database back on the main loop once it is complete.
+"""
+import threading
+from gi.repository import GLib
+from install_station.facts import SessionFacts
+from install_station.partition import DiskPartition
+
+
+class DiskRescan:
+    """
+    Background rescan of the disk partition database.
+
+    Only one rescan runs at a time. While it runs, busy is True and
+    DiskPartition.disk_database must not be edited; the new database is
+    built separately and only replaces disk_database on the main loop, so
+    callbacks never see a database that is being rebuilt.
+    """
+    busy: bool = False
+    """True while a rescan is running."""
+    done: int = 0
+    """Number of disks probed by the running rescan."""
+    total: int = 0
+    """Number of disks to probe in the running rescan, 0 until known."""
+    _callbacks: list = []
+    _progress_callbacks: list = []
+
+    @classmethod
+    def start(cls, callback=None, progress=None) -> bool:
+        """
+        Start a rescan on a worker thread.
+
+        If a rescan is already running, the callbacks are attached to it
+        instead of starting a new one.
+
+        Args:
+            callback: Called on the main loop with the error, or None, once
+                the new database is published
+            progress: Called on the main loop with (done, total) disks
+
+        Returns:
+            True if a new rescan was started, False if one was running
+        """
+        if callback is not None:
+            cls._callbacks.append(callback)
+        if progress is not None:
+            cls._progress_callbacks.append(progress)
+        if cls.busy:
+            return False
+        cls.busy = True
+        cls.done = 0
+        cls.total = 0
+        # A rescan must see the disks plugged in since the last one.
+        SessionFacts.invalidate('disk_list')
+        thread = threading.Thread(target=cls._scan, daemon=True)
+        thread.start()
+        return True
+
+    @classmethod
+    def _scan(cls) -> None:
+        """Build the new database on the worker thread."""
+        try:
+            database = DiskPartition.scan_database(progress=cls._on_progress)
+            error = None
+        except Exception as e:
+            database = None
+            error = e
+        GLib.idle_add(cls._publish, database, error)
+
+    @classmethod
+    def _on_progress(cls, done: int, total: int) -> None:
+        """Forward probe progress from the worker to the main loop."""
+        GLib.idle_add(cls._update_progress, done, total)
+
+    @classmethod
+    def _update_progress(cls, done: int, total: int) -> bool:
+        """Record probe progress on the main loop."""
+        if cls.busy and done >= cls.done:
+            cls.done = done
+            cls.total = total
+            for progress in cls._progress_callbacks:
+                progress(done, total)
+        return False
+
+    @classmethod
+    def _publish(cls, database: dict | None, error: Exception | None) -> bool:
+        """Replace the disk database on the main loop and notify callers."""
+        if database is not None:
+            DiskPartition.publish_database(database)
+        cls.busy = False
+        callbacks = cls._callbacks
+        cls._callbacks = []
+        cls._progress_callbacks = []
+        for callback in callbacks:
+            callback(error)
+        return False
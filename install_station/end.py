@@ -3,7 +3,7 @@
 import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk
-from subprocess import Popen
+from install_station.commands import CommandRunner
 from install_station.data import get_text
 
 
@@ -17,7 +17,7 @@ not be preserved on reboot.""")
 class EndWindow:
     @classmethod
     def on_reboot(cls, _widget):
-        Popen('shutdown -r now', shell=True)
+        CommandRunner.run(['shutdown', '-r', 'now'])
         Gtk.main_quit()
 
     @classmethod
@@ -1,6 +1,6 @@
 import gi
 gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk
+from gi.repository import Gtk, GLib
 from install_station.data import get_text
 
 
@@ -10,10 +10,27 @@ class ErrorWindow:
     def on_close(cls, _widget):
         Gtk.main_quit()
 
-    def __init__(self):
+    def on_retry(self, _widget):
+        """Close the window without quitting and run the installation again."""
+        self.window.disconnect(self.destroy_handler)
+        self.window.destroy()
+        self.retry()
+
+    def __init__(self, interrupted=None, retry=None):
+        """
+        Show the error window.
+
+        Args:
+            interrupted: Phase the installation was cancelled in, None if
+                it failed
+            retry: Called to run the installation again, no Retry button
+                if None
+        """
         window = Gtk.Window()
         window.set_border_width(8)
-        window.connect("destroy", Gtk.main_quit)
+        self.window = window
+        self.retry = retry
+        self.destroy_handler = window.connect("destroy", Gtk.main_quit)
         window.set_title(get_text("Installation Error"))
         # window.set_icon_from_file("/usr/local/lib/install-station/image/logo.png")
         box1 = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, homogeneous=False, spacing=0)
@@ -25,15 +42,21 @@ class ErrorWindow:
         box2.show()
         title = Gtk.Label()
         title.set_use_markup(True)
-        title_text = get_text("Installation has failed!")
-        title.set_markup(f'<b><span size="larger">{title_text}</span></b>')
         label = Gtk.Label()
         label.set_use_markup(True)
-        url = 'https://github.com/ghostbsd/ghostbsd-src/issues/new/choose'
-        anchor = f"<a href='{url}'>{get_text('GhostBSD issue system')}</a>"
-        message = get_text(
-            "Please report the issue to {anchor}, and \nbe sure to provide /tmp/.pc-sysinstall/pc-sysinstall.log."
-        ).format(anchor=anchor)
+        if interrupted is None:
+            title_text = get_text("Installation has failed!")
+            url = 'https://github.com/ghostbsd/ghostbsd-src/issues/new/choose'
+            anchor = f"<a href='{url}'>{get_text('GhostBSD issue system')}</a>"
+            message = get_text(
+                "Please report the issue to {anchor}, and \nbe sure to provide /tmp/.pc-sysinstall/pc-sysinstall.log."
+            ).format(anchor=anchor)
+        else:
+            title_text = get_text("Installation was cancelled!")
+            message = get_text(
+                "The installation was stopped during this step: {phase}.\nThe disks may be left partly installed."
+            ).format(phase=GLib.markup_escape_text(get_text(interrupted)))
+        title.set_markup(f'<b><span size="larger">{title_text}</span></b>')
         label.set_markup(message)
         box2.pack_start(title, True, True, 0)
         box2.pack_start(label, True, True, 0)
@@ -44,6 +67,12 @@ class ErrorWindow:
         table = Gtk.Table(n_rows=1, n_columns=2, homogeneous=True)
         ok = Gtk.Button(label=get_text("Ok"))
         ok.connect("clicked", self.on_close)
-        table.attach(ok, 0, 2, 0, 1)
+        if retry is None:
+            table.attach(ok, 0, 2, 0, 1)
+        else:
+            retry_button = Gtk.Button(label=get_text("Retry"))
+            retry_button.connect("clicked", self.on_retry)
+            table.attach(retry_button, 0, 1, 0, 1)
+            table.attach(ok, 1, 2, 0, 1)
         box2.pack_start(table, True, True, 0)
         window.show_all()
@@ -0,0 +1,118 @@
+"""
+Session facts for GhostBSD Install Station.
+
+Some system queries give an answer that cannot change while the installer
+runs, like the boot method, and are asked for again and again by the
+pages, the partition editor and the installation. Others change rarely,
+like the disk list, which only changes when a disk is plugged in or out.
+Each query answered from SessionFacts is a command that was not run.
+
+A fact is declared by decorating the function that queries it:
+
+    @session_fact()
+    def bios_or_uefi(): ...
+
+    @session_fact(ttl=lambda: disk_list_ttl)
+    def disk_list(): ...
+
+A fact without ttl is kept for the session, one with a ttl is queried
+again once it is older than ttl seconds. A callable ttl is called each
+time the fact is read, so a module setting can be changed at runtime.
+invalidate() forgets facts explicitly, e.g. before a disk rescan.
+"""
+from functools import wraps
+from threading import Lock
+from time import monotonic
+
+
+class SessionFacts:
+    """
+    Cache of the answers of system queries.
+
+    Attributes:
+        values (dict): (answer, monotonic time it was queried) by fact name
+        hits (int): Queries answered from the cache, each one a command not run
+        misses (int): Queries that ran their command
+    """
+    values: dict = {}
+    hits: int = 0
+    misses: int = 0
+    _lock = Lock()
+
+    @classmethod
+    def get(cls, name: str, query, ttl=None):
+        """
+        Get a fact, querying it if it is not known or too old.
+
+        An exception raised by the query is passed on and nothing is cached.
+
+        Args:
+            name: Fact name
+            query: Called without arguments to query the fact
+            ttl (float, callable or None): Seconds the answer is valid, or
+                a callable returning them, None for the whole session
+
+        Returns:
+            Answer of the query
+        """
+        if callable(ttl):
+            ttl = ttl()
+        with cls._lock:
+            cached = cls.values.get(name)
+            if cached is not None and (ttl is None or monotonic() - cached[1] < ttl):
+                cls.hits += 1
+                return cached[0]
+        queried_at = monotonic()
+        value = query()
+        with cls._lock:
+            cls.misses += 1
+            cls.values[name] = (value, queried_at)
+        return value
+
+    @classmethod
+    def invalidate(cls, name: str | None = None) -> None:
+        """
+        Forget a fact so it is queried again.
+
+        Args:
+            name: Fact name, defaults to all facts
+        """
+        with cls._lock:
+            if name is None:
+                cls.values = {}
+            else:
+                cls.values.pop(name, None)
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: hits, the commands avoided, misses and the known facts
+        """
+        with cls._lock:
+            return {
+                'hits': cls.hits,
+                'misses': cls.misses,
+                'facts': sorted(cls.values)
+            }
+
+
+def session_fact(ttl=None):
+    """
+    Answer a query function from SessionFacts, under the function name.
+
+    Args:
+        ttl (float, callable or None): Seconds the answer is valid, or a
+            callable returning them, None for the whole session
+
+    Returns:
+        callable: Decorator for a function without arguments
+    """
+    def decorate(query):
+        @wraps(query)
+        def cached():
+            return SessionFacts.get(query.__name__, query, ttl)
+        return cached
+    return decorate
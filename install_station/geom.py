@@ -0,0 +1,258 @@
+"""GEOM configuration probe backend for GhostBSD Install Station.
+
+Reads the whole GEOM tree in one go from the kern.geom.confxml sysctl and
+turns it into the disk database format used by DiskPartition. The XML is
+parsed as a stream so large trees never have to be held in memory, and the
+parser accepts any file-like object so saved confxml dumps can be used as
+fixtures on systems without GEOM.
+"""
+import hashlib
+import io
+import xml.etree.ElementTree as ElementTree
+from install_station.commands import CommandRunner
+from install_station.partition_model import (
+    Disk,
+    Partition,
+    PartitionTable,
+    mebibyte
+)
+
+
+def read_confxml(timeout: float | None = None) -> bytes:
+    """Read the GEOM configuration XML from the kernel.
+
+    Args:
+        timeout (float, optional): Seconds to wait for sysctl
+
+    Returns:
+        bytes: Raw content of the kern.geom.confxml sysctl
+
+    Raises:
+        CommandTimeout: If sysctl did not answer within timeout
+    """
+    confxml = CommandRunner.run(['sysctl', '-n', 'kern.geom.confxml'], timeout=timeout)
+    return confxml.stdout.encode()
+
+
+def _provider_record(provider) -> dict:
+    """Convert a provider element to a flat record.
+
+    Args:
+        provider (Element): GEOM provider element
+
+    Returns:
+        dict: Provider name, sizes and configuration values
+    """
+    record = {
+        'name': provider.findtext('name', ''),
+        'mediasize': int(provider.findtext('mediasize', '0')),
+        'sectorsize': int(provider.findtext('sectorsize', '512')),
+        'stripesize': int(provider.findtext('stripesize', '0')),
+    }
+    config = provider.find('config')
+    if config is not None:
+        for child in config:
+            record[child.tag] = (child.text or '').strip()
+    return record
+
+
+def parse_confxml(source) -> dict:
+    """Parse a GEOM confxml document as a stream.
+
+    Only the DISK and PART classes are kept: disks with their media
+    information and partition tables with their entries.
+
+    Args:
+        source: Path, bytes or binary file-like object with the XML
+
+    Returns:
+        dict: {'disks': {name: provider record},
+               'tables': {geom name: {'scheme', 'first', 'last',
+                                      'entries'}}}
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    disks = {}
+    tables = {}
+    class_name = None
+    depth = 0
+    for event, element in ElementTree.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            continue
+        depth -= 1
+        # <mesh> is depth 0, <class> depth 1, its <name> and <geom> depth 2.
+        if depth == 2 and element.tag == 'name':
+            class_name = element.text
+        elif depth == 2 and element.tag == 'geom':
+            if class_name == 'DISK':
+                for provider in element.findall('provider'):
+                    record = _provider_record(provider)
+                    disks[record['name']] = record
+            elif class_name == 'PART':
+                config = element.find('config')
+                table = {
+                    'scheme': config.findtext('scheme', ''),
+                    'first': int(config.findtext('first', '0')),
+                    'last': int(config.findtext('last', '0')),
+                    'entries': [
+                        _provider_record(provider)
+                        for provider in element.findall('provider')
+                    ]
+                }
+                table['entries'].sort(key=lambda entry: int(entry['start']))
+                tables[element.findtext('name')] = table
+            element.clear()
+        elif depth == 1 and element.tag == 'class':
+            class_name = None
+            element.clear()
+    return {'disks': disks, 'tables': tables}
+
+
+def disk_signature(mesh: dict, disk: str) -> str | None:
+    """Compute a change signature for a disk and its partition tables.
+
+    The signature only changes when the media, the partition table of the
+    disk or the BSD labels of its slices change, so it can be used to tell
+    whether a previous probe of the disk is still valid.
+
+    Args:
+        mesh (dict): Parsed GEOM tree from parse_confxml()
+        disk (str): Disk device name (e.g., 'ada0')
+
+    Returns:
+        str or None: Hex digest, or None if the disk is not in the tree
+    """
+    if disk not in mesh['disks']:
+        return None
+    state = [mesh['disks'][disk]]
+    table = mesh['tables'].get(disk)
+    if table is not None:
+        state.append(table)
+        for entry in table['entries']:
+            state.append(mesh['tables'].get(entry['name']))
+    return hashlib.sha1(repr(state).encode()).hexdigest()
+
+
+def _table_layout(table: dict, sectorsize: int) -> list:
+    """List the partitions and free segments of a partition table in order.
+
+    Free segments smaller than 1 MB, like the gap GPT leaves before its
+    first aligned partition, are left out.
+
+    Args:
+        table (dict): Partition table from parse_confxml()
+        sectorsize (int): Sector size of the underlying provider
+
+    Returns:
+        list: (entry or None for free space, first sector, size in sectors)
+            tuples
+    """
+    layout = []
+    next_free = table['first']
+    min_free = max(1, mebibyte // sectorsize)
+    for entry in table['entries']:
+        start = int(entry['start'])
+        if start - next_free >= min_free:
+            layout.append((None, next_free, start - next_free))
+        layout.append((entry, start, int(entry['end']) - start + 1))
+        next_free = int(entry['end']) + 1
+    if table['last'] + 1 - next_free >= min_free:
+        layout.append((None, next_free, table['last'] - next_free + 1))
+    return layout
+
+
+def _layout_table(mesh: dict, table: dict, sectorsize: int,
+                  labels: bool) -> PartitionTable:
+    """Build a PartitionTable from a partition table of the GEOM tree.
+
+    Args:
+        mesh (dict): Parsed GEOM tree from parse_confxml()
+        table (dict): Partition table from parse_confxml()
+        sectorsize (int): Sector size of the underlying provider
+        labels (bool): Also build the BSD label tables of the entries
+
+    Returns:
+        PartitionTable: Partitions and free segments of the table
+    """
+    partition_db = PartitionTable(sectorsize=sectorsize)
+    free_num = 1
+    for entry, start, size in _table_layout(table, sectorsize):
+        if entry is None:
+            partition_db.append(Partition.free(f'freespace{free_num}', size, start))
+            free_num += 1
+        else:
+            partition_db.append(Partition(
+                entry['name'],
+                size,
+                file_system=entry.get('type', ''),
+                partitions=label_database(mesh, entry['name']) if labels else None,
+                start=start
+            ))
+    return partition_db
+
+
+def label_database(mesh: dict, partition_slice: str) -> PartitionTable:
+    """Build the BSD label table of an MBR slice.
+
+    Args:
+        mesh (dict): Parsed GEOM tree from parse_confxml()
+        partition_slice (str): Slice provider name (e.g., 'ada0s1')
+
+    Returns:
+        PartitionTable: Labels of the slice, empty if it has no label
+    """
+    table = mesh['tables'].get(partition_slice)
+    if table is None:
+        return PartitionTable()
+    sectorsize = table['entries'][0]['sectorsize'] if table['entries'] else 512
+    return _layout_table(mesh, table, sectorsize, False)
+
+
+def partition_database(mesh: dict, disk: str) -> PartitionTable:
+    """Build the partition table of a disk.
+
+    Args:
+        mesh (dict): Parsed GEOM tree from parse_confxml()
+        disk (str): Disk device name (e.g., 'ada0')
+
+    Returns:
+        PartitionTable: Partitions or slices of the disk
+    """
+    table = mesh['tables'][disk]
+    sectorsize = mesh['disks'][disk]['sectorsize']
+    return _layout_table(mesh, table, sectorsize, table['scheme'] != 'GPT')
+
+
+def disk_database(mesh: dict, disks: list[str]) -> dict:
+    """Build the DiskPartition database for the given disks.
+
+    Args:
+        mesh (dict): Parsed GEOM tree from parse_confxml()
+        disks (list): Disk device names, in the order to keep
+
+    Returns:
+        dict: Disk records keyed by name in the DiskPartition.disk_database
+            format, disks missing from the GEOM tree are left out
+    """
+    disk_db = {}
+    for disk in disks:
+        disk_info = mesh['disks'].get(disk)
+        if disk_info is None:
+            continue
+        if disk in mesh['tables']:
+            scheme = 'GPT' if mesh['tables'][disk]['scheme'] == 'GPT' else 'MBR'
+            part_db = partition_database(mesh, disk)
+        else:
+            scheme = None
+            part_db = None
+        disk_db[disk] = Disk(
+            disk,
+            scheme,
+            disk_info['mediasize'] // disk_info['sectorsize'],
+            sectorsize=disk_info['sectorsize'],
+            device_model=disk_info.get('descr', ''),
+            stripesize=disk_info['stripesize'],
+            partitions=part_db
+        )
+    return disk_db
@@ -0,0 +1,376 @@
+"""
+Privileged command helper for GhostBSD Install Station.
+
+Running every privileged command through its own sudo pays for sudo, PAM
+and the shell each time, dozens of times while the disks are partitioned.
+PrivilegedHelper instead starts serve() once as root, with Python in
+isolated mode and the directory of the installed package as the only
+addition to sys.path, so nothing is imported from the current directory
+or the environment. CommandRunner sends it the privileged argument lists
+while it runs.
+Requests and replies are JSON lines on the standard input and output of
+the helper. The helper runs each request on its own thread with
+CommandRunner, without a shell, so requests on different disks overlap,
+and sends the output of streamed commands back line by line.
+
+The helper first sends {'ready': True}. If it does not before
+start_timeout, e.g. because sudo asks for a password or refuses, it is
+not used and the commands run through their own sudo.
+
+Requests:
+    {'id': n, 'argv': [...], 'input': str or None, 'timeout': float or None}
+    {'id': n, 'argv': [...], 'stream': True, 'terminal': bool}
+
+Replies, in order for a request:
+    {'id': n, 'pid': pid} once the command is started, its process group
+    {'id': n, 'line': str} for each output line of a streamed command
+    {'id': n, 'stdout': str, 'stderr': str, 'returncode': int} at the end,
+        without stdout and stderr for a streamed command
+    {'id': n, 'timeout': float} instead if the command timed out and was
+        killed
+    {'id': n, 'error': str, 'errno': int} instead if it could not be started
+"""
+import errno
+import json
+import os
+import sys
+from queue import SimpleQueue
+from subprocess import Popen, PIPE, TimeoutExpired
+from threading import Event, Lock, Thread
+from install_station.commands import CommandRunner, CommandTimeout
+
+
+class HelperRequest:
+    """
+    A command running in the helper, used by CommandRunner like a Popen.
+
+    Attributes:
+        id (int): Request number
+        argv (list): Argument list of the command
+        pid (int or None): Process group of the command, once started
+        returncode (int or None): Exit code, once the command finished
+    """
+
+    def __init__(self, ident: int, argv: list):
+        self.id = ident
+        self.argv = argv
+        self.pid = None
+        self.returncode = None
+        self.replies = SimpleQueue()
+
+    def _next(self) -> dict:
+        """
+        Wait for the next reply to the request.
+
+        Raises:
+            OSError: If the command could not be started, or the helper exited
+        """
+        reply = self.replies.get()
+        if 'error' in reply:
+            raise OSError(reply['errno'], reply['error'], self.argv[0])
+        return reply
+
+    def started(self) -> None:
+        """Wait for the command to be started and get its process group."""
+        self.pid = self._next()['pid']
+
+    def communicate(self, input: str | None = None,
+                    timeout: float | None = None) -> tuple[str, str]:
+        """
+        Wait for the command to finish.
+
+        The input and timeout were sent with the request, they are only
+        accepted for Popen compatibility.
+
+        Returns:
+            tuple: Standard output and error of the command
+
+        Raises:
+            TimeoutExpired: If the helper killed the command after its timeout
+        """
+        reply = self._next()
+        if 'timeout' in reply:
+            raise TimeoutExpired(self.argv, reply['timeout'])
+        self.returncode = reply['returncode']
+        return reply['stdout'], reply['stderr']
+
+    def __iter__(self):
+        """Yield the output lines of a streamed command until it exits."""
+        if self.returncode is not None:
+            return
+        while True:
+            reply = self._next()
+            if 'line' not in reply:
+                self.returncode = reply['returncode']
+                return
+            yield reply['line']
+
+    def wait(self) -> int:
+        """
+        Wait for a streamed command to exit, dropping the rest of its output.
+
+        Returns:
+            int: Exit code of the command
+        """
+        for _line in self:
+            pass
+        return self.returncode
+
+
+class PrivilegedHelper:
+    """
+    Client of the privileged helper process.
+
+    Attributes:
+        process (Popen or None): sudo running the helper
+        requests (int): Commands sent to the helper since it started
+        start_timeout (float): Seconds to wait for the helper to be ready
+    """
+    process: Popen | None = None
+    requests: int = 0
+    start_timeout: float = 10.0
+    _pending: dict = {}
+    _ready = Event()
+    _ready_ok: bool = False
+    _closed: bool = True
+    _lock = Lock()
+    _write_lock = Lock()
+
+    @classmethod
+    def running(cls) -> bool:
+        """bool: True while the helper can take requests."""
+        # The output of the helper can end before it can be waited for.
+        return cls.process is not None and not cls._closed and cls.process.poll() is None
+
+    @classmethod
+    def start(cls) -> bool:
+        """
+        Start the helper and route the privileged commands through it.
+
+        Nothing is started in replay mode. If sudo or the helper cannot be
+        started, or the helper is not ready within start_timeout, the
+        commands keep running through their own sudo.
+
+        Returns:
+            bool: True if the helper is running
+        """
+        if cls.running():
+            return True
+        if CommandRunner.mode == 'replay':
+            return False
+        package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        bootstrap = (
+            f'import sys; sys.path.insert(0, {package_parent!r}); '
+            'from install_station.helper import serve; serve()'
+        )
+        try:
+            process = Popen(
+                ['sudo', sys.executable, '-I', '-c', bootstrap],
+                stdin=PIPE,
+                stdout=PIPE,
+                universal_newlines=True,
+                close_fds=True
+            )
+        except OSError as e:
+            print(f'Privileged helper not started: {e}')
+            return False
+        cls.requests = 0
+        cls._pending = {}
+        cls._ready = Event()
+        cls._ready_ok = False
+        cls._closed = False
+        Thread(target=cls._read_replies, args=(process,), daemon=True).start()
+        if not cls._ready.wait(cls.start_timeout) or not cls._ready_ok:
+            print('Privileged helper not ready, running commands through sudo')
+            try:
+                process.terminate()
+                process.stdin.close()
+            except OSError:
+                pass
+            return False
+        cls.process = process
+        CommandRunner.helper = cls
+        return True
+
+    @classmethod
+    def stop(cls, timeout: float = 5.0) -> None:
+        """
+        Stop the helper once the commands it runs have finished.
+
+        Args:
+            timeout: Seconds to wait for the helper to exit
+        """
+        if CommandRunner.helper is cls:
+            CommandRunner.helper = None
+        process = cls.process
+        if process is None:
+            return
+        cls.process = None
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout)
+        except TimeoutExpired:
+            print('Privileged helper did not exit')
+
+    @classmethod
+    def submit(cls, argv: list, input: str | None = None, timeout: float | None = None,
+               stream: bool = False, terminal: bool = False) -> HelperRequest:
+        """
+        Run a command in the helper.
+
+        Args:
+            argv: Argument list of the command
+            input: Text written to the standard input of the command
+            timeout: Seconds after which the helper kills the command
+            stream: Send the output back line by line, merged with errors
+            terminal: Run a streamed command on a pseudo-terminal
+
+        Returns:
+            HelperRequest: The started command
+
+        Raises:
+            OSError: If the command could not be started, or the helper exited
+        """
+        with cls._lock:
+            if cls._closed:
+                raise OSError(errno.EPIPE, 'Privileged helper is not running')
+            cls.requests += 1
+            request = HelperRequest(cls.requests, list(argv))
+            cls._pending[request.id] = request
+        message = {'id': request.id, 'argv': request.argv}
+        if stream:
+            message.update(stream=True, terminal=terminal)
+        else:
+            message.update(input=input, timeout=timeout)
+        try:
+            with cls._write_lock:
+                cls.process.stdin.write(json.dumps(message) + '\n')
+                cls.process.stdin.flush()
+        except (OSError, AttributeError, ValueError):
+            # The helper exited or was stopped meanwhile.
+            with cls._lock:
+                cls._pending.pop(request.id, None)
+            raise OSError(errno.EPIPE, 'Privileged helper is not running') from None
+        request.started()
+        return request
+
+    @classmethod
+    def _read_replies(cls, process: Popen) -> None:
+        """Hand the replies of the helper to their requests, until it exits."""
+        for line in process.stdout:
+            reply = json.loads(line)
+            if 'ready' in reply:
+                cls._ready_ok = True
+                cls._ready.set()
+                continue
+            with cls._lock:
+                request = cls._pending.get(reply['id'])
+                if request is not None and 'line' not in reply and 'pid' not in reply:
+                    del cls._pending[reply['id']]
+            if request is not None:
+                request.replies.put(reply)
+        with cls._lock:
+            cls._closed = True
+            lost = list(cls._pending.values())
+            cls._pending = {}
+        for request in lost:
+            request.replies.put(
+                {'id': request.id, 'error': 'Privileged helper exited', 'errno': errno.EPIPE}
+            )
+        # Wakes start() up if the helper exited before being ready.
+        cls._ready.set()
+
+
+class _PidReporter:
+    """Stands in for a CancelToken in the helper to report process groups."""
+
+    def __init__(self, ident: int, reply):
+        self.ident = ident
+        self.reply = reply
+
+    def check(self) -> None:
+        """The installer cancels the commands by their process group."""
+
+    def track(self, process, _privileged: bool) -> None:
+        """Report the process group of a started command."""
+        self.reply({'id': self.ident, 'pid': process.pid})
+
+    def untrack(self, _process) -> None:
+        """Nothing to forget, the command is not tracked."""
+
+
+def handle(request: dict, reply) -> None:
+    """
+    Run a request in the helper and send its replies.
+
+    Args:
+        request: Decoded request line
+        reply: Called with each reply
+    """
+    ident = request['id']
+    reporter = _PidReporter(ident, reply)
+    try:
+        if request.get('stream'):
+            lines = CommandRunner.stream(
+                request['argv'], terminal=request['terminal'], cancel=reporter
+            )
+            while True:
+                try:
+                    reply({'id': ident, 'line': next(lines)})
+                except StopIteration as stop:
+                    reply({'id': ident, 'returncode': stop.value.returncode})
+                    break
+        else:
+            result = CommandRunner.run(
+                request['argv'], input=request['input'], cancel=reporter,
+                timeout=request['timeout']
+            )
+            reply({
+                'id': ident,
+                'stdout': result.stdout,
+                'stderr': result.stderr,
+                'returncode': result.returncode
+            })
+    except CommandTimeout as e:
+        reply({'id': ident, 'timeout': e.timeout})
+    except OSError as e:
+        reply({'id': ident, 'error': e.strerror or str(e), 'errno': e.errno or errno.EIO})
+
+
+def serve(requests=sys.stdin, replies=sys.stdout) -> None:
+    """
+    Answer requests until the standard input is closed.
+
+    Commands still running then are waited for before returning.
+
+    Args:
+        requests: File the request lines are read from
+        replies: File the reply lines are written to
+    """
+    CommandRunner.go_live()
+    lock = Lock()
+
+    def reply(message):
+        with lock:
+            replies.write(json.dumps(message) + '\n')
+            replies.flush()
+
+    reply({'ready': True})
+    threads = []
+    for line in requests:
+        if line.strip():
+            thread = Thread(target=handle, args=(json.loads(line), reply))
+            thread.start()
+            threads.append(thread)
+            threads = [thread for thread in threads if thread.is_alive()]
+            # The installer logs the commands, the helper does not keep them.
+            CommandRunner.reset_log()
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == '__main__':
+    serve()
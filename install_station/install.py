@@ -2,23 +2,34 @@ import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk, GLib, Gdk
 import threading
-from subprocess import Popen, PIPE, STDOUT
-from time import sleep
-from install_station.partition import (
-    delete_partition,
-    destroy_partition,
-    add_partition
+import traceback
+from functools import partial
+from install_station.disk_plan import (
+    PlanErrors,
+    compile_plan,
+    describe_plan,
+    execute_plan,
+    planned_changes
 )
+from install_station.cancel import CancelToken, InstallCancelled
+from install_station.coalesce import UpdateCoalescer
+from install_station.commands import CommandRunner, command_line
 from install_station.create_cfg import Configuration
+from install_station.devfs import DeviceWait
 from install_station.end import EndWindow
 from install_station.error import ErrorWindow
+from install_station.helper import PrivilegedHelper
+from install_station.journal import InstallJournal
+from install_station.progress import ProgressEngine
+from install_station.report import InstallReport
 from install_station.window import Window
 from install_station.data import (
     gif_logo,
     InstallationData,
     installation_config,
     pc_sysinstall,
-    get_text
+    get_text,
+    N_
 )
 
 
@@ -33,53 +44,131 @@ styleContext.add_provider_for_screen(
 )
 
 
-def update_progress(progressbar, text):
+def update_progress(progressbar, text, fraction=None):
     """
-    This method
+    Show a message on the progress bar.
+
+    Args:
+        progressbar: Progress bar of the installation
+        text: Message, cut to 80 characters
+        fraction: Share of the installation done, unchanged if None
     """
-    new_val = progressbar.get_fraction() + 0.000003
-    progressbar.set_fraction(new_val)
+    if fraction is not None:
+        progressbar.set_fraction(fraction)
     progressbar.set_text(text[0:80])
 
 
-def read_output(command, progressbar):
-    GLib.idle_add(update_progress, progressbar, get_text("Creating ghostbsd_installation.cfg"))
-    Configuration.create_cfg()
-    sleep(1)
-    if InstallationData.delete:
-        GLib.idle_add(update_progress, progressbar, get_text("Deleting partition"))
-        delete_partition()
-        sleep(1)
-    # destroy disk partition and create scheme
-    if InstallationData.destroy:
-        GLib.idle_add(update_progress, progressbar, get_text("Creating disk partition"))
-        destroy_partition()
-        sleep(1)
-    # create partition
-    if InstallationData.create:
-        GLib.idle_add(update_progress, progressbar, get_text("Creating new partitions"))
-        add_partition()
-        sleep(1)
-    progressbar_text = None
-    process = Popen(
-        command, shell=True, stdin=PIPE, stdout=PIPE, stderr=STDOUT, close_fds=True, universal_newlines=True
-    )
-    while True:
-        line = process.stdout.readline()
-        if not line:
-            break
-        progressbar_text = line.rstrip()
-        GLib.idle_add(update_progress, progressbar, progressbar_text)
-        # Those for next 4 line is for debugging only.
-        # filer = open(f"{tmp}/tmp", "a")
-        # filer.writelines(progressbar_text)
-        # filer.close
-        print(progressbar_text)
-    if progressbar_text.rstrip() == "Installation finished!":
+def show_result(finished, interrupted):
+    """
+    Replace the main window with the end or the error window.
+
+    Args:
+        finished: Whether the installation finished
+        interrupted: Phase the installation was cancelled in, if it was
+    """
+    if finished:
         EndWindow()
     else:
-        ErrorWindow()
+        ErrorWindow(interrupted, retry=InstallProgress.retry)
     Window.hide()
+    return False
+
+
+def read_output(command, progressbar, cancel, retry=False):
+    # Updates are shown by a main loop timer, at most one per interval.
+    updates = UpdateCoalescer(partial(update_progress, progressbar))
+    GLib.timeout_add(updates.milliseconds, updates.flush)
+    # Also resets the command and device wait logs.
+    InstallReport.begin()
+    progressbar_text = None
+    interrupted = None
+    error = None
+    try:
+        # Privileged commands go through one helper instead of a sudo each.
+        PrivilegedHelper.start()
+        cancel.enter(N_("Writing the installation configuration"))
+        updates.post(get_text("Creating ghostbsd_installation.cfg"))
+        with InstallReport.phase('configuration'):
+            Configuration.create_cfg()
+        plans = []
+        if InstallationData.install_type == "custom":
+            # Only the difference between the probed and the edited disks is
+            # applied, a retry probes the disks the failed attempt changed.
+            plans = compile_plan(changes=planned_changes(rescan=retry))
+        plan_lines = describe_plan(plans)
+        for plan_line in plan_lines:
+            InstallReport.log(plan_line)
+        InstallJournal.open(InstallJournal.config_fingerprint(installation_config, plan_lines))
+        # A retry skips the disks changed by the failed attempt.
+        pending_plans = InstallJournal.pending_plans(plans) if plans else []
+        for plan in plans:
+            if plan not in pending_plans:
+                InstallReport.log(f"{plan.disk}: partition changes already applied")
+        if pending_plans:
+            cancel.enter(N_("Applying partition changes"))
+            updates.post(get_text("Creating disk partition"))
+            with InstallReport.phase('partitioning'):
+                try:
+                    committed = execute_plan(pending_plans)
+                except PlanErrors as e:
+                    InstallJournal.record_plans(e.committed)
+                    raise
+                InstallJournal.record_plans(committed)
+        for device, present, seconds in DeviceWait.log:
+            InstallReport.log(
+                f"{device} {'appeared' if present else 'went away'} after {seconds:.3f}s"
+            )
+        cancel.enter(N_("Installing the system"))
+        progress = ProgressEngine()
+        with InstallReport.phase('pc-sysinstall'):
+            for line in CommandRunner.stream(command, privileged=True, terminal=True, cancel=cancel):
+                progressbar_text = line.rstrip()
+                phase = progress.phase
+                state = progress.feed(line)
+                if state.phase != phase:
+                    InstallReport.stage(state.phase)
+                    cancel.phase = state.phase
+                if state.phase is not None:
+                    text = f"{state.fraction:.0%} {get_text(state.phase)}: {progressbar_text}"
+                else:
+                    text = progressbar_text
+                updates.post(text, state.fraction)
+                InstallReport.log(progressbar_text)
+        cancel.check()
+    except InstallCancelled as e:
+        interrupted = e.phase or N_("Starting the installation")
+        InstallReport.log(f"Installation cancelled during: {interrupted}")
+    except PlanErrors as e:
+        error = str(e)
+        InstallReport.log(error)
+    except Exception as e:
+        # Anything else still ends with the error window and its Retry button.
+        error = f"{type(e).__name__}: {e}"
+        InstallReport.log(traceback.format_exc().rstrip())
+    finally:
+        PrivilegedHelper.stop()
+        InstallReport.log(f"Privileged commands run by the helper: {PrivilegedHelper.requests}")
+        updates.close()
+        InstallReport.log(
+            "Progress updates: {posted} posted, {delivered} shown, {dropped} dropped".format(
+                **updates.stats()
+            )
+        )
+        finished = (error is None and progressbar_text is not None
+                    and progressbar_text.rstrip() == "Installation finished!")
+        if finished:
+            InstallJournal.clear()
+        returncode = next((
+            code for line, code, _seconds in reversed(CommandRunner.log)
+            if line == command_line(command, privileged=True)
+        ), None)
+        try:
+            report = InstallReport.write(finished, returncode, interrupted, error)
+            print(f"Installation report: {report}")
+        except OSError as e:
+            print(f"Installation report not written: {e}")
+        # Also shown after a cancel, naming the phase it stopped in.
+        GLib.idle_add(show_result, finished, interrupted)
 
 
 class InstallWindow:
@@ -128,21 +217,110 @@ class InstallWindow:
 
 
 class InstallProgress:
+    """
+    Progress bar of the installation, which runs on a worker thread.
+
+    Attributes:
+        cancel_token (CancelToken or None): Token of the running installation
+        thread (Thread or None): Worker thread of the running installation
+        cancel_button (Gtk.Button or None): Cancels the installation
+    """
+    cancel_token: CancelToken | None = None
+    thread: threading.Thread | None = None
+    progressbar: Gtk.ProgressBar | None = None
+    cancel_button: Gtk.Button | None = None
 
     def __init__(self):
         self.pbar = Gtk.ProgressBar()
         self.pbar.set_show_text(True)
-        command = f'sudo {pc_sysinstall} -c {installation_config}'
-        thread = threading.Thread(
+        InstallProgress.progressbar = self.pbar
+        self.button = Gtk.Button(label=get_text("Cancel"))
+        self.button.connect("clicked", lambda _widget: InstallProgress.confirm_cancel())
+        InstallProgress.cancel_button = self.button
+        InstallProgress.start()
+        self.pbar.show()
+        self.button.show()
+
+    @classmethod
+    def start(cls, retry=False):
+        """
+        Run the installation on a worker thread.
+
+        Args:
+            retry: Whether a failed installation ran before
+        """
+        command = [pc_sysinstall, '-c', installation_config]
+        cls.cancel_token = CancelToken()
+        cls.thread = threading.Thread(
             target=read_output,
             args=(
                 command,
-                self.pbar
+                cls.progressbar,
+                cls.cancel_token,
+                retry
             ),
             daemon=True
         )
-        thread.start()
-        self.pbar.show()
+        cls.thread.start()
+
+    @classmethod
+    def retry(cls):
+        """Run the installation again on the disks as the failed one left them."""
+        cls.progressbar.set_fraction(0.0)
+        cls.cancel_button.set_sensitive(True)
+        Window.show_all()
+        cls.start(retry=True)
+
+    @classmethod
+    def running(cls) -> bool:
+        """bool: True while the installation thread runs."""
+        return cls.thread is not None and cls.thread.is_alive()
+
+    @classmethod
+    def cancel(cls, timeout=10.0):
+        """
+        Cancel the running installation, if any, and wait for it to stop.
+
+        Args:
+            timeout: Seconds to wait for the installation thread, 0 to
+                return at once and let the main loop show the result
+        """
+        if cls.cancel_token is None:
+            return
+        cls.cancel_token.cancel()
+        cls.thread.join(timeout)
+
+    @classmethod
+    def confirm_cancel(cls) -> bool:
+        """
+        Ask the user to confirm, then cancel the running installation.
+
+        The main loop keeps running, the installation thread ends with the
+        error window naming the phase it was cancelled in.
+
+        Returns:
+            bool: True if the installation is being cancelled
+        """
+        dialog = Gtk.MessageDialog(
+            transient_for=Window.window,
+            modal=True,
+            message_type=Gtk.MessageType.QUESTION,
+            buttons=Gtk.ButtonsType.YES_NO,
+            text=get_text("Cancel the installation?")
+        )
+        dialog.format_secondary_text(get_text("The disks may be left partly installed."))
+        response = dialog.run()
+        dialog.destroy()
+        # The installation may have ended while the question was asked.
+        if response != Gtk.ResponseType.YES or not cls.running():
+            return False
+        cls.cancel_button.set_sensitive(False)
+        cls.progressbar.set_text(get_text("Cancelling the installation..."))
+        cls.cancel(timeout=0)
+        return True
 
     def get_progressbar(self):
         return self.pbar
+
+    def get_cancel_button(self):
+        return self.button
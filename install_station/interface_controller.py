@@ -3,12 +3,17 @@ Interface Controller Module.
 
 This module provides the main navigation interface and button controls
 for the Install Station GTK application wizard.
+
+Only the welcome page is imported when the window is built. The other
+page modules query the system for their data when they are imported, so
+they are imported the first time their page is shown.
 """
+import sys
+from importlib import import_module
 import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk
-from install_station.install import InstallProgress, InstallWindow
-from install_station.partition import DiskPartition
+from install_station.disk_rescan import DiskRescan
 from install_station.window import Window
 from install_station.data import InstallationData, get_text
 from install_station.system_calls import localize_system, set_keyboard
@@ -101,7 +106,21 @@ class Interface:
     Manages the GTK Notebook pages and navigation between different
     screens in the installation process including language, keyboard,
     network setup, installation type, and configuration screens.
+
+    The page attributes are None until load() imports their module, a
+    page class can also be assigned to them directly.
     """
+    pages: dict = {
+        'welcome': ('install_station.language', 'Language'),
+        'keyboard': ('install_station.keyboard', 'Keyboard'),
+        'network_setup': ('install_station.network_setup', 'NetworkSetup'),
+        'try_install': ('install_station.try_install', 'TryOrInstall'),
+        'installation_type': ('install_station.install_type', 'InstallTypes'),
+        'custom_partition': ('install_station.custom', 'PartitionManager'),
+        'full_zfs': ('install_station.use_zfs', 'ZFS'),
+        'boot_manager': ('install_station.boot_manager', 'BootManager'),
+    }
+    """Module and class of each page attribute."""
     welcome = None
     keyboard = None
     network_setup = None
@@ -113,6 +132,24 @@ class Interface:
     page: Gtk.Notebook = Gtk.Notebook()
     nbButton: Gtk.Notebook | None = None
 
+    @classmethod
+    def load(cls, name: str):
+        """
+        Get a page class, importing its module the first time.
+
+        Args:
+            name: Page attribute name, a key of pages
+
+        Returns:
+            The page class
+        """
+        page_class = getattr(cls, name)
+        if page_class is None:
+            module_name, class_name = cls.pages[name]
+            page_class = getattr(import_module(module_name), class_name)
+            setattr(cls, name, page_class)
+        return page_class
+
     @classmethod
     def get_interface(cls) -> Gtk.Box:
         interface_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, homogeneous=False, spacing=0)
@@ -123,8 +160,9 @@ class Interface:
         cls.page.set_show_border(False)
         welcome_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, homogeneous=False, spacing=0)
         welcome_box.show()
-        cls.welcome.initialize()
-        get_types = cls.welcome.get_model()
+        welcome = cls.load('welcome')
+        welcome.initialize()
+        get_types = welcome.get_model()
         welcome_box.pack_start(get_types, True, True, 0)
         Window.set_title(get_text("Welcome to GhostBSD"))
         label = Gtk.Label(label=get_text("Welcome to GhostBSD"))
@@ -141,10 +179,26 @@ class Interface:
         return interface_box
 
     @classmethod
-    def delete(cls, _widget: Gtk.Widget, _event=None) -> None:
-        """Close the main window."""
+    def delete(cls, _widget: Gtk.Widget, _event=None) -> bool:
+        """
+        Close the main window.
+
+        While the installation runs, the window stays open: the user is
+        asked to cancel it, like with the Cancel button of the progress
+        page, and the error window is shown once it stopped.
+
+        Returns:
+            bool: True to keep the main window open
+        """
+        # Importing install.py would load its CSS on the way out, if the
+        # installation page was never shown there is nothing to cancel.
+        install = sys.modules.get('install_station.install')
+        if install is not None and install.InstallProgress.running():
+            install.InstallProgress.confirm_cancel()
+            return True
         InstallationData.reset()
         Gtk.main_quit()
+        return False
 
     @classmethod
     def next_page(cls, _widget: Gtk.Button) -> None:
@@ -155,7 +209,7 @@ class Interface:
             if cls.page.get_n_pages() <= 1:
                 keyboard_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, homogeneous=False, spacing=0)
                 keyboard_box.show()
-                get_keyboard = cls.keyboard.get_model()
+                get_keyboard = cls.load('keyboard').get_model()
                 keyboard_box.pack_start(get_keyboard, True, True, 0)
                 label = Gtk.Label(label=get_text("Keyboard Setup"))
                 cls.page.insert_page(keyboard_box, label, 1)
@@ -167,7 +221,7 @@ class Interface:
             if cls.page.get_n_pages() <= 2:
                 network_setup_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, homogeneous=False, spacing=0)
                 network_setup_box.show()
-                get_network_setup = cls.network_setup.get_model()
+                get_network_setup = cls.load('network_setup').get_model()
                 network_setup_box.pack_start(get_network_setup, True, True, 0)
                 label = Gtk.Label(label=get_text("Network Setup"))
                 cls.page.insert_page(network_setup_box, label, 2)
@@ -178,7 +232,7 @@ class Interface:
             if cls.page.get_n_pages() <= 3:
                 try_install_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, homogeneous=False, spacing=0)
                 try_install_box.show()
-                get_try_install = cls.try_install.get_model()
+                get_try_install = cls.load('try_install').get_model()
                 try_install_box.pack_start(get_try_install, True, True, 0)
                 label = Gtk.Label(label=get_text("Try Or Install GhostBSD"))
                 cls.page.insert_page(try_install_box, label, 3)
@@ -189,7 +243,7 @@ class Interface:
                 if cls.page.get_n_pages() <= 4:
                     type_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, homogeneous=False, spacing=0)
                     type_box.show()
-                    get_types = cls.installation_type.get_model()
+                    get_types = cls.load('installation_type').get_model()
                     type_box.pack_start(get_types, True, True, 0)
                     label = Gtk.Label(label=get_text("Installation Types"))
                     cls.page.insert_page(type_box, label, 4)
@@ -218,7 +272,7 @@ class Interface:
             if InstallationData.install_type == "custom":
                 custom_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, homogeneous=False, spacing=0)
                 custom_box.show()
-                get_part = cls.custom_partition.get_model()
+                get_part = cls.load('custom_partition').get_model()
                 custom_box.pack_start(get_part, True, True, 0)
                 label = Gtk.Label(label=get_text("Custom Configuration"))
                 cls.page.insert_page(custom_box, label, 5)
@@ -228,7 +282,7 @@ class Interface:
             elif InstallationData.install_type == "zfs":
                 zfs_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, homogeneous=False, spacing=0)
                 zfs_box.show()
-                get_zfs = cls.full_zfs.get_model()
+                get_zfs = cls.load('full_zfs').get_model()
                 zfs_box.pack_start(get_zfs, True, True, 0)
                 label = Gtk.Label(label=get_text("ZFS Configuration"))
                 cls.page.insert_page(zfs_box, label, 5)
@@ -243,7 +297,7 @@ class Interface:
 
             boot_manager_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, homogeneous=False, spacing=0)
             boot_manager_box.show()
-            get_root = cls.boot_manager.get_model()
+            get_root = cls.load('boot_manager').get_model()
             boot_manager_box.pack_start(get_root, True, True, 0)
             label = Gtk.Label(label=get_text("Boot Option"))
             cls.page.insert_page(boot_manager_box, label, 6)
@@ -252,6 +306,7 @@ class Interface:
             cls.page.show_all()
             Button.next_button.set_sensitive(True)
         elif page == 6:
+            from install_station.install import InstallProgress, InstallWindow
             installation_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, homogeneous=False, spacing=0)
             installation_box.show()
             install_window = InstallWindow()
@@ -265,7 +320,11 @@ class Interface:
             box1 = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, homogeneous=False, spacing=0)
             box1.show()
             label = Gtk.Label(label=get_text("Progress Bar"))
-            box1.pack_end(progressbar, False, False, 0)
+            progress_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, homogeneous=False, spacing=5)
+            progress_box.show()
+            progress_box.pack_start(progressbar, True, True, 0)
+            progress_box.pack_end(installation_progressbar.get_cancel_button(), False, False, 0)
+            box1.pack_end(progress_box, False, False, 0)
             cls.nbButton.insert_page(box1, label, 1)
             cls.nbButton.next_page()
         current_page_widget = cls.page.get_nth_page(cls.page.get_current_page())
@@ -284,17 +343,18 @@ class Interface:
         new_page = cls.page.get_current_page()
         if current_page == 1 and new_page == 0:
             # Reset partition configuration data when going back
-            InstallationData.destroy = {}
-            InstallationData.delete = []
-            InstallationData.create = []
             InstallationData.new_partition = []
             InstallationData.scheme = ""
             InstallationData.disk = ""
             InstallationData.slice = ""
             InstallationData.zfs_config_data = []
             InstallationData.ufs_config_data = []
-            # Clean up temporary directory if it exists
-            DiskPartition.create_partition_database()
+            # Rescan the disks in the background, refreshing the custom
+            # partition page if it was already shown
+            if cls.custom_partition is not None and cls.custom_partition.vbox1 is not None:
+                cls.custom_partition.rescan()
+            else:
+                DiskRescan.start()
         current_page_widget = cls.page.get_nth_page(cls.page.get_current_page())
         title_text = cls.page.get_tab_label_text(current_page_widget)
         Window.set_title(title_text)
@@ -0,0 +1,142 @@
+"""
+Installation journal for GhostBSD Install Station.
+
+Records the steps of the installation that completed, with a fingerprint
+of the configuration they were made for, so a retry after a failure does
+not redo them. A disk whose partition plan was committed is skipped on
+retry if its GEOM signature still is the one recorded after the commit.
+
+pc-sysinstall runs as a single command that partitions, creates the file
+systems, copies the system and installs the boot loader, so it cannot be
+resumed part way: a retry always runs all of it. The journal is removed
+once the installation finished.
+"""
+import hashlib
+import json
+import os
+from install_station.data import tmp
+from install_station.geom import disk_signature
+from install_station.partition import DiskPartition
+
+
+class InstallJournal:
+    """
+    Completed installation steps.
+
+    Attributes:
+        path (str): JSON file the journal is kept in
+        fingerprint (str): Fingerprint of the configuration being installed
+        steps (dict): State signature by completed step name
+    """
+    path: str = f'{tmp}/install-station-journal.json'
+    fingerprint: str = ''
+    steps: dict = {}
+
+    @staticmethod
+    def config_fingerprint(config_path: str, plan_lines: list) -> str:
+        """
+        Fingerprint the installation configuration and partition plans.
+
+        Args:
+            config_path: pc-sysinstall configuration file
+            plan_lines: Partition plans from describe_plan()
+
+        Returns:
+            str: Hex digest
+        """
+        digest = hashlib.sha256()
+        with open(config_path, 'rb') as config_file:
+            digest.update(config_file.read())
+        digest.update('\n'.join(plan_lines).encode())
+        return digest.hexdigest()
+
+    @classmethod
+    def open(cls, fingerprint: str) -> None:
+        """
+        Load the journal of a configuration.
+
+        Steps recorded for another configuration are forgotten.
+
+        Args:
+            fingerprint: Fingerprint from config_fingerprint()
+        """
+        cls.fingerprint = fingerprint
+        cls.steps = {}
+        try:
+            with open(cls.path) as journal_file:
+                journal = json.load(journal_file)
+        except (OSError, ValueError):
+            return
+        if journal.get('fingerprint') == fingerprint:
+            cls.steps = journal.get('steps', {})
+
+    @classmethod
+    def completed(cls, step: str, state: str | None) -> bool:
+        """
+        Tell if a step completed and left the system in the same state.
+
+        Args:
+            step: Step name
+            state: Current state signature, None if it cannot be known
+
+        Returns:
+            bool: True if the step can be skipped
+        """
+        return state is not None and cls.steps.get(step) == state
+
+    @classmethod
+    def record(cls, step: str, state: str | None) -> None:
+        """
+        Record a completed step.
+
+        Args:
+            step: Step name
+            state: State signature after the step
+        """
+        cls.steps[step] = state
+        journal = {'fingerprint': cls.fingerprint, 'steps': cls.steps}
+        with open(f'{cls.path}.tmp', 'w') as journal_file:
+            json.dump(journal, journal_file, indent=2)
+        os.replace(f'{cls.path}.tmp', cls.path)
+
+    @classmethod
+    def clear(cls) -> None:
+        """Remove the journal once the installation finished."""
+        cls.steps = {}
+        try:
+            os.remove(cls.path)
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def pending_plans(cls, plans: list) -> list:
+        """
+        Leave out the disk plans already applied.
+
+        Args:
+            plans: Plans from compile_plan()
+
+        Returns:
+            list: Plans of the disks not recorded, or changed since
+        """
+        mesh = DiskPartition.read_geom_mesh()
+        return [
+            plan for plan in plans
+            if mesh is None or not cls.completed(
+                f'partition {plan.disk}', disk_signature(mesh, plan.disk)
+            )
+        ]
+
+    @classmethod
+    def record_plans(cls, disks: list) -> None:
+        """
+        Record the disks whose plans were committed.
+
+        Args:
+            disks: Disk names returned by execute_plan()
+        """
+        mesh = DiskPartition.read_geom_mesh()
+        for disk in disks:
+            cls.record(
+                f'partition {disk}', None if mesh is None else disk_signature(mesh, disk)
+            )
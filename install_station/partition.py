@@ -4,11 +4,33 @@ Provides disk partitioning functionality including detection, creation, deletion
 of partitions for GPT/MBR schemes with ZFS support and manages the partition database.
 """
 import re
-from time import sleep
-from subprocess import Popen, PIPE, STDOUT, call
-from install_station.data import query, zfs_datasets, InstallationData
-
-# Define required file paths
+from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import NamedTuple
+from xml.etree.ElementTree import ParseError
+from install_station.commands import CommandRunner, CommandTimeout
+from install_station.data import zfs_datasets, InstallationData
+from install_station.facts import SessionFacts, session_fact
+from install_station.partition_model import (
+    Disk,
+    Partition,
+    PartitionTable,
+    mebibyte,
+    mb_to_sectors,
+    sectors_to_mb
+)
+from install_station.geom import (
+    read_confxml,
+    parse_confxml,
+    disk_database,
+    disk_signature
+)
+
+probe_timeout: float = 15.0
+"""Seconds a probe command may take, a disk it hangs on is quarantined."""
+disk_list_ttl: float = 2.0
+"""Seconds the disk list is reused before kern.disks is read again."""
 
 
 def get_disk_from_partition(part: str) -> str:
@@ -51,93 +73,153 @@ def find_next_partition(partition_name: str, partition_list: list[str]) -> str:
     Returns:
         str: Next available partition name (e.g., 'freespace1', 'ada0p2')
     """
-    for num in range(1, 10000):
-        if f'{partition_name}{num}' not in partition_list:
-            return f'{partition_name}{num}'
+    used = set(partition_list)
+    num = 1
+    while f'{partition_name}{num}' in used:
+        num += 1
+    return f'{partition_name}{num}'
 
 
+@session_fact(ttl=lambda: disk_list_ttl)
 def disk_list() -> list[str]:
     """Get a list of available disk devices on the system.
     
     Queries the FreeBSD kernel for available disks and filters out
-    optical drives (CD/DVD devices).
+    optical drives (CD/DVD devices). The list is reused for
+    disk_list_ttl seconds, or until DiskPartition.invalidate_cache().
     
     Returns:
         list: Sorted list of disk device names (e.g., ['ada0', 'ada1'])
+
+    Raises:
+        CommandTimeout: If sysctl did not answer within probe_timeout
     """
-    disk_popen = Popen(
-        'sysctl -n kern.disks',
-        shell=True,
-        stdin=PIPE,
-        stdout=PIPE,
-        universal_newlines=True,
-        close_fds=True
-    )
-    disks = disk_popen.stdout.read()
+    disks = CommandRunner.run(['sysctl', '-n', 'kern.disks'], timeout=probe_timeout).stdout
     cleaned_disk = re.sub(r'acd[0-9]*|cd[0-9]*|scd[0-9]*', '', disks)
     return sorted(cleaned_disk.split())
 
 
-def device_model(disk: str) -> str:
+class DiskInfo(NamedTuple):
+    """Media information of a disk as reported by diskinfo -v."""
+    name: str
+    sectorsize: int = 512
+    mediasize: int = 0
+    stripesize: int = 0
+    stripeoffset: int = 0
+    cylinders: int = 0
+    heads: int = 0
+    sectors: int = 0
+    description: str = ''
+    ident: str = ''
+    rotation_rate: int | None = None
+
+
+# Map the diskinfo -v comments to DiskInfo fields.
+diskinfo_fields = {
+    'sectorsize': 'sectorsize',
+    'mediasize in bytes': 'mediasize',
+    'stripesize': 'stripesize',
+    'stripeoffset': 'stripeoffset',
+    'Cylinders according to firmware.': 'cylinders',
+    'Heads according to firmware.': 'heads',
+    'Sectors according to firmware.': 'sectors',
+    'Disk descr.': 'description',
+    'Disk ident.': 'ident',
+    'Rotation rate in RPM': 'rotation_rate',
+}
+
+
+def disk_info(disk: str) -> DiskInfo:
+    """Read the media information of a disk with a single diskinfo -v call.
+    
+    Args:
+        disk (str): Disk device name (e.g., 'ada0')
+        
+    Returns:
+        DiskInfo: Sizes, geometry, description, ident and rotation rate
+
+    Raises:
+        CommandTimeout: If diskinfo did not answer within probe_timeout
+    """
+    diskinfo_output = CommandRunner.run(['diskinfo', '-v', disk], timeout=probe_timeout).stdout
+    values = {}
+    for line in diskinfo_output.splitlines():
+        value, _, comment = line.strip().partition('#')
+        value = value.strip()
+        comment = comment.strip()
+        # 'mediasize in bytes (238G)' carries a human size we do not need.
+        field = diskinfo_fields.get(comment.partition(' (')[0])
+        if field is None:
+            continue
+        if field in ('description', 'ident'):
+            values[field] = value
+        elif value.isdigit():
+            values[field] = int(value)
+    return DiskInfo(disk, **values)
+
+
+def device_model(disk: str, info: DiskInfo | None = None) -> str:
     """Get the model description of a disk device.
     
     Args:
         disk (str): Disk device name (e.g., 'ada0')
+        info (DiskInfo, optional): Already read disk_info() record
         
     Returns:
         str: Device model description
     """
-    device_popen = Popen(
-        f"diskinfo -v {disk} 2>/dev/null | grep 'Disk descr' | cut -d '#' -f1 | tr -d '\t'",
-        shell=True,
-        stdin=PIPE,
-        stdout=PIPE,
-        universal_newlines=True,
-        close_fds=True
-    )
-    return device_popen.stdout.read().strip()
-
-
-def disk_size(disk: str) -> str:
+    if info is None:
+        info = disk_info(disk)
+    return info.description
+
+
+def disk_size(disk: str, info: DiskInfo | None = None) -> str:
     """Get the size of a disk device.
     
     Args:
         disk (str): Disk device name (e.g., 'ada0')
+        info (DiskInfo, optional): Already read disk_info() record
         
     Returns:
-        str: Disk size information
+        str: Disk size in MB
     """
-    disk_size_output = Popen(
-        f"{query}/disk-info.sh {disk}",
-        shell=True,
-        stdin=PIPE,
-        stdout=PIPE,
-        universal_newlines=True,
-        stderr=STDOUT,
-        close_fds=True
-    )
-    return disk_size_output.stdout.readlines()[0].rstrip()
-
-
-def get_scheme(disk: str) -> str:
-    """Detect the partition scheme of a disk device.
+    if info is None:
+        info = disk_info(disk)
+    return str(info.mediasize // 1048576)
+
+
+def gpart_show(geom: str) -> dict | None:
+    """Read the partition table of a GEOM with a single gpart show -p call.
     
     Args:
-        disk (str): Disk device name (e.g., 'ada0')
+        geom (str): Disk or slice name (e.g., 'ada0', 'ada0s1')
         
     Returns:
-        str: Partition scheme ('GPT', 'MBR', or empty if none)
+        dict or None: {'scheme': str, 'entries': list} where each entry has
+            'start' and 'size' in blocks, 'name' (None for free space) and
+            'type', or None if the GEOM has no partition table
+
+    Raises:
+        CommandTimeout: If gpart did not answer within probe_timeout
     """
-    scheme_output = Popen(
-        f"{query}/detect-scheme.sh {disk}",
-        shell=True,
-        stdin=PIPE,
-        stdout=PIPE,
-        universal_newlines=True,
-        stderr=STDOUT,
-        close_fds=True
-    )
-    return scheme_output.stdout.readlines()[0].rstrip()
+    gpart_output = CommandRunner.run(['gpart', 'show', '-p', geom], timeout=probe_timeout).stdout
+    table = None
+    for line in gpart_output.splitlines():
+        info = line.split()
+        if not info:
+            continue
+        if info[0] == '=>':
+            # Header: => first-block size geom scheme (human size)
+            table = {'scheme': info[4], 'entries': []}
+        elif table is not None and len(info) >= 4:
+            free = info[2] == '-' and info[3] == 'free'
+            table['entries'].append({
+                'start': int(info[0]),
+                'size': int(info[1]),
+                'name': None if free else info[2],
+                'type': 'none' if free else info[3]
+            })
+    return table
 
 
 class DiskPartition:
@@ -148,162 +230,319 @@ class DiskPartition:
     MBR partition schemes.
     
     Attributes:
-        disk_database (dict): In-memory database of disk and partition information
-        query_partition (str): Path to disk partition query script
+        disk_database (dict): In-memory database of Disk records keyed by name
+        probed_database (dict): Copy of disk_database as it was probed,
+            before any edit
+        probe_workers (int): Maximum number of disks probed concurrently
+        probe_backend (str): 'gpart' to probe each disk with diskinfo and
+            gpart show, 'geom' to read everything from kern.geom.confxml
+        probe_cache (dict): Last probe of each disk with its GEOM signature
+        cache_hits (int): Number of disks reused from probe_cache
+        cache_misses (int): Number of disks that had to be probed
+        quarantine (dict): Reason by disk a probe command hung on. These
+            disks are not probed again and are listed as unresponsive.
     """
     disk_database: dict = {}
+    probed_database: dict = {}
+    probe_workers: int = 8
+    probe_backend: str = 'gpart'
+    probe_cache: dict = {}
+    cache_hits: int = 0
+    cache_misses: int = 0
+    quarantine: dict = {}
+
+    @classmethod
+    def gpart_table_db(cls, table, sectorsize=512, labels=False):
+        """Build a PartitionTable from parsed gpart show output.
 
-    query_partition = f'{query}/disk-part.sh'
+        Starts and sizes are kept as the exact block numbers gpart reports.
+        Free segments under 1 MB, like the gap before the first aligned
+        partition, are left out.
+
+        Args:
+            table (dict or None): Parsed gpart_show() output
+            sectorsize (int): Sector size of the disk in bytes
+            labels (bool): Also read the BSD labels of each slice
+
+        Returns:
+            PartitionTable: Partitions and free segments of the table
+        """
+        partition_db = PartitionTable(sectorsize=sectorsize)
+        min_free = max(1, mebibyte // sectorsize)
+        free_num = 1
+        for entry in [] if table is None else table['entries']:
+            if entry['name'] is None:
+                if entry['size'] < min_free:
+                    continue
+                partition_db.append(Partition.free(
+                    f'freespace{free_num}', entry['size'], entry['start']
+                ))
+                free_num += 1
+            else:
+                partition_db.append(Partition(
+                    entry['name'],
+                    entry['size'],
+                    file_system=entry['type'],
+                    partitions=(
+                        cls.mbr_partition_db(entry['name'], sectorsize=sectorsize)
+                        if labels else None
+                    ),
+                    start=entry['start']
+                ))
+        return partition_db
 
     @classmethod
-    def mbr_partition_slice_db(cls, disk):
+    def mbr_partition_slice_db(cls, disk, table=None, sectorsize=512):
         """Create database of MBR slices and their partitions.
         
         Args:
             disk (str): Disk device name (e.g., 'ada0')
+            table (dict, optional): Already parsed gpart_show() output
+            sectorsize (int): Sector size of the disk in bytes
             
         Returns:
-            dict: Database of slices with their partition information
+            PartitionTable: Slices with their partition information
         """
-        partition_output = Popen(
-            f'{cls.query_partition} {disk}',
-            shell=True,
-            stdin=PIPE,
-            stdout=PIPE,
-            universal_newlines=True
-        )
-        slice_db = {}
-        free_num = 1
-        for line in partition_output.stdout:
-            info = line.strip().split()
-            slice_name = info[0]
-            if 'freespace' in line:
-                slice_name = f'freespace{free_num}'
-                free_num += 1
-            part_db = cls.mbr_partition_db(info[0])
-            part_list = [] if part_db is None else list(part_db.keys())
-            partitions = {
-                'name': slice_name,
-                'size': info[1].partition('M')[0],
-                'mount-point': '',
-                'file-system': info[2],
-                'stat': None,
-                'partitions': part_db,
-                'partition-list': part_list
-            }
-            slice_db[slice_name] = partitions
-        return slice_db
+        if table is None:
+            table = gpart_show(disk)
+        return cls.gpart_table_db(table, sectorsize, labels=True)
 
     @classmethod
-    def mbr_partition_db(cls, partition_slice):
+    def mbr_partition_db(cls, partition_slice, table=None, sectorsize=512):
         """Create database of partitions within an MBR slice.
         
         Args:
             partition_slice (str): Slice identifier (e.g., 'ada0s1')
+            table (dict, optional): Already parsed gpart_show() output
+            sectorsize (int): Sector size of the disk in bytes
             
         Returns:
-            dict or None: Database of partitions within the slice, or None for freespace
+            PartitionTable: Partitions within the slice, empty for freespace
         """
         if 'freespace' in partition_slice:
-            return None
-        else:
-            slice_output = Popen(
-                f'{query}/disk-label.sh {partition_slice}',
-                shell=True,
-                stdin=PIPE,
-                stdout=PIPE,
-                universal_newlines=True
-            )
-            partition_db = {}
-            alph = ord('a')
-            free_num = 1
-            for line in slice_output.stdout:
-                info = line.strip().split()
-                if 'freespace' in line:
-                    partition_name = f'freespace{free_num}'
-                    free_num += 1
-                else:
-                    letter = chr(alph)
-                    partition_name = f'{partition_slice}{letter}'
-                    alph += 1
-                partitions = {
-                    'name': partition_name,
-                    'size': info[0].partition('M')[0],
-                    'mount-point': '',
-                    'file-system': info[2],
-                    'stat': None,
-                }
-                partition_db[partition_name] = partitions
-            if not partition_db:
-                return None
-            return partition_db
+            return PartitionTable(sectorsize=sectorsize)
+        if table is None:
+            table = gpart_show(partition_slice)
+        return cls.gpart_table_db(table, sectorsize)
 
     @classmethod
-    def gpt_partition_db(cls, disk):
+    def gpt_partition_db(cls, disk, table=None, sectorsize=512):
         """Create database of GPT partitions on a disk.
         
         Args:
             disk (str): Disk device name (e.g., 'ada0')
+            table (dict, optional): Already parsed gpart_show() output
+            sectorsize (int): Sector size of the disk in bytes
             
         Returns:
-            dict: Database of GPT partitions
+            PartitionTable: GPT partitions
+        """
+        if table is None:
+            table = gpart_show(disk)
+        return cls.gpart_table_db(table, sectorsize)
+
+    @classmethod
+    def probe_disk(cls, disk):
+        """Probe a single disk and build its database entry.
+
+        Args:
+            disk (str): Disk device name (e.g., 'ada0')
+
+        Returns:
+            Disk: Scheme, size, model and partitions of the disk
         """
-        partition_output = Popen(
-            f'{cls.query_partition} {disk}',
-            shell=True,
-            stdin=PIPE,
-            stdout=PIPE,
-            universal_newlines=True
+        info = disk_info(disk)
+        table = gpart_show(disk)
+        if table is None:
+            scheme = None
+            part_db = PartitionTable(sectorsize=info.sectorsize)
+        elif table['scheme'] == 'GPT':
+            scheme = 'GPT'
+            part_db = cls.gpt_partition_db(disk, table, info.sectorsize)
+        else:
+            scheme = 'MBR'
+            part_db = cls.mbr_partition_slice_db(disk, table, info.sectorsize)
+        return Disk(
+            disk,
+            scheme,
+            info.mediasize // info.sectorsize,
+            sectorsize=info.sectorsize,
+            device_model=device_model(disk, info),
+            stripesize=info.stripesize,
+            partitions=part_db
         )
-        partition_db = {}
-        free_num = 1
-        for line in partition_output.stdout:
-            info = line.strip().split()
-            slice_name = info[0]
-            if 'freespace' in line:
-                slice_name = f'freespace{free_num}'
-                free_num += 1
-            partitions = {
-                'name': info[0],
-                'size': info[1].partition('M')[0],
-                'mount-point': '',
-                'file-system': info[2],
-                'stat': None,
-                'partitions': {},
-                'partition-list': []
-            }
-            partition_db[slice_name] = partitions
-        return partition_db
 
     @classmethod
-    def create_partition_database(cls):
+    def read_geom_mesh(cls):
+        """Read and parse the GEOM tree of the system.
+
+        Returns:
+            dict or None: Parsed tree from parse_confxml(), or None if
+                kern.geom.confxml could not be read
+        """
+        try:
+            return parse_confxml(read_confxml(probe_timeout))
+        except (ParseError, CommandTimeout):
+            return None
+
+    @classmethod
+    def quarantine_disk(cls, disk, reason):
+        """Stop probing a disk that does not answer.
+
+        Args:
+            disk (str): Disk device name (e.g., 'da1')
+            reason (str): What timed out, for the installation log
+        """
+        # The report module imports this one.
+        from install_station.report import InstallReport
+        cls.quarantine[disk] = reason
+        InstallReport.log(f'{disk} does not respond and is left out: {reason}')
+
+    @staticmethod
+    def unresponsive_disk(disk):
+        """Build the database entry of a quarantined disk.
+
+        Args:
+            disk (str): Disk device name (e.g., 'da1')
+
+        Returns:
+            Disk: Entry without size or partitions, with the stat 'Unresponsive'
+        """
+        return Disk(disk, None, 0, stat='Unresponsive')
+
+    @classmethod
+    def scan_database(cls, workers=None, progress=None):
+        """Scan all disks and return a new partition database.
+
+        The returned database is built from scratch and is not shared with
+        disk_database, so it can be built on a worker thread while the
+        current one is still in use.
+        Disks are probed concurrently on a bounded worker pool, the database
+        keeps the same order as disk_list(). With the 'geom' probe backend
+        the whole GEOM tree is read once and only disks missing from it are
+        probed with diskinfo and gpart show.
+
+        Disks whose GEOM signature did not change since the last scan are
+        reused from probe_cache instead of being probed again. A disk a
+        probe command times out on is quarantined and listed as unresponsive,
+        the other disks are probed as usual.
+
+        Args:
+            workers (int, optional): Maximum number of disks probed at once,
+                defaults to probe_workers. Use 1 to probe serially.
+            progress (callable, optional): Called with (done, total) disks
+                after each disk is probed, possibly from a worker thread
+
+        Returns:
+            dict: New disk database in the disk_database format
+        """
+        disks = disk_list()
+        mesh = cls.read_geom_mesh()
+        signatures = {
+            disk: None if mesh is None else disk_signature(mesh, disk)
+            for disk in disks
+        }
+        disk_db = {}
+        stale_disks = []
+        for disk in disks:
+            if disk in cls.quarantine:
+                disk_db[disk] = cls.unresponsive_disk(disk)
+                continue
+            cached = cls.probe_cache.get(disk)
+            if (cached is not None and signatures[disk] is not None
+                    and cached[0] == signatures[disk]):
+                cls.cache_hits += 1
+                disk_db[disk] = deepcopy(cached[1])
+            else:
+                cls.cache_misses += 1
+                stale_disks.append(disk)
+        if cls.probe_backend == 'geom' and mesh is not None:
+            disk_db.update(disk_database(mesh, stale_disks))
+        probed_disks = [disk for disk in stale_disks if disk not in disk_db]
+        done_lock = Lock()
+        done = [len(disks) - len(probed_disks)]
+
+        def probe(disk):
+            try:
+                disk_info_db = cls.probe_disk(disk)
+            except CommandTimeout as e:
+                cls.quarantine_disk(disk, str(e))
+                disk_info_db = cls.unresponsive_disk(disk)
+            if progress is not None:
+                with done_lock:
+                    done[0] += 1
+                    progress(done[0], len(disks))
+            return disk_info_db
+
+        if workers is None:
+            workers = cls.probe_workers
+        workers = max(1, min(workers, len(probed_disks)))
+        if workers == 1:
+            disk_info = [probe(disk) for disk in probed_disks]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                disk_info = list(executor.map(probe, probed_disks))
+        disk_db.update(zip(probed_disks, disk_info))
+        for disk in stale_disks:
+            if disk not in cls.quarantine:
+                cls.probe_cache[disk] = (signatures[disk], deepcopy(disk_db[disk]))
+        return {disk: disk_db[disk] for disk in disks}
+
+    @classmethod
+    def create_partition_database(cls, workers=None):
         """Scan all disks and create comprehensive partition database.
         
         This method queries all available disks, detects their partition schemes,
         and builds a complete database of disk and partition information.
+        See scan_database() for how disks are probed.
+
+        Args:
+            workers (int, optional): Maximum number of disks probed at once,
+                defaults to probe_workers. Use 1 to probe serially.
         """
-        # if os.path.exists(disk_db_file):
-        #     os.remove(disk_db_file)
-        # drives_database = open(disk_db_file, 'wb')
-        disk_db = {}
-        for disk in disk_list():
-            disk_info_db = {}
-            disk_info_db.setdefault('scheme', get_scheme(disk))
-            if disk_info_db['scheme'] == "GPT":
-                part_db = cls.gpt_partition_db(disk)
-            elif disk_info_db['scheme'] == "MBR":
-                part_db = cls.mbr_partition_slice_db(disk)
-            else:
-                disk_info_db['scheme'] = None
-                part_db = {}
-            part_list = [] if part_db is None else list(part_db.keys())
-            disk_info_db['size'] = disk_size(disk)
-            disk_info_db['device_model'] = device_model(disk)
-            disk_info_db['partitions'] = part_db
-            disk_info_db['partition-list'] = part_list
-            disk_info_db['stat'] = None
-            disk_db[disk] = disk_info_db
-        cls.disk_database = disk_db
+        cls.publish_database(cls.scan_database(workers))
+
+    @classmethod
+    def publish_database(cls, database):
+        """Make a scanned database the one being edited.
+
+        A copy is kept in probed_database so the edits can be compared
+        with what is on the disks.
+
+        Args:
+            database (dict): Database returned by scan_database()
+        """
+        cls.disk_database = database
+        cls.probed_database = deepcopy(database)
+
+    @classmethod
+    def cache_stats(cls):
+        """Get the probe cache counters.
+
+        Returns:
+            dict: Number of cache 'hits' and 'misses' since the last reset
+        """
+        return {'hits': cls.cache_hits, 'misses': cls.cache_misses}
+
+    @classmethod
+    def invalidate_cache(cls, disk=None):
+        """Forget cached probes so the next scan probes the disks again.
+
+        Forgetting all disks also forgets the disk list. A forgotten disk
+        is taken out of quarantine, so a disk that answers again is probed.
+
+        Args:
+            disk (str, optional): Only forget this disk, defaults to all
+        """
+        if disk is None:
+            cls.probe_cache = {}
+            cls.cache_hits = 0
+            cls.cache_misses = 0
+            cls.quarantine = {}
+            SessionFacts.invalidate('disk_list')
+        else:
+            cls.probe_cache.pop(disk, None)
+            cls.quarantine.pop(disk, None)
 
     @classmethod
     def get_disk_database(cls):
@@ -324,38 +563,52 @@ class DiskPartition:
         Returns:
             int: Number of partitions on the disk
         """
-        return len(cls.disk_database[disk]['partitions'])
+        return len(cls.disk_database[disk].partitions)
 
     @classmethod
-    def set_disk_scheme(cls, scheme, disk, size):
+    def set_disk_scheme(cls, scheme, disk):
         """Set or update the partitioning scheme for a disk.
+
+        The new table is free from the first 1 MB boundary to the end of
+        the disk, less the 33 sectors of the backup GPT header and entries.
         
         Args:
             scheme (str or None): Partition scheme ('GPT' or 'MBR')
             disk (str): Disk device name
-            size (str): Disk size
         """
-        if scheme is None:
-            cls.disk_database[disk]['scheme'] = 'GPT'
+        disk_info = cls.disk_database[disk]
+        disk_info.scheme = 'GPT' if scheme is None else scheme
+        if not disk_info.partitions:
+            table = PartitionTable(sectorsize=disk_info.sectorsize)
+            start = table.alignment
+            end = disk_info.size - (33 if disk_info.scheme == 'GPT' else 0)
+            table.append(Partition.free('freespace1', end - start, start))
+            disk_info.partitions = table
+
+
+def new_partition_list(table: PartitionTable) -> list[str]:
+    """Build the InstallationData.new_partition lines of a partition table.
+
+    pc-sysinstall takes sizes in MB. New partitions are whole MB so the
+    conversion is exact, and the last one of the table is written with
+    size 0 so pc-sysinstall gives it the rest of the space whatever the
+    label or table overhead is, instead of padding sizes to make room.
+    
+    Args:
+        table (PartitionTable): Partitions of a disk or slice
+        
+    Returns:
+        list: 'file-system size mount-point' lines of the new partitions
+    """
+    last = table.at(len(table) - 1) if len(table) else None
+    lines = []
+    for partition in table.new_partitions():
+        if partition is last:
+            size = 0
         else:
-            cls.disk_database[disk]['scheme'] = scheme
-        # this need to data and not use pickle with open.
-        InstallationData.destroy[disk] = scheme
-        if not cls.disk_database[disk]['partitions']:
-            cls.disk_database[disk]['partitions'] = {
-                'freespace1': {
-                    'name': 'freespace1',
-                    'size': size,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-            }
-            cls.disk_database[disk]['partition-list'] = [
-                'freespace1'
-            ]
+            size = sectors_to_mb(partition.size, table.sectorsize)
+        lines.append(f'{partition.file_system} {size} {partition.mount_point}\n')
+    return lines
 
 
 class DeletePartition:
@@ -389,165 +642,9 @@ class DeletePartition:
             partition (str): Parent slice containing the label
             path (list): Path information for partition location
         """
-        disk_partitions = DiskPartition.disk_database[drive]['partitions'][partition]
-        partitions_info = disk_partitions['partitions']
-        label_list = disk_partitions['partition-list']
-        last_list_number = len(label_list) - 1
-        store_list_number = path[2]
-        size_free = int(partitions_info[label]['size'])
-
-        if last_list_number == store_list_number and len(label_list) > 1:
-            label_behind = label_list[store_list_number - 1]
-            if 'freespace' in label_behind:
-                size_free += int(partitions_info[label_behind]['size'])
-                label_list.remove(label)
-                disk_partitions['partitions'].pop(label, None)
-                disk_partitions['partitions'][label_behind] = {
-                    'name': label_behind,
-                    'size': size_free,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-                disk_partitions['partition-list'] = label_list
-            else:
-                free_name = find_next_partition('freespace', label_list)
-                label_list[store_list_number] = free_name
-                disk_partitions['partitions'].pop(label, None)
-                disk_partitions['partitions'][free_name] = {
-                    'name': free_name,
-                    'size': size_free,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-                disk_partitions['partition-list'] = label_list
-        elif store_list_number == 0 and len(label_list) > 1:
-            label_after = label_list[store_list_number + 1]
-            if 'freespace' in label_after:
-                size_free += int(partitions_info[label_after]['size'])
-                label_list.remove(label)
-                disk_partitions['partitions'].pop(label, None)
-                disk_partitions['partitions'][label_after] = {
-                    'name': label_after,
-                    'size': size_free,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-                disk_partitions['partition-list'] = label_list
-            else:
-                free_name = find_next_partition('freespace', label_list)
-                label_list[store_list_number] = free_name
-                disk_partitions['partitions'].pop(label, None)
-                disk_partitions['partitions'][free_name] = {
-                    'name': free_name,
-                    'size': size_free,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-                disk_partitions['partition-list'] = label_list
-        elif len(label_list) > 2:
-            label_behind = label_list[store_list_number - 1]
-            label_after = label_list[store_list_number + 1]
-            size_behind = int(partitions_info[label_behind]['size'])
-            size_after = int(partitions_info[label_after]['size'])
-            if ('freespace' in label_behind
-                    and 'freespace' in label_after):
-                size_free += size_behind + size_after
-                label_list.remove(label)
-                label_list.remove(label_after)
-                disk_partitions['partitions'].pop(label, None)
-                disk_partitions['partitions'].pop(label_after, None)
-                disk_partitions['partitions'][label_behind] = {
-                    'name': label_behind,
-                    'size': size_free,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-                disk_partitions['partition-list'] = label_list
-            elif 'freespace' in label_behind:
-                size_free += size_behind
-                label_list.remove(label)
-                disk_partitions['partitions'].pop(label, None)
-                disk_partitions['partitions'][label_behind] = {
-                    'name': label_behind,
-                    'size': size_free,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-                disk_partitions['partition-list'] = label_list
-            elif 'freespace' in label_after:
-                size_free += size_after
-                label_list.remove(label)
-                disk_partitions['partitions'].pop(label, None)
-                disk_partitions['partitions'].pop(label_after, None)
-                disk_partitions['partitions'][label_after] = {
-                    'name': label_after,
-                    'size': size_free,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-                disk_partitions['partition-list'] = label_list
-            else:
-                free_name = find_next_partition('freespace', label_list)
-                label_list[store_list_number] = free_name
-                disk_partitions['partitions'].pop(label, None)
-                disk_partitions['partitions'][free_name] = {
-                    'name': free_name,
-                    'size': size_free,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-                disk_partitions['partition-list'] = label_list
-        else:
-            free_name = find_next_partition('freespace', label_list)
-            label_list[store_list_number] = free_name
-            disk_partitions['partitions'].pop(label, None)
-            disk_partitions['partitions'][free_name] = {
-                'name': free_name,
-                'size': size_free,
-                'mount-point': '',
-                'file-system': 'none',
-                'stat': None,
-                'partitions': {},
-                'partition-list': []
-            }
-            disk_partitions['partition-list'] = label_list
-
-        # Data is already updated in DiskPartition.disk_database - no need to save to file
-        remaining_partition = []
-        for part in label_list:
-            partitions_info = disk_partitions['partitions']
-            if part in partitions_info:
-                size = partitions_info[part]['size']
-                mount_point = partitions_info[part]['mount-point']
-                file_system = partitions_info[part]['file-system']
-                stat = partitions_info[part]['stat']
-                if stat == 'New':
-                    remaining_partition.append(f'{file_system} {size} {mount_point}\n')
-        InstallationData.new_partition = remaining_partition
+        label_table = DiskPartition.disk_database[drive].partitions[partition].partitions
+        label_table.release(label_table.index(label))
+        InstallationData.new_partition = new_partition_list(label_table)
 
     def __init__(self, part, path):
         """Initialize partition deletion operation.
@@ -573,166 +670,11 @@ class DeletePartition:
             partition (str): Partition to delete
             path (list): Path information for partition location
         """
-        disk_data = DiskPartition.disk_database
-        partitions_info = disk_data[drive]['partitions']
-        partition_list = disk_data[drive]['partition-list']
-        last_list_number = len(partition_list) - 1
-        store_list_number = path[1]
-        size_free = int(partitions_info[partition]['size'])
-        if last_list_number == store_list_number and len(partition_list) > 1:
-            partition_behind = partition_list[store_list_number - 1]
-            if 'freespace' in partition_behind:
-                size_free += int(partitions_info[partition_behind]['size'])
-                partition_list.remove(partition)
-                disk_data[drive]['partitions'].pop(partition, None)
-                disk_data[drive]['partitions'][partition_behind] = {
-                    'name': partition_behind,
-                    'size': size_free,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-                disk_data[drive]['partition-list'] = partition_list
-            else:
-                free_name = find_next_partition('freespace', partition_list)
-                partition_list[store_list_number] = free_name
-                disk_data[drive]['partitions'].pop(partition, None)
-                disk_data[drive]['partitions'][free_name] = {
-                    'name': free_name,
-                    'size': size_free,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-                disk_data[drive]['partition-list'] = partition_list
-        elif store_list_number == 0 and len(partition_list) > 1:
-            partition_after = partition_list[store_list_number + 1]
-            if 'freespace' in partition_after:
-                size_free += int(partitions_info[partition_after]['size'])
-                partition_list.remove(partition)
-                disk_data[drive]['partitions'].pop(partition, None)
-                disk_data[drive]['partitions'][partition_after] = {
-                    'name': partition_after,
-                    'size': size_free,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-                disk_data[drive]['partition-list'] = partition_list
-            else:
-                free_name = find_next_partition('freespace', partition_list)
-                partition_list[store_list_number] = free_name
-                disk_data[drive]['partitions'].pop(partition, None)
-                disk_data[drive]['partitions'][free_name] = {
-                    'name': free_name,
-                    'size': size_free,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-                disk_data[drive]['partition-list'] = partition_list
-        elif len(partition_list) > 2:
-            partition_behind = partition_list[store_list_number - 1]
-            partition_after = partition_list[store_list_number + 1]
-            size_behind = int(partitions_info[partition_behind]['size'])
-            size_after = int(partitions_info[partition_after]['size'])
-            if ('freespace' in partition_behind
-                    and 'freespace' in partition_after):
-                size_free += size_behind + size_after
-                partition_list.remove(partition)
-                partition_list.remove(partition_after)
-                disk_data[drive]['partitions'].pop(partition, None)
-                disk_data[drive]['partitions'][partition_behind] = {
-                    'name': partition_behind,
-                    'size': size_free,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-                disk_data[drive]['partition-list'] = partition_list
-            elif 'freespace' in partition_behind:
-                size_free += size_behind
-                partition_list.remove(partition)
-                disk_data[drive]['partitions'].pop(partition, None)
-                disk_data[drive]['partitions'][partition_behind] = {
-                    'name': partition_behind,
-                    'size': size_free,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-                disk_data[drive]['partition-list'] = partition_list
-            elif 'freespace' in partition_after:
-                size_free += size_after
-                partition_list.remove(partition)
-                disk_data[drive]['partitions'].pop(partition, None)
-                disk_data[drive]['partitions'][partition_after] = {
-                    'name': partition_after,
-                    'size': size_free,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-                disk_data[drive]['partition-list'] = partition_list
-            else:
-                free_name = find_next_partition('freespace', partition_list)
-                partition_list[store_list_number] = free_name
-                disk_data[drive]['partitions'].pop(partition, None)
-                disk_data[drive]['partitions'][free_name] = {
-                    'name': free_name,
-                    'size': size_free,
-                    'mount-point': '',
-                    'file-system': 'none',
-                    'stat': None,
-                    'partitions': {},
-                    'partition-list': []
-                }
-                disk_data[drive]['partition-list'] = partition_list
-        else:
-            free_name = find_next_partition('freespace', partition_list)
-            partition_list[store_list_number] = free_name
-            disk_data[drive]['partitions'].pop(partition, None)
-            disk_data[drive]['partitions'][free_name] = {
-                'name': free_name,
-                'size': size_free,
-                'mount-point': '',
-                'file-system': 'none',
-                'stat': None,
-                'partitions': {},
-                'partition-list': []
-            }
-            disk_data[drive]['partition-list'] = partition_list
-
-        # if delete file exist check if slice is in the list
-
-        if partition not in InstallationData.delete:
-            InstallationData.delete.append(partition)
+        partition_table = DiskPartition.disk_database[drive].partitions
+        partition_table.release(partition_table.index(partition))
 
         if "p" in partition and InstallationData.new_partition:
-            remaining_partition = []
-            for part in partition_list:
-                partitions_info = disk_data[drive]['partitions']
-                size = partitions_info[part]['size']
-                mount_point = partitions_info[part]['mount-point']
-                file_system = partitions_info[part]['file-system']
-                stat = partitions_info[part]['stat']
-                if stat == 'New':
-                    remaining_partition.append(f'{file_system} {size} {mount_point}\n')
-            InstallationData.new_partition = remaining_partition
+            InstallationData.new_partition = new_partition_list(partition_table)
 
 
 class AutoFreeSpace:
@@ -750,81 +692,39 @@ class AutoFreeSpace:
         
         Args:
             drive (str): Disk device name
-            size (str): Available size in MB
+            size (str): Available size in MB as displayed, the slice uses
+                the whole free segment
             path (list): Path information for partition location
             fs (str): Filesystem type ('ZFS' or 'UFS')
         """
-        # remove 1M to size to avoid no space left
-        main_size = int(size) - 1
         InstallationData.disk = drive
 
         InstallationData.scheme = 'partscheme=MBR'
 
-        disk_db = DiskPartition.disk_database
-        slice_list = disk_db[drive]['partition-list']
+        slice_table = DiskPartition.disk_database[drive].partitions
         store_list_number = path[1]
-        main_slice = find_next_partition(f'{drive}s', slice_list)
-        slice_list[store_list_number] = main_slice
-        disk_db[drive]['partitions'][main_slice] = {
-            'name': main_slice,
-            'size': size,
-            'mount-point': 'none',
-            'file-system': 'BSD',
-            'stat': 'New',
-            'partitions': {},
-            'partition-list': []
-        }
-        disk_db[drive]['partition-list'] = slice_list
+        main_slice = find_next_partition(f'{drive}s', slice_table.names())
 
         InstallationData.slice = main_slice.replace(drive, "")
 
-        root_size = int(main_size)
-        swap_size = 2048
-        root_size -= swap_size
-
-        part_list = disk_db[drive]['partitions'][main_slice]['partition-list']
+        main_size = slice_table.available(store_list_number)
+        swap_size = mb_to_sectors(2048, slice_table.sectorsize)
+        root_size = main_size - swap_size
 
         if fs == "ZFS":
             layout = zfs_datasets
         else:
             layout = '/'
 
-        root_part = f'{main_slice}a'
-        part_list.append(root_part)
-        disk_db[drive]['partitions'][main_slice]['partitions'][root_part] = {
-            'name': root_part,
-            'size': root_size,
-            'mount-point': layout,
-            'file-system': fs,
-            'stat': 'New',
-            'partitions': {},
-            'partition-list': []
-        }
-
-        swap_part = f'{main_slice}b'
-        part_list.append(swap_part)
-        disk_db[drive]['partitions'][main_slice]['partitions'][swap_part] = {
-            'name': swap_part,
-            'size': swap_size,
-            'mount-point': 'none',
-            'file-system': 'SWAP',
-            'stat': 'New',
-            'partitions': {},
-            'partition-list': []
-        }
+        label_table = PartitionTable([
+            Partition(f'{main_slice}a', root_size, layout, fs, 'New'),
+            Partition(f'{main_slice}b', swap_size, 'none', 'SWAP', 'New')
+        ], sectorsize=slice_table.sectorsize)
+        main_partition = Partition(main_slice, main_size, 'none', 'BSD', 'New', label_table)
+        slice_table.allocate(store_list_number, main_partition)
 
-        disk_db[drive]['partitions'][main_slice]['partition-list'] = part_list
-
-        # Data is already updated in DiskPartition.disk_database - no need to save to file
-        
         # Add new partitions to InstallationData
-        InstallationData.new_partition = [
-            f'{fs} {root_size} {layout}\n',
-            f'SWAP {swap_size} none\n'
-        ]
-        
-        # Add to create list for partition creation operations
-        InstallationData.create.append([main_slice, main_size])
+        InstallationData.new_partition = new_partition_list(label_table)
 
     def __init__(self, path, size, fs, efi_exist, disk, scheme):
         """Initialize automatic partition creation.
@@ -851,93 +751,52 @@ class AutoFreeSpace:
         
         Args:
             drive (str): Disk device name
-            size (str): Available size in MB
+            size (str): Available size in MB as displayed, the partitions
+                use the whole free segment
             path (list): Path information for partition location
             fs (str): Filesystem type ('ZFS' or 'UFS')
             efi_exist (bool): Whether EFI partition already exists
         """
-        # remove 1M to size to avoid no space left
-        main_size = int(size) - 1
         InstallationData.disk = drive
         InstallationData.scheme = 'partscheme=GPT'
-        root_size = int(main_size)
-        swap_size = 2048
-        root_size -= int(swap_size)
+        partition_table = DiskPartition.disk_database[drive].partitions
+        sectorsize = partition_table.sectorsize
+        store_list_number = path[1]
+        swap_size = mb_to_sectors(2048, sectorsize)
         if self.bios_type == "UEFI" and efi_exist is False:
-            boot_size = 256
+            boot_size = mb_to_sectors(256, sectorsize)
         else:
-            boot_size = 1 if self.bios_type == "BIOS" else 0
+            boot_size = mb_to_sectors(1 if self.bios_type == "BIOS" else 0, sectorsize)
         boot_name = 'UEFI' if self.bios_type == "UEFI" else 'BOOT'
-        root_size -= boot_size
-        disk_data = DiskPartition.disk_database
-        partition_list = disk_data[drive]['partition-list']
-        store_list_number = path[1]
+        root_size = partition_table.available(store_list_number) - swap_size - boot_size
         if boot_size != 0:
-            boot_partition = find_next_partition(f'{drive}p', partition_list)
-            partition_list[store_list_number] = boot_partition
+            boot_partition = find_next_partition(f'{drive}p', partition_table.names())
+            boot = Partition(boot_partition, boot_size, 'none', boot_name, 'New')
+            partition_table.allocate(store_list_number, boot)
             store_list_number += 1
-            disk_data[drive]['partitions'][boot_partition] = {
-                'name': boot_partition,
-                'size': boot_size,
-                'mount-point': 'none',
-                'file-system': boot_name,
-                'stat': 'New',
-                'partitions': {},
-                'partition-list': []
-            }
-            # Add boot partition to create list
-            InstallationData.create.append([boot_partition, boot_size])
 
         if fs == "ZFS":
             layout = zfs_datasets
         else:
             layout = '/'
 
-        root_partition = find_next_partition(f'{drive}p', partition_list)
-        if store_list_number == path[1]:
-            partition_list[store_list_number] = root_partition
-        else:
-            partition_list.insert(store_list_number, root_partition)
+        root_partition = find_next_partition(f'{drive}p', partition_table.names())
+        partition_table.allocate(
+            store_list_number,
+            Partition(root_partition, root_size, layout, fs, 'New')
+        )
         store_list_number += 1
-        disk_data[drive]['partitions'][root_partition] = {
-            'name': root_partition,
-            'size': root_size,
-            'mount-point': layout,
-            'file-system': fs,
-            'stat': 'New',
-            'partitions': {},
-            'partition-list': []
-        }
 
         InstallationData.slice = root_partition.replace(drive, '')
 
-        swap_partition = find_next_partition(f'{drive}p', partition_list)
-        partition_list.insert(store_list_number, swap_partition)
-        disk_data[drive]['partitions'][swap_partition] = {
-            'name': swap_partition,
-            'size': swap_size,
-            'mount-point': 'none',
-            'file-system': 'SWAP',
-            'stat': 'New',
-            'partitions': {},
-            'partition-list': []
-        }
+        swap_partition = find_next_partition(f'{drive}p', partition_table.names())
+        partition_table.allocate(
+            store_list_number,
+            Partition(swap_partition, swap_size, 'none', 'SWAP', 'New')
+        )
 
-        disk_data[drive]['partition-list'] = partition_list
-        
-        # Data is already updated in DiskPartition.disk_database - no need to save to file
-        
         # Add new partitions to InstallationData
-        new_partitions = []
-        if self.bios_type == "UEFI" and efi_exist is False:
-            new_partitions.append(f'UEFI {boot_size} none\n')
-        elif self.bios_type == "BIOS":
-            new_partitions.append(f'BOOT {boot_size} none\n')
-        new_partitions.extend([
-            f'{fs} {root_size} {layout}\n',
-            f'SWAP {swap_size} none\n'
-        ])
-        InstallationData.new_partition = new_partitions
+        InstallationData.new_partition = new_partition_list(partition_table)
 
 
 class CreateLabel:
@@ -954,7 +813,8 @@ class CreateLabel:
             path (list): Path information for partition location
             drive (str): Disk device name
             main_slice (str): Parent slice identifier
-            size_left (int): Remaining size after partition creation
+            size_left (int): Remaining size after partition creation, the
+                partition table keeps it as free space after the new partition
             create_size (int): Size of new partition in MB
             mountpoint (str): Mount point for the partition
             fs (str): Filesystem type
@@ -962,9 +822,8 @@ class CreateLabel:
         InstallationData.disk = drive
         InstallationData.scheme = 'partscheme=MBR'
         InstallationData.slice = main_slice.replace(drive, "")
-        disk_db = DiskPartition.disk_database
+        label_table = DiskPartition.disk_database[drive].partitions[main_slice].partitions
         store_list_number = path[2]
-        part_list = disk_db[drive]['partitions'][main_slice]['partition-list']
         alpha_num = ord('a')
         alpha_num += store_list_number
         letter = chr(alpha_num)
@@ -972,45 +831,16 @@ class CreateLabel:
             mountpoint = zfs_datasets
 
         partition = f'{main_slice}{letter}'
-        part_list[store_list_number] = partition
-        disk_db[drive]['partitions'][main_slice]['partitions'][partition] = {
-            'name': partition,
-            'size': create_size,
-            'mount-point': mountpoint,
-            'file-system': fs,
-            'stat': 'New',
-            'partitions': {},
-            'partition-list': []
-        }
-        if size_left != 0:
-            free = find_next_partition('freespace', part_list)
-            part_list.append(free)
-            disk_db[drive]['partitions'][main_slice]['partitions'][free] = {
-                'name': free,
-                'size': size_left,
-                'mount-point': '',
-                'file-system': 'none',
-                'stat': None,
-                'partitions': {},
-                'partition-list': []
-            }
-
-        disk_db[drive]['partitions'][main_slice]['partition-list'] = part_list
-
-        # Data is already updated in DiskPartition.disk_database - no need to save to file
-        
+        label_table.allocate(store_list_number, Partition(
+            partition,
+            mb_to_sectors(create_size, label_table.sectorsize),
+            mountpoint,
+            fs,
+            'New'
+        ))
+
         # Update InstallationData with new partition information
-        new_partitions = []
-        for partition_name in part_list:
-            drive_part = disk_db[drive]['partitions']
-            part_info = drive_part[main_slice]['partitions'][partition_name]
-            if part_info['stat'] == 'New':
-                partition_text = f'{part_info["file-system"]} ' \
-                    f'{part_info["size"]} ' \
-                    f'{part_info["mount-point"]}\n'
-                new_partitions.append(partition_text)
-        
-        InstallationData.new_partition = new_partitions
+        InstallationData.new_partition = new_partition_list(label_table)
 
 
 # class modifyLabel():
@@ -1068,62 +898,32 @@ class CreateSlice:
         
         Args:
             create_size (int): Size of new slice in MB
-            size_left (int): Remaining size after slice creation
+            size_left (int): Remaining size after slice creation, the
+                partition table keeps it as free space after the new slice
             path (list): Path information for slice location
             drive (str): Disk device name
         """
         InstallationData.disk = drive
         InstallationData.scheme = 'partscheme=MBR'
 
-        disk_db = DiskPartition.disk_database
+        slice_table = DiskPartition.disk_database[drive].partitions
         store_list_number = path[1]
-        partition_list = disk_db[drive]['partition-list']
-
-        partition = find_next_partition(f'{drive}s', partition_list)
-
-        partition_list[store_list_number] = partition
-        # Store slice partition
-        disk_db[drive]['partitions'][partition] = {
-            'name': partition,
-            'size': create_size,
-            'mount-point': 'none',
-            'file-system': 'BSD',
-            'stat': 'New',
-            'partitions': {},
-            'partition-list': ['freespace1']
-        }
-        # Store freespace for partition partition
-        disk_db[drive]['partitions'][partition]['partitions']['freespace1'] = {
-            'name': 'freespace1',
-            'size': create_size,
-            'mount-point': '',
-            'file-system': 'none',
-            'stat': None,
-            'partitions': {},
-            'partition-list': []
-        }
-        # Store freespace if some left
-        if size_left != 0:
-            free_name = find_next_partition('freespace', partition_list)
-            partition_list.append(free_name)
-            disk_db[drive]['partitions'][free_name] = {
-                'name': free_name,
-                'size': size_left,
-                'mount-point': '',
-                'file-system': 'none',
-                'stat': None,
-                'partitions': {},
-                'partition-list': []
-            }
-
-        disk_db[drive]['partition-list'] = partition_list
-
-        # Data is already updated in DiskPartition.disk_database - no need to save to file
 
-        InstallationData.slice = partition.replace(drive, '')
+        partition = find_next_partition(f'{drive}s', slice_table.names())
 
-        # Add to create list for partition creation operations
-        InstallationData.create.append([partition, create_size])
+        # Store slice partition with its free space, what is left of the
+        # free space stays after it
+        sectorsize = slice_table.sectorsize
+        size = mb_to_sectors(create_size, sectorsize)
+        new_slice = Partition(
+            partition, size, 'none', 'BSD', 'New',
+            PartitionTable([Partition.free('freespace1', size)], sectorsize)
+        )
+        # The slice may be trimmed to fit, its free space follows it.
+        size = slice_table.allocate(store_list_number, new_slice)
+        new_slice.partitions.at(0).size = size
+
+        InstallationData.slice = partition.replace(drive, '')
 
 
 class CreatePartition():
@@ -1139,7 +939,8 @@ class CreatePartition():
         Args:
             path (list): Path information for partition location
             drive (str): Disk device name
-            size_left (int): Remaining size after partition creation
+            size_left (int): Remaining size after partition creation, the
+                partition table keeps it as free space after the new partition
             create_size (int): Size of new partition in MB
             mount_point (str): Mount point for the partition
             fs (str): Filesystem type
@@ -1151,159 +952,37 @@ class CreatePartition():
         if fs == "ZFS":
             mount_point = zfs_datasets
 
-        disk_data = DiskPartition.disk_database
+        partition_table = DiskPartition.disk_database[drive].partitions
         store_list_number = path[1]
-        partition_list = disk_data[drive]['partition-list']
-
-        partition = find_next_partition(f'{drive}p', partition_list)
-
-        partition_list[store_list_number] = partition
-        # Store slice partition
-        disk_data[drive]['partitions'][partition] = {
-            'name': partition,
-            'size': create_size,
-            'mount-point': mount_point,
-            'file-system': fs,
-            'stat': 'New',
-            'partitions': {},
-            'partition-list': []
-        }
-        # Store freespace if some left
-        if size_left != 0:
-            free_name = find_next_partition('freespace', partition_list)
-            partition_list.append(free_name)
-            disk_data[drive]['partitions'][free_name] = {
-                'name': free_name,
-                'size': size_left,
-                'mount-point': '',
-                'file-system': 'none',
-                'stat': None,
-                'partitions': {},
-                'partition-list': []
-            }
-
-        disk_data[drive]['partition-list'] = partition_list
-
-        # Data is already updated in DiskPartition.disk_database - no need to save to file
+
+        partition = find_next_partition(f'{drive}p', partition_table.names())
+
+        # What is left of the free space stays after the new partition
+        new_partition = Partition(
+            partition,
+            mb_to_sectors(create_size, partition_table.sectorsize),
+            mount_point,
+            fs,
+            'New'
+        )
+        partition_table.allocate(store_list_number, new_partition)
 
         if mount_point == '/' or fs == "ZFS":
             InstallationData.slice = partition.replace(drive, '')
 
-        if fs == "UEFI" or fs == "BOOT":
-            # Add to create list for partition creation operations
-            InstallationData.create.append([partition, create_size])
-
         # Update InstallationData with new partition information
-        new_partitions = []
-        for partition_name in partition_list:
-            partition_info = disk_data[drive]['partitions'][partition_name]
-            if partition_info['stat'] == 'New':
-                partition_text = f'{partition_info["file-system"]} ' \
-                    f'{partition_info["size"]} ' \
-                    f'{partition_info["mount-point"]}\n'
-                new_partitions.append(partition_text)
-
-        InstallationData.new_partition = new_partitions
-
-
-def delete_partition() -> None:
-    """Execute physical deletion of partitions marked for deletion.
-    
-    Iterates through partitions marked for deletion in InstallationData
-    and removes them from the disk using FreeBSD gpart commands.
-    
-    Raises:
-        RuntimeError: If no partitions are marked for deletion
-    """
-    if InstallationData.delete:
-        for partition in InstallationData.delete:
-            num = slice_number(partition)
-            drive = get_disk_from_partition(partition)
-            call(f"sudo zpool labelclear -f {partition}", shell=True)
-            sleep(1)
-            call(f'sudo gpart delete -i {num} {drive}', shell=True)
-            sleep(1)
-    else:
-        raise RuntimeError('No partitions to delete')
-
-
-def destroy_partition() -> None:
-    """Destroy and recreate partition tables on disks.
-    
-    Completely destroys existing partition tables and creates new ones
-    with the specified scheme for disks marked for destruction.
-    
-    Raises:
-        RuntimeError: If no disks are marked for destruction
-    """
-    if InstallationData.destroy:
-        for drive, scheme in InstallationData.destroy.items():
-            # Destroy the disk geom
-            gpart_destroy = f"sudo gpart destroy -F {drive}"
-            call(gpart_destroy, shell=True)
-            sleep(1)
-            clear_drive = f"sudo dd if=/dev/zero of={drive} bs=1m count=1"
-            call(clear_drive, shell=True)
-            sleep(1)
-            call(f'sudo gpart create -s {scheme} {drive}', shell=True)
-            sleep(1)
-    else:
-        raise RuntimeError('No disks to destroy')
+        InstallationData.new_partition = new_partition_list(partition_table)
 
 
+@session_fact()
 def bios_or_uefi() -> str:
     """Detect the system boot method (BIOS or UEFI).
     
+    The boot method cannot change while the installer runs, it is only
+    queried once.
+    
     Returns:
         str: 'BIOS' or 'UEFI' depending on the system boot method
     """
-    cmd = "sysctl -n machdep.bootmethod"
-    output1 = Popen(cmd, shell=True, stdout=PIPE,
-                    universal_newlines=True, close_fds=True)
-    return output1.stdout.readlines()[0].rstrip()
-
-
-def add_partition() -> None:
-    """Execute physical creation of partitions marked for creation.
-    
-    Creates actual partitions on disk using FreeBSD gpart commands
-    for all partitions marked for creation in InstallationData.
-    Handles different partition types (EFI, BIOS boot, FreeBSD, etc.).
-    
-    Raises:
-        RuntimeError: If no partitions are marked for creation
-    """
-    if InstallationData.create:
-        boot = InstallationData.boot
-        for partition_info in InstallationData.create:
-            part = partition_info[0]
-            size = int(partition_info[1])
-            drive = get_disk_from_partition(part)
-            sl = slice_number(part)
-            if set("p") & set(part):
-                if bios_or_uefi() == 'UEFI':
-                    cmd = f'sudo gpart add -a 4k -s {size}M -t efi ' \
-                        f'-i {sl} {drive}'
-                    call(cmd, shell=True)
-                    sleep(1)
-                    call(f'sudo zpool labelclear -f {drive}p{sl}', shell=True)
-                    cmd2 = f'sudo newfs_msdos -F 16 {drive}p{sl}'
-                    call(cmd2, shell=True)
-                else:
-                    if boot == "grub":
-                        cmd = f'sudo gpart add -a 4k -s {size}M -t ' \
-                            'bios-boot -i {sl} {drive}'
-                    else:
-                        # freebsd-boot partition must never be larger
-                        # than 512B blocks.
-                        cmd = 'sudo gpart add -a 4k -s 512 -t ' \
-                            f'freebsd-boot -i {sl} {drive}'
-                    call(cmd, shell=True)
-                    call(f'sudo zpool labelclear -f {drive}p{sl}', shell=True)
-            elif set("s") & set(part):
-                cmd = f'sudo gpart add -a 4k -s {size}M -t freebsd ' \
-                    f'-i {sl} {drive}'
-                call(cmd, shell=True)
-            sleep(2)
-    else:
-        raise RuntimeError('No partitions to create')
+    output = CommandRunner.run(['sysctl', '-n', 'machdep.bootmethod'])
+    return output.stdout.splitlines()[0].rstrip()
@@ -0,0 +1,456 @@
+"""Typed partition model for GhostBSD Install Station.
+
+Compact records for the disks, slices, partitions and labels kept in
+DiskPartition.disk_database. Records use __slots__ to keep allocation low,
+partition tables keep a name-to-index map so lookups do not scan lists, and
+every record can still be read like the dictionaries it replaces
+(record['mount-point'], record['partition-list'], ...) so display code such
+as PartitionManager.tree_store does not need to know about the model.
+
+A partition table is also the free space engine of its disk or slice: it is
+an ordered set of contiguous intervals where creating a partition splits a
+free segment and deleting one merges it back with its free neighbours.
+
+Offsets and sizes are exact sector counts of the disk; they are only turned
+into MB for display and for the pc-sysinstall configuration.
+"""
+import re
+
+mebibyte = 1048576
+
+
+def sectors_to_mb(sectors, sectorsize):
+    """Convert a sector count to whole MB, rounded down.
+
+    Args:
+        sectors (int): Number of sectors
+        sectorsize (int): Sector size in bytes
+
+    Returns:
+        int: Size in MB
+    """
+    return sectors * sectorsize // mebibyte
+
+
+def mb_to_sectors(size, sectorsize):
+    """Convert a size in MB to a sector count.
+
+    Args:
+        size (int): Size in MB
+        sectorsize (int): Sector size in bytes
+
+    Returns:
+        int: Number of sectors
+    """
+    return int(size) * mebibyte // sectorsize
+
+
+class Partition:
+    """A slice, GPT partition, BSD label or free space segment.
+
+    Attributes:
+        name (str): Provider name (e.g., 'ada0p2') or 'freespaceN'
+        start (int): First sector of the partition
+        size (int): Size in sectors
+        mount_point (str): Mount point or ZFS datasets, '' if none
+        file_system (str): Partition type or file system to create
+        stat (str or None): 'New' for partitions to be created
+        partitions (PartitionTable): BSD labels of an MBR slice
+    """
+    __slots__ = ('name', 'start', 'size', 'mount_point', 'file_system',
+                 'stat', 'partitions')
+
+    # Dictionary keys of the former representation mapped to attributes.
+    keys = {
+        'name': 'name',
+        'start': 'start',
+        'size': 'size',
+        'mount-point': 'mount_point',
+        'file-system': 'file_system',
+        'stat': 'stat',
+        'partitions': 'partitions',
+    }
+
+    def __init__(self, name, size, mount_point='', file_system='none',
+                 stat=None, partitions=None, start=None):
+        self.name = name
+        self.start = start
+        self.size = int(size)
+        self.mount_point = mount_point
+        self.file_system = file_system
+        self.stat = stat
+        self.partitions = PartitionTable() if partitions is None else partitions
+
+    @classmethod
+    def free(cls, name, size, start=None):
+        """Create a free space segment.
+
+        Args:
+            name (str): Free space name (e.g., 'freespace1')
+            size (int): Size in sectors
+            start (int, optional): First sector, set by the table if omitted
+
+        Returns:
+            Partition: Free space record
+        """
+        return cls(name, size, start=start)
+
+    @property
+    def end(self):
+        """int: First sector after the partition."""
+        return self.start + self.size
+
+    @property
+    def is_free(self):
+        """bool: True if this record is free space."""
+        return self.name.startswith('freespace')
+
+    def __getitem__(self, key):
+        if key == 'partition-list':
+            return self.partitions.names()
+        return getattr(self, self.keys[key])
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f'Partition({self.name!r}, {self.size!r}, {self.file_system!r})'
+
+
+class PartitionTable:
+    """Ordered partitions of a disk or slice with a name-to-index map.
+
+    Reads like the former {name: partition} dictionary: iterating yields
+    names in disk order, table[name] returns the record and `name in table`
+    is an O(1) lookup.
+
+    Entries are ordered sector intervals. Partitions and free segments are
+    looked up by name through the index map, their neighbours by position,
+    and free segments are named from a counter instead of searching for an
+    unused freespaceN name. New partitions start on 1 MB boundaries and
+    have whole MB sizes, so their sizes are exact in MB as well as in
+    sectors.
+
+    Splitting or merging a segment inserts or removes a list entry and
+    reindexes the entries after it, so an edit is O(n) in the entries of
+    the table rather than O(log n). A table holds at most 128 GPT
+    partitions, 4 slices or a few BSD labels, and usually a handful: the
+    list shift is a memmove and the reindex a few dictionary stores, less
+    work than a balanced tree or a sorted offset index would do in Python.
+    Nothing looks partitions up by sector offset, the editor always knows
+    the name, so no offset search is kept.
+
+    Attributes:
+        sectorsize (int): Sector size of the disk in bytes
+    """
+    __slots__ = ('entries', 'positions', 'free_count', 'sectorsize')
+
+    def __init__(self, entries=(), sectorsize=512):
+        self.entries = list(entries)
+        self.positions = {}
+        self.free_count = 0
+        self.sectorsize = sectorsize
+        offset = 0
+        for entry in self.entries:
+            if entry.start is None:
+                entry.start = offset
+            offset = entry.end
+            self.count_free(entry)
+        self.reindex()
+
+    def count_free(self, partition):
+        """Keep the free segment counter past the number of a free segment.
+
+        Args:
+            partition (Partition): Partition record added to the table
+        """
+        if partition.is_free:
+            number = re.sub('[^0-9]', '', partition.name)
+            self.free_count = max(self.free_count, int(number or 0))
+
+    def reindex(self, start=0):
+        """Rebuild the name-to-index map from a position onwards.
+
+        Args:
+            start (int): First position whose index changed
+        """
+        for position in range(start, len(self.entries)):
+            self.positions[self.entries[position].name] = position
+
+    def names(self):
+        """Get the partition names in disk order.
+
+        Returns:
+            list: Partition names
+        """
+        return [entry.name for entry in self.entries]
+
+    def index(self, name):
+        """Get the position of a partition.
+
+        Args:
+            name (str): Partition name
+
+        Returns:
+            int: Position of the partition in the table
+        """
+        return self.positions[name]
+
+    def at(self, position):
+        """Get the partition at a position.
+
+        Args:
+            position (int): Position in the table
+
+        Returns:
+            Partition: Partition record
+        """
+        return self.entries[position]
+
+    def insert(self, position, partition):
+        """Insert a partition before a position.
+
+        Args:
+            position (int): Position of the new partition
+            partition (Partition): Partition record
+        """
+        if partition.start is None:
+            partition.start = self.entries[position - 1].end if position > 0 else 0
+        self.count_free(partition)
+        self.entries.insert(position, partition)
+        self.reindex(position)
+
+    def append(self, partition):
+        """Add a partition at the end of the table.
+
+        Args:
+            partition (Partition): Partition record
+        """
+        self.insert(len(self.entries), partition)
+
+    def replace(self, position, partition):
+        """Replace the partition at a position.
+
+        Args:
+            position (int): Position in the table
+            partition (Partition): New partition record
+        """
+        replaced = self.entries[position]
+        if partition.start is None:
+            partition.start = replaced.start
+        self.count_free(partition)
+        del self.positions[replaced.name]
+        self.entries[position] = partition
+        self.positions[partition.name] = position
+
+    def remove(self, position):
+        """Remove the partition at a position.
+
+        Args:
+            position (int): Position in the table
+
+        Returns:
+            Partition: Removed partition record
+        """
+        partition = self.entries.pop(position)
+        del self.positions[partition.name]
+        self.reindex(position)
+        return partition
+
+    def next_free_name(self):
+        """Allocate a name for a new free segment.
+
+        Returns:
+            str: Unused 'freespaceN' name
+        """
+        self.free_count += 1
+        return f'freespace{self.free_count}'
+
+    @property
+    def alignment(self):
+        """int: Number of sectors in 1 MB, the alignment of new partitions."""
+        return max(1, mebibyte // self.sectorsize)
+
+    def available(self, position):
+        """Get the usable size of a free segment once aligned.
+
+        Args:
+            position (int): Position of the free segment
+
+        Returns:
+            int: Sectors a partition placed in the segment can use
+        """
+        free = self.entries[position]
+        align = self.alignment
+        start = -(-free.start // align) * align
+        return max(0, (free.end - start) // align * align)
+
+    def allocate(self, position, partition):
+        """Create a partition at the head of a free segment.
+
+        The free segment is split: the partition takes its first aligned
+        partition.size sectors and what is left stays free right after it
+        if it is at least 1 MB.
+
+        Sizes are rounded up to whole MB. The editor offers the size of the
+        segment as displayed, which aligning the start can make too large
+        by up to 1 MB, so a request that fits in the segment but not in
+        available() is trimmed to available(). partition.size is set to
+        the size placed, which is also returned.
+
+        Args:
+            position (int): Position of the free segment
+            partition (Partition): Partition record to place
+
+        Returns:
+            int: Sectors given to the partition
+
+        Raises:
+            ValueError: If the segment is not free or is too small
+        """
+        free = self.entries[position]
+        if not free.is_free:
+            raise ValueError(f'{free.name} is not free space')
+        align = self.alignment
+        size = min(-(-partition.size // align) * align, self.available(position))
+        if partition.size > free.size or size <= 0:
+            raise ValueError(
+                f'{partition.name} needs {partition.size} sectors, '
+                f'{free.name} only has {free.size}'
+            )
+        partition.start = -(-free.start // align) * align
+        partition.size = size
+        size_left = free.end - partition.end
+        self.replace(position, partition)
+        # Like the probe, a tail smaller than 1 MB is not listed as free.
+        if size_left >= align:
+            self.insert(
+                position + 1,
+                Partition.free(self.next_free_name(), size_left, partition.end)
+            )
+        return size
+
+    def release(self, position):
+        """Turn a partition into free space merged with free neighbours.
+
+        The freed space joins the free segment before it, the one after it,
+        or both. Without a free neighbour it becomes a new free segment.
+
+        Args:
+            position (int): Position of the partition to free
+
+        Returns:
+            Partition: The free segment now covering the partition
+        """
+        partition = self.entries[position]
+        start = partition.start
+        end = partition.end
+        behind = self.entries[position - 1] if position > 0 else None
+        after = self.entries[position + 1] if position + 1 < len(self.entries) else None
+        name = None
+        if after is not None and after.is_free:
+            end = after.end
+            name = after.name
+            self.remove(position + 1)
+        if behind is not None and behind.is_free:
+            start = behind.start
+            name = behind.name
+            self.remove(position)
+            position -= 1
+        free = Partition.free(name or self.next_free_name(), end - start, start)
+        self.replace(position, free)
+        return free
+
+    def new_partitions(self):
+        """Get the partitions to be created.
+
+        Returns:
+            list: Partition records with 'New' status, in disk order
+        """
+        return [entry for entry in self.entries if entry.stat == 'New']
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.names())
+
+    def __contains__(self, name):
+        return name in self.positions
+
+    def __getitem__(self, name):
+        return self.entries[self.positions[name]]
+
+    def get(self, name, default=None):
+        position = self.positions.get(name)
+        return default if position is None else self.entries[position]
+
+    def keys(self):
+        return self.names()
+
+    def values(self):
+        return list(self.entries)
+
+    def items(self):
+        return [(entry.name, entry) for entry in self.entries]
+
+    def __repr__(self):
+        return f'PartitionTable({self.entries!r})'
+
+
+class Disk:
+    """A disk with its partition scheme and partition table.
+
+    Attributes:
+        name (str): Disk device name (e.g., 'ada0')
+        scheme (str or None): 'GPT', 'MBR' or None without partition table
+        size (int): Size in sectors
+        sectorsize (int): Sector size in bytes
+        device_model (str): Disk description
+        stripesize (int): Stripe size in bytes, 0 if unknown
+        partitions (PartitionTable): Slices or partitions of the disk
+        stat (str or None): Disk status
+    """
+    __slots__ = ('name', 'scheme', 'size', 'sectorsize', 'device_model',
+                 'stripesize', 'partitions', 'stat')
+
+    keys = {
+        'name': 'name',
+        'scheme': 'scheme',
+        'size': 'size',
+        'sectorsize': 'sectorsize',
+        'device_model': 'device_model',
+        'stripesize': 'stripesize',
+        'partitions': 'partitions',
+        'stat': 'stat',
+    }
+
+    def __init__(self, name, scheme, size, sectorsize=512, device_model='',
+                 stripesize=0, partitions=None, stat=None):
+        self.name = name
+        self.scheme = scheme
+        self.size = int(size)
+        self.sectorsize = sectorsize
+        self.device_model = device_model
+        self.stripesize = stripesize
+        if partitions is None:
+            partitions = PartitionTable(sectorsize=sectorsize)
+        self.partitions = partitions
+        self.stat = stat
+
+    def __getitem__(self, key):
+        if key == 'partition-list':
+            return self.partitions.names()
+        return getattr(self, self.keys[key])
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f'Disk({self.name!r}, {self.scheme!r}, {self.size!r})'
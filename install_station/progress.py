@@ -0,0 +1,190 @@
+"""
+Installation progress estimation for GhostBSD Install Station.
+
+pc-sysinstall prints what it is doing but not how far along it is. The
+progress engine recognises the installation phases from its output,
+partitioning, file system and pool creation, copying the system, the
+boot loader and the final configuration, and turns them into a weighted
+percentage. Within a phase, progress grows with the lines it prints,
+towards the weight of the phase. While copying, the file count
+pc-sysinstall announces with INSTALLCOUNT gives the exact fraction.
+
+The engine does not depend on GTK, so recorded output can be fed through
+it to check the estimates:
+
+    python -m install_station.progress pc-sysinstall.log
+"""
+import math
+import re
+import sys
+from typing import NamedTuple
+from install_station.data import N_
+
+
+class Phase(NamedTuple):
+    """An installation phase as seen in the pc-sysinstall output."""
+    name: str
+    """Title shown to the user, marked with N_ and translated by the caller."""
+    weight: float
+    """Share of the whole installation, the weights add up to 100."""
+    pattern: re.Pattern
+    """Output lines that show the phase has started."""
+    expected_lines: int
+    """Typical number of lines printed in the phase."""
+    counted: bool = False
+    """Whether INSTALLCOUNT announces how many lines the phase prints."""
+
+
+phases = (
+    Phase(N_('Partitioning disks'), 4, re.compile(
+        r'\bgpart\b|\bbsdlabel\b|\bfdisk\b|\bgmirror\b|commitDisk|'
+        r'Cleaning up|Deleting|Clearing', re.IGNORECASE
+    ), 30),
+    Phase(N_('Creating file systems'), 4, re.compile(
+        r'\bnewfs(_msdos)?\b|NEWFS:', re.IGNORECASE
+    ), 10),
+    Phase(N_('Creating ZFS pool'), 4, re.compile(
+        r'\bzpool (create|set)\b|\bzfs (create|set)\b|Creating zpool', re.IGNORECASE
+    ), 20),
+    Phase(N_('Copying the system'), 76, re.compile(
+        r'Starting Extraction|INSTALLCOUNT:|\bcpdup\b|\btar\b|\brsync\b|'
+        r'\bzfs (send|receive|recv)\b|^x \S', re.IGNORECASE
+    ), 50000, counted=True),
+    Phase(N_('Installing boot loader'), 4, re.compile(
+        r'\bbootcode\b|\befibootmgr\b|\bboot0cfg\b|\bgrub-install\b|'
+        r'\bloader\.efi\b|boot ?loader|EFI boot', re.IGNORECASE
+    ), 20),
+    Phase(N_('Finishing installation'), 8, re.compile(
+        r'\bsysrc\b|\bpw (user|group)\b|runCommand|'
+        r'Setting hostname|post-install', re.IGNORECASE
+    ), 40),
+)
+"""Phases in the order pc-sysinstall runs them."""
+
+finished_pattern = re.compile(r'^Installation finished!')
+install_count_pattern = re.compile(r'INSTALLCOUNT:\s*(\d+)')
+
+
+class ProgressState(NamedTuple):
+    """Progress after an output line."""
+    fraction: float
+    """Estimated share of the installation done, from 0 to 1."""
+    phase: str | None
+    """Name of the current phase, None before the first one."""
+    text: str
+    """Output line without its line ending."""
+
+
+class ProgressEngine:
+    """
+    Estimate the installation progress from the pc-sysinstall output.
+
+    Phases only move forward: a line that matches an earlier phase, such
+    as a gpart command while the boot loader is installed, or the current
+    one keeps the current one. When a line matches several later phases
+    the last one wins. The estimate never goes back and only reaches 1 with the
+    'Installation finished!' line.
+
+    Attributes:
+        phases (tuple): Phase definitions, defaults to the module phases
+        index (int): Index of the current phase, -1 before the first one
+        lines (int): Lines printed since the current phase started
+        install_count (int): Files announced with INSTALLCOUNT, 0 if none
+        fraction (float): Last estimate
+    """
+
+    def __init__(self, phase_list=phases):
+        self.phases = phase_list
+        self.total = sum(phase.weight for phase in phase_list)
+        self.index = -1
+        self.lines = 0
+        self.install_count = 0
+        self.fraction = 0.0
+
+    @property
+    def phase(self):
+        """str or None: Name of the current phase."""
+        return None if self.index < 0 else self.phases[self.index].name
+
+    def _match(self, line):
+        """Get the index of the latest phase matching a line, or None."""
+        # A file named loader.efi listed while copying is still copying.
+        if self.index >= 0 and self.phases[self.index].pattern.search(line):
+            return None
+        for index in range(len(self.phases) - 1, self.index, -1):
+            if self.phases[index].pattern.search(line):
+                return index
+        return None
+
+    def _phase_fraction(self):
+        """Estimate the share of the current phase done, below 1."""
+        phase = self.phases[self.index]
+        if phase.counted and self.install_count:
+            return min(self.lines / self.install_count, 0.99)
+        return 0.99 * (1 - math.exp(-self.lines / phase.expected_lines))
+
+    def feed(self, line):
+        """
+        Account for an output line.
+
+        Args:
+            line (str): Line printed by pc-sysinstall
+
+        Returns:
+            ProgressState: Estimate after the line
+        """
+        text = line.rstrip('\n')
+        count = install_count_pattern.search(text)
+        if count:
+            self.install_count = int(count.group(1))
+        if finished_pattern.match(text):
+            self.index = len(self.phases) - 1
+            self.fraction = 1.0
+            return ProgressState(self.fraction, self.phase, text)
+        index = self._match(text)
+        if index is not None:
+            self.index = index
+            self.lines = 0
+        elif self.index >= 0:
+            self.lines += 1
+        if count:
+            # The files are counted from the line after the announcement.
+            self.lines = 0
+        if self.index >= 0:
+            done = sum(phase.weight for phase in self.phases[:self.index])
+            done += self.phases[self.index].weight * self._phase_fraction()
+            self.fraction = max(self.fraction, done / self.total)
+        return ProgressState(self.fraction, self.phase, text)
+
+
+def replay(lines, engine=None):
+    """
+    Feed recorded output through a progress engine.
+
+    Args:
+        lines (iterable): Output lines, e.g. an open log file
+        engine (ProgressEngine, optional): Engine to use, a new one if omitted
+
+    Returns:
+        list: ProgressState after each line
+    """
+    if engine is None:
+        engine = ProgressEngine()
+    return [engine.feed(line) for line in lines]
+
+
+def main(argv):
+    """Print the estimate of each phase change in a recorded log."""
+    if len(argv) != 1:
+        sys.exit('usage: python -m install_station.progress LOG')
+    with open(argv[0], errors='replace') as log:
+        states = replay(log)
+    phase = None
+    for number, state in enumerate(states, 1):
+        if state.phase != phase or number == len(states):
+            phase = state.phase
+            print(f'{number:>7} {state.fraction:>6.1%}  {phase}: {state.text[:60]}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
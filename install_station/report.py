@@ -0,0 +1,212 @@
+"""
+Installation timing report for GhostBSD Install Station.
+
+Times the installation phases on the monotonic clock: writing the
+configuration, the partition changes and the pc-sysinstall run, along
+with the stages of pc-sysinstall seen by the progress engine. At the end
+a JSON report with the hardware, the disk layout, the durations, the
+slowest commands, the queries answered from SessionFacts and the exit
+status is written under /tmp, so install times can be compared between
+machines. The messages and the pc-sysinstall output logged during the
+installation are written next to it, in a .log file of the same name.
+"""
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from time import monotonic
+from install_station.commands import CommandRunner
+from install_station.data import InstallationData, tmp
+from install_station.devfs import DeviceWait
+from install_station.facts import SessionFacts
+from install_station.partition import DiskPartition
+
+
+class InstallReport:
+    """
+    Timings of the current installation.
+
+    Attributes:
+        directory (str): Directory the report is written to
+        started (float or None): Monotonic time begin() was called
+        started_at (str): Wall clock time begin() was called, ISO 8601
+        phases (list): {'name', 'start', 'duration'} of each phase, the
+            start in seconds since begin()
+        stages (list): Same for the pc-sysinstall stages
+        output (list): Lines logged with log() since begin()
+        slowest (int): Number of slowest commands listed in the report
+    """
+    directory: str = tmp
+    started: float | None = None
+    started_at: str = ''
+    phases: list = []
+    stages: list = []
+    output: list = []
+    slowest: int = 10
+    _stage_started: float = 0.0
+
+    @classmethod
+    def begin(cls) -> None:
+        """
+        Start timing a new installation and reset the command logs.
+
+        The disks quarantined while probing, before the installation, are
+        logged again so the new log still names them.
+        """
+        cls.started = monotonic()
+        cls.started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        cls.phases = []
+        cls.stages = []
+        cls.output = [
+            f'{disk} does not respond and is left out: {reason}'
+            for disk, reason in DiskPartition.quarantine.items()
+        ]
+        CommandRunner.reset_log()
+        DeviceWait.reset_log()
+
+    @classmethod
+    def log(cls, text: str) -> None:
+        """
+        Add a line to the installation log.
+
+        Args:
+            text: Message or output line, without its line ending
+        """
+        cls.output.append(text)
+
+    @classmethod
+    def _elapsed(cls) -> float:
+        """Seconds since begin(), begin() is called if it was not."""
+        if cls.started is None:
+            cls.begin()
+        return monotonic() - cls.started
+
+    @classmethod
+    @contextmanager
+    def phase(cls, name: str):
+        """
+        Time a phase of the installation.
+
+        Args:
+            name: Phase name used in the report
+        """
+        entry = {'name': name, 'start': round(cls._elapsed(), 3), 'duration': None}
+        cls.phases.append(entry)
+        start = monotonic()
+        try:
+            yield entry
+        finally:
+            entry['duration'] = round(monotonic() - start, 3)
+
+    @classmethod
+    def stage(cls, name: str | None) -> None:
+        """
+        Mark the start of a pc-sysinstall stage, ending the previous one.
+
+        Args:
+            name: Stage name, None to only end the previous stage
+        """
+        elapsed = cls._elapsed()
+        if cls.stages and cls.stages[-1]['duration'] is None:
+            cls.stages[-1]['duration'] = round(elapsed - cls._stage_started, 3)
+        if name is not None:
+            cls._stage_started = elapsed
+            cls.stages.append(
+                {'name': name, 'start': round(elapsed, 3), 'duration': None}
+            )
+
+    @staticmethod
+    def hardware() -> dict:
+        """
+        Summarize the machine from sysctl and the partition database.
+
+        Returns:
+            dict: CPU model and count, memory, boot method and disks
+        """
+        summary = {}
+        for key, name in (('cpu', 'hw.model'), ('cpus', 'hw.ncpu'),
+                          ('memory', 'hw.physmem'), ('boot', 'machdep.bootmethod')):
+            try:
+                result = CommandRunner.run(['sysctl', '-n', name])
+            except (OSError, RuntimeError):
+                # No sysctl, or no recording of it when replaying.
+                summary[key] = ''
+                continue
+            value = result.stdout.strip() if result.returncode == 0 else ''
+            summary[key] = int(value) if value.isdigit() else value
+        summary['disks'] = [
+            {
+                'name': disk,
+                'model': disk_info.device_model,
+                'size': disk_info.size * disk_info.sectorsize,
+                'sectorsize': disk_info.sectorsize,
+                'scheme': disk_info.scheme
+            }
+            for disk, disk_info in DiskPartition.probed_database.items()
+        ]
+        return summary
+
+    @staticmethod
+    def layout() -> dict:
+        """
+        Describe the chosen installation layout.
+
+        Returns:
+            dict: Install type, boot manager and disk configuration
+        """
+        return {
+            'install_type': InstallationData.install_type,
+            'boot': InstallationData.boot,
+            'disk': InstallationData.disk,
+            'slice': InstallationData.slice,
+            'scheme': InstallationData.scheme,
+            'partitions': InstallationData.new_partition,
+            'zfs': InstallationData.zfs_config_data,
+            'ufs': InstallationData.ufs_config_data
+        }
+
+    @classmethod
+    def write(cls, finished: bool, returncode: int | None,
+              interrupted: str | None = None, error: str | None = None) -> str:
+        """
+        Write the report of the installation and its log.
+
+        Args:
+            finished: Whether pc-sysinstall reported a finished installation
+            returncode: Exit code of pc-sysinstall, None if it did not run
+            interrupted: Phase the installation was cancelled in, if it was
+            error: Error that stopped the installation, if any
+
+        Returns:
+            str: Path of the report
+        """
+        cls.stage(None)
+        commands = sorted(CommandRunner.log, key=lambda entry: entry[2], reverse=True)
+        report = {
+            'started_at': cls.started_at,
+            'duration': round(cls._elapsed(), 3),
+            'finished': finished,
+            'returncode': returncode,
+            'interrupted': interrupted,
+            'error': error,
+            'hardware': cls.hardware(),
+            'layout': cls.layout(),
+            'phases': cls.phases,
+            'stages': cls.stages,
+            'device_waits': {
+                'count': len(DeviceWait.log),
+                'seconds': round(sum(seconds for *_, seconds in DeviceWait.log), 3)
+            },
+            'session_facts': SessionFacts.stats(),
+            'slowest_commands': [
+                {'command': command, 'returncode': code, 'duration': round(duration, 3)}
+                for command, code, duration in commands[:cls.slowest]
+            ]
+        }
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(cls.directory, f'install-station-report-{stamp}.json')
+        with open(f'{path[:-5]}.log', 'w') as log_file:
+            log_file.writelines(f'{line}\n' for line in cls.output)
+        with open(path, 'w') as report_file:
+            json.dump(report, report_file, indent=2, default=str)
+        return path
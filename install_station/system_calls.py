@@ -2,8 +2,9 @@
 
 import re
 import os
-from subprocess import Popen, run, PIPE
+from install_station.commands import CommandRunner, CommandTimeout
 from install_station.data import pc_sysinstall
+from install_station.partition import DiskPartition, disk_list, disk_size, probe_timeout
 
 
 def replace_pattern(current: str, new: str, file: str) -> None:
@@ -27,9 +28,7 @@ def language_dictionary() -> dict[str, str]:
     Returns:
         Dictionary mapping language names to language codes
     """
-    langs = Popen(f'{pc_sysinstall} query-langs', shell=True, stdin=PIPE,
-                  stdout=PIPE, universal_newlines=True,
-                  close_fds=True).stdout.readlines()
+    langs = CommandRunner.run([pc_sysinstall, 'query-langs']).stdout.splitlines()
     dictionary = {}
     for line in langs:
         lang_list = line.rstrip()
@@ -74,9 +73,9 @@ def keyboard_dictionary() -> dict[str, dict[str, str | None]]:
     Returns:
         Dictionary mapping keyboard layout names to layout/variant dictionaries
     """
-    xkeyboard_layouts = Popen(f'{pc_sysinstall} xkeyboard-layouts', shell=True,
-                              stdout=PIPE,
-                              universal_newlines=True).stdout.readlines()
+    xkeyboard_layouts = CommandRunner.run(
+        [pc_sysinstall, 'xkeyboard-layouts']
+    ).stdout.splitlines()
     dictionary = {}
     for line in xkeyboard_layouts:
         keyboard_list = list(filter(None, line.rstrip().split('  ')))
@@ -87,9 +86,9 @@ def keyboard_dictionary() -> dict[str, dict[str, str | None]]:
         if kb_layouts != 'custom':
             dictionary[kb_name] = {'layout': kb_layouts, 'variant': kb_variant}
 
-    xkeyboard_variants = Popen(f'{pc_sysinstall} xkeyboard-variants',
-                               shell=True, stdout=PIPE,
-                               universal_newlines=True).stdout.readlines()
+    xkeyboard_variants = CommandRunner.run(
+        [pc_sysinstall, 'xkeyboard-variants']
+    ).stdout.splitlines()
     for line in xkeyboard_variants:
         xkb_variant = line.rstrip()
         kb_name = xkb_variant.partition(':')[2].strip()
@@ -107,9 +106,9 @@ def keyboard_models() -> dict[str, str]:
     Returns:
         Dictionary mapping keyboard model names to model codes
     """
-    xkeyboard_models = Popen(f'{pc_sysinstall} xkeyboard-models', shell=True,
-                             stdout=PIPE,
-                             universal_newlines=True).stdout.readlines()
+    xkeyboard_models = CommandRunner.run(
+        [pc_sysinstall, 'xkeyboard-models']
+    ).stdout.splitlines()
     dictionary = {}
     for line in xkeyboard_models:
         kbm_name = line.rstrip().partition(' ')[2]
@@ -126,16 +125,12 @@ def change_keyboard(kb_layout: str, kb_variant: str | None = None, kb_model: str
         kb_variant: Optional keyboard variant code
         kb_model: Optional keyboard model code
     """
-    if kb_variant is None and kb_model is not None:
-        run(f"setxkbmap -layout {kb_layout} -model {kb_model}", shell=True)
-    elif kb_variant is not None and kb_model is None:
-        run(f"setxkbmap -layout {kb_layout} -variant {kb_variant}", shell=True)
-    elif kb_variant is not None and kb_model is not None:
-        set_kb_cmd = f"setxkbmap -layout {kb_layout} -variant {kb_variant} " \
-            f"-model {kb_model}"
-        run(set_kb_cmd, shell=True)
-    else:
-        run(f"setxkbmap -layout {kb_layout}", shell=True)
+    set_kb_cmd = ['setxkbmap', '-layout', kb_layout]
+    if kb_variant is not None:
+        set_kb_cmd.extend(['-variant', kb_variant])
+    if kb_model is not None:
+        set_kb_cmd.extend(['-model', kb_model])
+    CommandRunner.run(set_kb_cmd)
 
 
 def set_keyboard(kb_layout: str, kb_variant: str | None = None, kb_model: str | None = None) -> None:
@@ -143,27 +138,28 @@ def set_keyboard(kb_layout: str, kb_variant: str | None = None, kb_model: str |
     Permanently configure keyboard layout for the live system.
     Based on pc-sysinstall's localize_x_keyboard function.
     """
-    setxkbmap_cmd = ""
+    setxkbmap_args = []
     
     # Build setxkbmap command
     if kb_model and kb_model != "NONE":
-        setxkbmap_cmd = f"-model {kb_model}"
+        setxkbmap_args.extend(['-model', kb_model])
         kx_model = kb_model
     else:
         kx_model = "pc104"
     
     if kb_layout and kb_layout != "NONE":
-        setxkbmap_cmd = f"{setxkbmap_cmd} -layout {kb_layout}".strip()
+        setxkbmap_args.extend(['-layout', kb_layout])
         kx_layout = kb_layout
     else:
         kx_layout = "us"
     
     if kb_variant and kb_variant != "NONE":
-        setxkbmap_cmd = f"{setxkbmap_cmd} -variant {kb_variant}"
+        setxkbmap_args.extend(['-variant', kb_variant])
+    setxkbmap_cmd = ' '.join(setxkbmap_args)
     
     # Apply the keyboard layout immediately
     if setxkbmap_cmd:
-        run(f"setxkbmap {setxkbmap_cmd}", shell=True)
+        CommandRunner.run(['setxkbmap', *setxkbmap_args])
         
         # Create .xprofile for persistent keyboard layout
         xprofile_path = "/home/ghostbsd/.xprofile"
@@ -236,8 +232,7 @@ def timezone_dictionary() -> dict[str, list[str]]:
     Returns:
         Dictionary mapping continents to lists of cities/regions
     """
-    tz_list = Popen(f'{pc_sysinstall} list-tzones', shell=True,
-                    stdout=PIPE, universal_newlines=True).stdout.readlines()
+    tz_list = CommandRunner.run([pc_sysinstall, 'list-tzones']).stdout.splitlines()
     city_list = []
     dictionary = {}
     last_continent = ''
@@ -261,18 +256,25 @@ def timezone_dictionary() -> dict[str, list[str]]:
 def zfs_disk_query() -> list[str]:
     """Query available disks for ZFS installation.
     
+    pc-sysinstall describes every disk, if it hangs on one the disks are
+    listed from kern.disks without their description. If that hangs too,
+    the disks of the last scan that answered are listed.
+    
     Returns:
         List of available disk device names
     """
-    disk_output = Popen(
-        f"{pc_sysinstall} disk-list",
-        shell=True,
-        stdin=PIPE,
-        stdout=PIPE,
-        universal_newlines=True,
-        close_fds=True
-    )
-    return disk_output.stdout.readlines()
+    try:
+        disk_output = CommandRunner.run([pc_sysinstall, 'disk-list'], timeout=probe_timeout)
+    except CommandTimeout:
+        try:
+            disks = disk_list()
+        except CommandTimeout:
+            disks = [
+                disk for disk in DiskPartition.probed_database
+                if disk not in DiskPartition.quarantine
+            ]
+        return [f'{disk}:\n' for disk in disks]
+    return disk_output.stdout.splitlines(keepends=True)
 
 
 def zfs_disk_size_query(disk: str) -> str:
@@ -282,17 +284,15 @@ def zfs_disk_size_query(disk: str) -> str:
         disk: Disk device name
         
     Returns:
-        Disk size information string
+        Disk size in MB, empty if the disk does not respond
     """
-    disk_info_output = Popen(
-        f"{pc_sysinstall} disk-info {disk}",
-        shell=True,
-        stdin=PIPE,
-        stdout=PIPE,
-        universal_newlines=True,
-        close_fds=True
-    )
-    return disk_info_output.stdout.readlines()[3].partition('=')[2]
+    if disk in DiskPartition.quarantine:
+        return ''
+    try:
+        return disk_size(disk)
+    except CommandTimeout as e:
+        DiskPartition.quarantine_disk(disk, str(e))
+        return ''
 
 
 def set_admin_user(username: str, name: str, password: str, shell: str, homedir: str, hostname: str) -> None:
@@ -307,9 +307,13 @@ def set_admin_user(username: str, name: str, password: str, shell: str, homedir:
         hostname: System hostname to set
     """
     # Set Root user
-    run(f"echo '{password}' | pw usermod -n root -h 0", shell=True)
-    cmd = f"echo '{password}' | pw useradd {username} -c {name} -h 0" \
-        f" -s {shell} -m -d {homedir} -g wheel,operator"
-    run(cmd, shell=True)
-    run(f"sysrc hostname={hostname}", shell=True)
-    run(f"hostname {hostname}", shell=True)
+    # pw reads the password from standard input with -h 0, so it never
+    # shows up in a command line or in recorded commands.
+    CommandRunner.run(['pw', 'usermod', '-n', 'root', '-h', '0'],
+                      input=f'{password}\n')
+    CommandRunner.run([
+        'pw', 'useradd', username, '-c', name, '-h', '0', '-s', shell,
+        '-m', '-d', homedir, '-g', 'wheel,operator'
+    ], input=f'{password}\n')
+    CommandRunner.run(['sysrc', f'hostname={hostname}'])
+    CommandRunner.run(['hostname', hostname])
@@ -76,9 +76,6 @@ class ZFS:
         if cls.disk_encrypt and not cls.password.get_text().strip():
             raise ValueError("Password cannot be empty when disk encryption is enabled")
             
-        size = int(cls.zfs_disk_list[0].partition('-')[2].rstrip()) - 512
-        swap = 0
-        zfs_num = size - swap
         if cls.disk_encrypt is True:
             dgeli = '.eli'
         else:
@@ -111,15 +108,10 @@ class ZFS:
                 num += 1
                 disk_len -= 1
             pool_disk = f' ({cls.pool_type}:{mirror_dsk})\n'
-        if bios_or_uefi() == "UEFI":
-            zfs_num = zfs_num - 100
-        else:
-            zfs_num = zfs_num - 1
-        # adding zero to use remaining space
-        zfs_part = f'disk0-part=ZFS{dgeli} {zfs_num} {zfs_datasets}{pool_disk}'
+        # Size zero uses the remaining space, pc-sysinstall sizes the pool
+        # after its own boot partitions and table overhead
+        zfs_part = f'disk0-part=ZFS{dgeli} 0 {zfs_datasets}{pool_disk}'
         InstallationData.zfs_config_data.append(zfs_part)
-        if swap != 0:
-            InstallationData.zfs_config_data.append('disk0-part=swap 0 none\n')
         if cls.disk_encrypt is True:
             InstallationData.zfs_config_data.append(f'encpass={cls.password.get_text()}\n')
         else:
@@ -280,6 +272,9 @@ class ZFS:
             dsk = disk.partition(':')[0].rstrip()
             dsk_name = disk.partition(':')[2].rstrip()
             dsk_size = zfs_disk_size_query(dsk).rstrip()
+            if not dsk_size:
+                # The disk did not answer, it cannot be part of the pool.
+                dsk_name = get_text('Unresponsive')
             cls.store.append(None, [dsk, dsk_size, dsk_name, False])
         treeview = Gtk.TreeView()
         treeview.set_model(cls.store)
@@ -462,6 +457,8 @@ class ZFS:
         Returns:
             bool: Always returns True to indicate the event was handled
         """
+        if not model[path][1]:
+            return True
         model[path][3] = not model[path][3]
         if model[path][3] is False:
             cls.zfs_disk_list.remove(model[path][0] + "-" + model[path][1])
@@ -66,7 +66,7 @@ class UpdateTranslationsCommand(Command):
         # Step 1: Extract messages to .pot file (create or update)
         print("Extracting messages to .pot file...")
         os.system(
-            f'xgettext --from-code=UTF-8 -L Python --keyword=get_text -o {pot_file}'
+            f'xgettext --from-code=UTF-8 -L Python --keyword=get_text --keyword=N_ -o {pot_file}'
             ' install_station/*.py install-station'
         )
         
@@ -107,7 +107,7 @@ class CreateTranslationCommand(Command):
         if not os.path.exists(pot_file):
             print("Extracting messages to .pot file...")
             os.system(
-                f'xgettext --from-code=UTF-8 -L Python --keyword=get_text -o {pot_file}'
+                f'xgettext --from-code=UTF-8 -L Python --keyword=get_text --keyword=N_ -o {pot_file}'
                 ' install_station/*.py install-station'
             )
         # Create the new .po file
@@ -134,10 +134,7 @@ lib_install_station_backend_query = [
     'src/backend-query/detect-scheme.sh',
     'src/backend-query/detect-vmware.sh',
     'src/backend-query/detect-wifi.sh',
-    'src/backend-query/disk-info.sh',
-    'src/backend-query/disk-label.sh',
     'src/backend-query/disk-list.sh',
-    'src/backend-query/disk-part.sh',
     'src/backend-query/enable-net.sh',
     'src/backend-query/list-components.sh',
     'src/backend-query/list-rsync-backups.sh',
@@ -0,0 +1,176 @@
+"""Tests for the partition plan compiler."""
+import pytest
+from install_station.disk_plan import (
+    compile_plan,
+    describe_plan,
+    diff_layouts,
+    planned_changes
+)
+from install_station.partition import DiskPartition
+from install_station.partition_model import Disk, Partition, PartitionTable
+
+
+def gpt_disk(disk, *entries):
+    """Build a 16 GB GPT disk from (name, start, size, type, stat) tuples."""
+    return Disk(disk, 'GPT', 33554432, partitions=PartitionTable([
+        Partition(name, size, file_system=file_system, stat=stat, start=start)
+        for name, start, size, file_system, stat in entries
+    ]))
+
+
+probed = {
+    'ada0': gpt_disk(
+        'ada0',
+        ('ada0p1', 40, 1024, 'freebsd-boot', None),
+        ('ada0p2', 2048, 16777216, 'freebsd-ufs', None),
+        ('ada0p3', 16779264, 4194304, 'freebsd-swap', None),
+        ('freespace1', 20973568, 12580831, 'none', None),
+    ),
+    'ada1': Disk('ada1', 'MBR', 33554432, partitions=PartitionTable([
+        Partition('ada1s1', 33552384, file_system='freebsd', start=2048),
+    ])),
+}
+"""ada0 with a GPT FreeBSD install, ada1 with an MBR slice."""
+
+edited = {
+    # The root and swap partitions are replaced by a new boot partition
+    # and a root partition pc-sysinstall creates.
+    'ada0': gpt_disk(
+        'ada0',
+        ('ada0p1', 40, 1024, 'freebsd-boot', None),
+        ('ada0p2', 2048, 2048, 'BOOT', 'New'),
+        ('ada0p3', 4096, 29548544, 'UFS', 'New'),
+        ('freespace1', 29552640, 4001759, 'none', None),
+    ),
+    # Converted to GPT with a boot partition.
+    'ada1': gpt_disk(
+        'ada1',
+        ('ada1p1', 2048, 2048, 'BOOT', 'New'),
+        ('freespace1', 4096, 33550302, 'none', None),
+    ),
+}
+"""The layout after editing the disks in the custom partition editor."""
+
+
+def test_diff_layouts():
+    changes = diff_layouts(probed, edited, boot='none')
+    assert changes.destroy == {'ada1': 'GPT'}
+    assert changes.delete == ['ada0p2', 'ada0p3']
+    # The unchanged ada0p1 and the root partition are not added.
+    assert changes.create == [['ada0p2', 2048, 2048], ['ada1p1', 2048, 2048]]
+
+
+def test_boot_partition_added_again_unchanged_is_kept():
+    # Left by a previous installation, the editor allocates 1 MB for it.
+    layout = gpt_disk('ada0', ('ada0p1', 2048, 512, 'freebsd-boot', None))
+    changes = diff_layouts(
+        {'ada0': layout},
+        {'ada0': gpt_disk('ada0', ('ada0p1', 2048, 2048, 'BOOT', 'New'))},
+        boot='none'
+    )
+    assert changes == ({}, [], [])
+
+
+def test_compile_plan_dry_run():
+    plans = compile_plan(
+        bios_type='BIOS', changes=diff_layouts(probed, edited, 'none'), boot='none'
+    )
+    assert describe_plan(plans) == [
+        'ada1:',
+        '    sudo gpart destroy -F ada1',
+        '    sudo dd if=/dev/zero of=/dev/ada1 bs=1m count=1',
+        '    sudo gpart create -s GPT -f x ada1',
+        '    sudo gpart add -a 4k -b 2048 -s 512 -t freebsd-boot -i 1 -f x ada1',
+        '    sudo zpool labelclear -f ada1p1',
+        'ada0:',
+        '    sudo zpool labelclear -f ada0p2',
+        '    sudo gpart delete -i 2 -f x ada0',
+        '    sudo zpool labelclear -f ada0p3',
+        '    sudo gpart delete -i 3 -f x ada0',
+        '    sudo gpart add -a 4k -b 2048 -s 512 -t freebsd-boot -i 2 -f x ada0',
+        '    sudo zpool labelclear -f ada0p2',
+    ]
+
+
+def test_compile_plan_deletes_before_adding():
+    plan, = compile_plan(bios_type='BIOS', boot='none', changes=diff_layouts(
+        {'ada0': probed['ada0']}, {'ada0': edited['ada0']}, 'none'
+    ))
+    gpart = [step.command[1] for step in plan.steps if step.command[0] == 'gpart']
+    assert gpart == ['delete', 'delete', 'add']
+    assert all(step.deferred for step in plan.steps if step.command[0] == 'gpart')
+    add = plan.steps[-2]
+    assert add.wait == ('ada0p2', True)
+
+
+def test_compile_plan_uefi():
+    plan, = compile_plan(bios_type='UEFI', boot='none', changes=diff_layouts(
+        {'ada1': probed['ada1']}, {'ada1': edited['ada1']}, 'none'
+    ))
+    assert [str(step) for step in plan.steps[3:]] == [
+        'sudo gpart add -a 4k -b 2048 -s 2048 -t efi -i 1 -f x ada1',
+        'sudo zpool labelclear -f ada1p1',
+        'sudo newfs_msdos -F 16 ada1p1',
+    ]
+
+
+def test_compile_plan_mbr_slice():
+    layout = Disk('ada1', 'MBR', 33554432, partitions=PartitionTable([
+        Partition('ada1s1', 33552384, file_system='BSD', stat='New', start=2048),
+    ]))
+    plan, = compile_plan(bios_type='BIOS', boot='none', changes=diff_layouts(
+        {'ada1': probed['ada1']}, {'ada1': layout}, 'none'
+    ))
+    assert [str(step) for step in plan.steps] == [
+        'sudo zpool labelclear -f ada1s1',
+        'sudo gpart delete -i 1 -f x ada1',
+        'sudo gpart add -a 4k -b 2048 -s 33552384 -t freebsd -i 1 -f x ada1',
+    ]
+
+
+def test_retry_plans_from_the_disks_left_by_the_failed_attempt(monkeypatch):
+    # The plan of ada0 was committed, then pc-sysinstall added root and
+    # swap and failed.
+    left = gpt_disk(
+        'ada0',
+        ('ada0p1', 40, 1024, 'freebsd-boot', None),
+        ('ada0p2', 2048, 512, 'freebsd-boot', None),
+        ('ada0p3', 4096, 29548544, 'freebsd-ufs', None),
+        ('ada0p4', 29552640, 4001759, 'freebsd-swap', None),
+    )
+    monkeypatch.setattr(DiskPartition, 'probed_database', {'ada0': probed['ada0']})
+    monkeypatch.setattr(DiskPartition, 'disk_database', {'ada0': edited['ada0']})
+    monkeypatch.setattr(DiskPartition, 'quarantine', {})
+    monkeypatch.setattr(DiskPartition, 'scan_database', lambda: {'ada0': left})
+    # The first plan would add ada0p2 again, whose index is in use now.
+    assert planned_changes(boot='none').create == [['ada0p2', 2048, 2048]]
+    plan, = compile_plan(
+        bios_type='BIOS', changes=planned_changes(rescan=True, boot='none'), boot='none'
+    )
+    assert [str(step) for step in plan.steps] == [
+        'sudo zpool labelclear -f ada0p3',
+        'sudo gpart delete -i 3 -f x ada0',
+        'sudo zpool labelclear -f ada0p4',
+        'sudo gpart delete -i 4 -f x ada0',
+    ]
+
+
+def test_retry_refuses_an_unresponsive_disk(monkeypatch):
+    def scan_database():
+        DiskPartition.quarantine['ada0'] = 'gpart show timed out'
+        return {'ada0': DiskPartition.unresponsive_disk('ada0')}
+
+    monkeypatch.setattr(DiskPartition, 'disk_database', {'ada0': edited['ada0']})
+    monkeypatch.setattr(DiskPartition, 'quarantine', {})
+    monkeypatch.setattr(DiskPartition, 'scan_database', scan_database)
+    with pytest.raises(RuntimeError, match='ada0 does not respond'):
+        planned_changes(rescan=True)
+
+
+def test_compile_plan_grub_uses_bios_boot():
+    plan, = compile_plan(bios_type='BIOS', boot='grub', changes=diff_layouts(
+        {'ada1': probed['ada1']}, {'ada1': edited['ada1']}, 'grub'
+    ))
+    assert str(plan.steps[3]) == (
+        'sudo gpart add -a 4k -b 2048 -s 2048 -t bios-boot -i 1 -f x ada1'
+    )
@@ -0,0 +1,78 @@
+"""Tests for the GEOM confxml probe backend."""
+import os
+from install_station.geom import disk_database, disk_signature, parse_confxml
+
+fixture = os.path.join(os.path.dirname(__file__), 'fixtures', 'confxml.xml')
+
+
+def layout(table):
+    """List a PartitionTable as (name, start, size, type, labels) tuples."""
+    return [
+        (entry.name, entry.start, entry.size, entry.file_system,
+         layout(entry.partitions))
+        for entry in table.values()
+    ]
+
+
+def test_parse_confxml_keeps_disks_and_tables():
+    mesh = parse_confxml(fixture)
+    assert list(mesh['disks']) == ['ada0', 'ada1', 'da0']
+    assert sorted(mesh['tables']) == ['ada0', 'ada1', 'ada1s1']
+    assert mesh['tables']['ada1s1']['scheme'] == 'BSD'
+    assert mesh['disks']['da0']['sectorsize'] == 4096
+
+
+def test_parse_confxml_accepts_bytes():
+    with open(fixture, 'rb') as confxml:
+        assert parse_confxml(confxml.read()) == parse_confxml(fixture)
+
+
+def test_disk_database_gpt():
+    disk = disk_database(parse_confxml(fixture), ['ada0'])['ada0']
+    assert (disk.scheme, disk.size, disk.sectorsize, disk.stripesize) == (
+        'GPT', 16777216, 512, 4096
+    )
+    assert disk.device_model == 'Samsung SSD 860 EVO 250GB'
+    # The 984 sectors left before the aligned efi partition are not listed.
+    assert layout(disk.partitions) == [
+        ('ada0p1', 40, 1024, 'freebsd-boot', []),
+        ('ada0p2', 2048, 409600, 'efi', []),
+        ('ada0p3', 411648, 8388608, 'freebsd-ufs', []),
+        ('freespace1', 8800256, 2097152, 'none', []),
+        ('ada0p4', 10897408, 2097152, 'freebsd-swap', []),
+        ('freespace2', 12994560, 3782616, 'none', []),
+    ]
+
+
+def test_disk_database_mbr_with_bsd_label():
+    disk = disk_database(parse_confxml(fixture), ['ada1'])['ada1']
+    assert (disk.scheme, disk.size, disk.stripesize) == ('MBR', 16777216, 0)
+    assert layout(disk.partitions) == [
+        ('ada1s1', 2048, 12582912, 'freebsd', [
+            ('ada1s1a', 16, 8388608, 'freebsd-ufs', []),
+            ('ada1s1b', 8388624, 2097152, 'freebsd-swap', []),
+            ('freespace1', 10485776, 2097136, 'none', []),
+        ]),
+        ('freespace1', 12584960, 4192256, 'none', []),
+    ]
+
+
+def test_disk_database_empty_disk():
+    disk = disk_database(parse_confxml(fixture), ['da0'])['da0']
+    assert (disk.scheme, disk.size, disk.sectorsize) == (None, 1048576, 4096)
+    assert layout(disk.partitions) == []
+    assert disk.partitions.sectorsize == 4096
+
+
+def test_disk_database_keeps_order_and_skips_missing_disks():
+    database = disk_database(parse_confxml(fixture), ['da0', 'ada9', 'ada1', 'ada0'])
+    assert list(database) == ['da0', 'ada1', 'ada0']
+
+
+def test_disk_signature_follows_bsd_labels():
+    mesh = parse_confxml(fixture)
+    signature = disk_signature(mesh, 'ada1')
+    assert disk_signature(mesh, 'ada0') != signature
+    mesh['tables']['ada1s1']['entries'].pop()
+    assert disk_signature(mesh, 'ada1') != signature
+    assert disk_signature(mesh, 'ada9') is None
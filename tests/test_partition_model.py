@@ -0,0 +1,105 @@
+"""Tests for the sector-exact partition table."""
+import pytest
+from install_station.partition_model import Partition, PartitionTable
+
+mb = 2048
+"""Sectors in 1 MB with 512 byte sectors."""
+
+
+def layout(table):
+    """List a PartitionTable as (name, start, size) tuples."""
+    return [(entry.name, entry.start, entry.size) for entry in table.values()]
+
+
+def gpt_table():
+    """A GPT disk of 100 MB with its free space from sector 40."""
+    return PartitionTable([Partition.free('freespace1', 100 * mb - 40 - 34, 40)])
+
+
+def test_allocate_aligns_the_start_to_1_mb():
+    table = gpt_table()
+    assert table.allocate(0, Partition('ada0p1', 10 * mb, stat='New')) == 10 * mb
+    assert layout(table) == [
+        ('ada0p1', mb, 10 * mb),
+        ('freespace2', 11 * mb, 89 * mb - 34),
+    ]
+
+
+def test_allocate_rounds_the_size_up_to_whole_mb():
+    table = gpt_table()
+    table.allocate(0, Partition('ada0p1', 1024, stat='New'))
+    assert table['ada0p1'].size == mb
+
+
+def test_allocate_trims_the_whole_segment_to_what_is_available():
+    table = gpt_table()
+    partition = Partition('ada0p1', table.at(0).size, stat='New')
+    assert table.available(0) == 98 * mb
+    # The last MB is partial, the aligned start loses the first one.
+    assert table.allocate(0, partition) == 98 * mb
+    assert partition.size == 98 * mb
+    assert layout(table) == [('ada0p1', mb, 98 * mb)]
+
+
+def test_allocate_leaves_out_a_tail_under_1_mb():
+    table = PartitionTable([Partition.free('freespace1', 10 * mb + 100, 0)])
+    table.allocate(0, Partition('ada0p1', 10 * mb, stat='New'))
+    assert layout(table) == [('ada0p1', 0, 10 * mb)]
+
+
+def test_allocate_refuses_a_partition_or_a_too_large_request():
+    table = gpt_table()
+    with pytest.raises(ValueError, match='only has'):
+        table.allocate(0, Partition('ada0p1', 200 * mb, stat='New'))
+    table.allocate(0, Partition('ada0p1', 10 * mb, stat='New'))
+    with pytest.raises(ValueError, match='is not free space'):
+        table.allocate(0, Partition('ada0p2', mb, stat='New'))
+
+
+def partitioned_table():
+    """Four 10 MB partitions followed by free space."""
+    table = PartitionTable([Partition.free('freespace1', 100 * mb, 0)])
+    for number in range(1, 5):
+        table.allocate(number - 1, Partition(f'ada0p{number}', 10 * mb, stat='New'))
+    return table
+
+
+def test_release_without_free_neighbour_names_a_new_segment():
+    table = partitioned_table()
+    free = table.release(table.index('ada0p2'))
+    assert (free.name, free.start, free.size) == ('freespace6', 10 * mb, 10 * mb)
+    assert table.names() == ['ada0p1', 'freespace6', 'ada0p3', 'ada0p4', 'freespace5']
+
+
+def test_release_merges_with_the_free_segment_before():
+    table = partitioned_table()
+    table.release(table.index('ada0p2'))
+    free = table.release(table.index('ada0p3'))
+    assert (free.name, free.start, free.size) == ('freespace6', 10 * mb, 20 * mb)
+    assert table.names() == ['ada0p1', 'freespace6', 'ada0p4', 'freespace5']
+
+
+def test_release_merges_with_the_free_segment_after():
+    table = partitioned_table()
+    free = table.release(table.index('ada0p4'))
+    assert (free.name, free.start, free.size) == ('freespace5', 30 * mb, 70 * mb)
+    assert table.names() == ['ada0p1', 'ada0p2', 'ada0p3', 'freespace5']
+
+
+def test_release_merges_both_free_neighbours():
+    table = partitioned_table()
+    table.release(table.index('ada0p3'))
+    table.release(table.index('ada0p4'))
+    table.release(table.index('ada0p2'))
+    assert layout(table) == [('ada0p1', 0, 10 * mb), ('freespace6', 10 * mb, 90 * mb)]
+    assert table.index('freespace6') == 1
+    assert 'freespace5' not in table
+
+
+def test_free_segment_names_continue_after_the_probed_ones():
+    table = PartitionTable([
+        Partition('ada0p1', 10 * mb, file_system='freebsd-ufs', start=0),
+        Partition.free('freespace3', 20 * mb, 10 * mb),
+    ])
+    table.allocate(1, Partition('ada0p2', 5 * mb, stat='New'))
+    assert table.names() == ['ada0p1', 'ada0p2', 'freespace4']
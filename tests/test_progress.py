@@ -0,0 +1,50 @@
+"""
+Tests for the installation progress estimate.
+
+The fixture is not a captured log. It is a hand-written sample of the
+output of a UEFI ZFS installation, with the pc-sysinstall messages and
+commands the phase patterns look for, command output between them and a
+short 40 file extraction. A captured log can be checked the same way
+with python -m install_station.progress LOG.
+"""
+import os
+from install_station.progress import ProgressEngine, phases, replay
+
+fixture = os.path.join(os.path.dirname(__file__), 'fixtures', 'pc-sysinstall-sample.log')
+
+
+def sample_states():
+    with open(fixture) as log:
+        return replay(log)
+
+
+def test_replay_goes_through_every_phase_in_order():
+    names = [phase.name for phase in phases]
+    indexes = [names.index(state.phase) for state in sample_states() if state.phase]
+    assert indexes == sorted(indexes)
+    assert sorted(set(indexes)) == list(range(len(phases)))
+
+
+def test_replay_fraction_only_grows_and_ends_at_one():
+    states = sample_states()
+    fractions = [state.fraction for state in states]
+    assert fractions == sorted(fractions)
+    assert fractions[-1] == 1.0
+    assert fractions[-2] < 1.0
+    assert states[-1].text == 'Installation finished!'
+
+
+def test_replay_counts_the_copied_files():
+    states = sample_states()
+    copied = [state for state in states if state.text.startswith('x ')]
+    assert {state.phase for state in copied} == {'Copying the system'}
+    # INSTALLCOUNT announced 40 files, half of the 76% copy share is done.
+    assert abs(copied[19].fraction - (12 + 76 * 20 / 40) / 100) < 1e-9
+
+
+def test_earlier_phase_keeps_the_current_one():
+    engine = ProgressEngine()
+    engine.feed('Running: gpart bootcode -b /boot/pmbr ada0\n')
+    engine.feed('Running: efibootmgr --create --activate\n')
+    state = engine.feed('Running: gpart modify -i 1 -l efiboot0 ada0\n')
+    assert state.phase == 'Installing boot loader'
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Time the Install Station disk flow against simulated disks.
+
+Runs the probe, an automatic layout on every disk, create_cfg and the
+destructive partition operations for fleets of simulated disks, using
+the stand-in tools of simdisk.py, and prints the wall time of each phase
+and how long the partition operations waited for device nodes.
+After applying, the disks are probed again to check that every partition
+the plan adds exists where the plan put it.
+
+Example:
+    tools/bench_install_flow.py --disks 1,4,16,64,256
+    tools/bench_install_flow.py --disks 64 --backend geom --phases probe
+    tools/bench_install_flow.py --disks 1,5 --latency 0.05 --plan-workers 1
+    tools/bench_install_flow.py --disks 16 --helper
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from time import monotonic
+
+tools_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(tools_dir))
+
+from install_station.create_cfg import Configuration  # noqa: E402
+from install_station.data import InstallationData  # noqa: E402
+from install_station.devfs import DeviceWait  # noqa: E402
+from install_station.facts import SessionFacts  # noqa: E402
+from install_station import disk_plan  # noqa: E402
+from install_station.disk_plan import compile_plan, execute_plan  # noqa: E402
+from install_station.helper import PrivilegedHelper  # noqa: E402
+from install_station.partition import (  # noqa: E402
+    AutoFreeSpace,
+    DeletePartition,
+    DiskPartition
+)
+
+phases = ('probe', 'edit', 'config', 'apply')
+use_helper = False
+
+
+def simulate(workdir, disks, layout, bootmethod):
+    """Create the simulated disks and put the stand-in tools first in PATH."""
+    bin_dir = os.path.join(workdir, 'bin')
+    state = os.path.join(workdir, 'state.json')
+    simdisk = os.path.join(tools_dir, 'simdisk.py')
+    subprocess.run([sys.executable, simdisk, 'install-bin', bin_dir], check=True)
+    os.environ['SIMDISK_DEVFS'] = os.path.join(workdir, 'dev')
+    subprocess.run([
+        sys.executable, simdisk, 'init', state, '--disks', str(disks),
+        '--layout', layout, '--bootmethod', bootmethod
+    ], check=True)
+    os.environ['SIMDISK_STATE'] = state
+    DeviceWait.devfs = os.environ['SIMDISK_DEVFS']
+    if not os.environ['PATH'].startswith(f'{bin_dir}:'):
+        os.environ['PATH'] = f"{bin_dir}:{os.environ['PATH']}"
+
+
+def probe():
+    """Probe all disks from scratch."""
+    DiskPartition.invalidate_cache()
+    DiskPartition.create_partition_database()
+
+
+def edit():
+    """Free every disk and lay it out automatically, as the custom page does."""
+    for disk_index, (disk, disk_info) in enumerate(DiskPartition.disk_database.items()):
+        if disk_info.scheme is None:
+            DiskPartition.set_disk_scheme('GPT', disk)
+        table = disk_info.partitions
+        for name in [entry.name for entry in table.entries if not entry.is_free]:
+            DeletePartition(name, [disk_index, table.index(name)])
+        position = next(
+            position for position, entry in enumerate(table.entries) if entry.is_free
+        )
+        fs = 'ZFS' if disk_info.scheme == 'GPT' else 'UFS'
+        AutoFreeSpace([disk_index, position], 0, fs, False, disk, disk_info.scheme)
+
+
+def config():
+    """Write the installation configuration."""
+    InstallationData.boot = 'none'
+    Configuration.create_cfg()
+
+
+def apply():
+    """Run the destructive operations as read_output does."""
+    if use_helper:
+        PrivilegedHelper.start()
+    try:
+        execute_plan()
+    finally:
+        PrivilegedHelper.stop()
+
+
+def verify():
+    """Check the created partitions against the planned gpart add commands.
+
+    Returns:
+        list: Partitions missing or misplaced after apply
+    """
+    expected = {}
+    for plan in compile_plan():
+        for step in plan.steps:
+            command = step.command
+            if command[:2] != ['gpart', 'add']:
+                continue
+            value = dict(zip(command[2:-1:2], command[3:-1:2]))
+            kind = 's' if value['-t'] == 'freebsd' else 'p'
+            expected[f"{plan.disk}{kind}{value['-i']}"] = (
+                int(value['-s']), int(value['-b'])
+            )
+    DiskPartition.invalidate_cache()
+    database = DiskPartition.scan_database()
+    found = {}
+    for disk_info in database.values():
+        for entry in disk_info.partitions.entries:
+            found[entry.name] = (entry.size, entry.start)
+    return [name for name, place in expected.items() if found.get(name) != place]
+
+
+def run(disks, args):
+    """Run the selected phases on a fresh fleet and time them."""
+    with tempfile.TemporaryDirectory() as workdir:
+        simulate(workdir, disks, args.layout, args.bootmethod)
+        # Every run has a new fleet of disks.
+        SessionFacts.invalidate()
+        InstallationData.reset()
+        DiskPartition.probe_backend = args.backend
+        DiskPartition.disk_database = {}
+        DeviceWait.reset_log()
+        timings = {}
+        for name in phases:
+            if name not in args.phases:
+                continue
+            start = monotonic()
+            globals()[name]()
+            timings[name] = monotonic() - start
+        errors = verify() if 'apply' in args.phases else []
+    return timings, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--disks', default='1,4,16,64,256',
+                        help='comma separated fleet sizes')
+    parser.add_argument('--layout', choices=('mixed', 'gpt', 'mbr', 'empty'),
+                        default='mixed')
+    parser.add_argument('--bootmethod', choices=('UEFI', 'BIOS'), default='UEFI')
+    parser.add_argument('--backend', choices=('gpart', 'geom'), default='gpart',
+                        help='DiskPartition.probe_backend')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds each simulated tool takes (SIMDISK_LATENCY)')
+    parser.add_argument('--plan-workers', type=int, default=disk_plan.plan_workers,
+                        help='disks changed concurrently by the apply phase')
+    parser.add_argument('--helper', action='store_true',
+                        help='run the privileged commands in the privileged helper')
+    parser.add_argument('--phases', default=','.join(phases),
+                        help='comma separated phases, each needs the ones before')
+    args = parser.parse_args()
+    args.phases = args.phases.split(',')
+    os.environ['SIMDISK_LATENCY'] = str(args.latency)
+    disk_plan.plan_workers = args.plan_workers
+    if args.helper:
+        global use_helper
+        use_helper = True
+    print(f"{'disks':>6}" + ''.join(f'{name:>10}' for name in args.phases)
+          + f"{'total':>10}")
+    failed = False
+    for disks in [int(count) for count in args.disks.split(',')]:
+        timings, errors = run(disks, args)
+        print(f'{disks:>6}' + ''.join(f'{timings[name]:>10.3f}' for name in args.phases)
+              + f'{sum(timings.values()):>10.3f}')
+        if DeviceWait.log:
+            waited = sum(seconds for _device, _present, seconds in DeviceWait.log)
+            print(f'       {len(DeviceWait.log)} device waits, {waited:.3f}s waiting')
+        if errors:
+            failed = True
+            print(f"       not created as planned: {' '.join(errors)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""
+Simulated FreeBSD disk tools for Install Station performance tests.
+
+One script stands in for gpart, sysctl, diskinfo, zpool, newfs_msdos, dd
+and sudo, picked by the name it is invoked as. All of them read and
+change a JSON disk model, so the whole install flow (probe, edit,
+Configuration.create_cfg, delete/destroy/add partitions) can run
+unprivileged on any system.
+
+Usage:
+    simdisk.py init STATE --disks N [--size-gb G] [--layout mixed|gpt|mbr|empty]
+    simdisk.py install-bin DIRECTORY
+    PATH=DIRECTORY:$PATH SIMDISK_STATE=STATE <installer code>
+
+With SIMDISK_DEVFS=<directory>, an empty file is kept in the directory for
+every provider, like the device nodes of /dev. Point
+INSTALL_STATION_DEVFS at it so the installer waits on it.
+
+With SIMDISK_LATENCY=<seconds>, every simulated tool but sudo waits that
+long before doing its work, without holding the state lock, like a disk
+busy with I/O. Commands on different disks overlap as they would on
+real hardware.
+
+The state file holds:
+    bootmethod: 'UEFI' or 'BIOS'
+    disks: {name: {sectorsize, mediasize, stripesize, descr, ident,
+                   rotation_rate}}
+    geoms: {geom name: {scheme, first, last,
+                        entries: [{index, start, end, type, filesystem}]}}
+    pending: {geom name: {geom name: table}} committed tables of the geoms
+        changed with gpart -f x, restored by gpart undo
+"""
+import argparse
+import copy
+import fcntl
+import json
+import os
+import re
+import sys
+import time
+import xml.etree.ElementTree as ElementTree
+from contextlib import contextmanager
+
+tools = ('gpart', 'sysctl', 'diskinfo', 'zpool', 'newfs_msdos', 'dd', 'sudo')
+bsd_letters = 'abcdefghijklmnopqrst'
+max_entries = {'GPT': 128, 'MBR': 4, 'BSD': 20}
+
+
+class SimError(Exception):
+    """Error reported by a simulated tool, printed as 'tool: message'."""
+
+
+@contextmanager
+def locked_state(write):
+    """Load the disk model under a file lock and save it back if asked."""
+    path = os.environ.get('SIMDISK_STATE')
+    if not path:
+        raise SimError('SIMDISK_STATE is not set')
+    with open(f'{path}.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if write else fcntl.LOCK_SH)
+        with open(path) as state_file:
+            state = json.load(state_file)
+        yield state
+        if write:
+            with open(f'{path}.tmp', 'w') as state_file:
+                json.dump(state, state_file)
+            os.replace(f'{path}.tmp', path)
+            sync_devfs(state)
+
+
+def sync_devfs(state):
+    """Mirror the providers as files in SIMDISK_DEVFS, if it is set."""
+    devfs = os.environ.get('SIMDISK_DEVFS')
+    if not devfs:
+        return
+    os.makedirs(devfs, exist_ok=True)
+    nodes = set(providers(state))
+    for name in set(os.listdir(devfs)) - nodes:
+        os.remove(os.path.join(devfs, name))
+    for name in nodes - set(os.listdir(devfs)):
+        open(os.path.join(devfs, name), 'w').close()
+
+
+def human_size(size):
+    """Format a byte count like gpart does."""
+    for unit in 'BKMGTP':
+        if size < 1024 or unit == 'P':
+            return f'{size:.0f}{unit}' if size == int(size) else f'{size:.1f}{unit}'
+        size /= 1024
+
+
+def entry_name(geom, table, index):
+    """Name of the provider of a partition table entry."""
+    if table['scheme'] == 'GPT':
+        return f'{geom}p{index}'
+    if table['scheme'] == 'MBR':
+        return f'{geom}s{index}'
+    return f'{geom}{bsd_letters[index - 1]}'
+
+
+def providers(state):
+    """Map every provider name to (size in sectors, sector size, entry)."""
+    found = {}
+    for name, disk in state['disks'].items():
+        found[name] = (disk['mediasize'] // disk['sectorsize'], disk['sectorsize'], None)
+    for geom in sorted(state['geoms'], key=len):
+        table = state['geoms'][geom]
+        if geom not in found:
+            continue
+        sectorsize = found[geom][1]
+        for entry in table['entries']:
+            found[entry_name(geom, table, entry['index'])] = (
+                entry['end'] - entry['start'] + 1, sectorsize, entry
+            )
+    return found
+
+
+def device(state, name):
+    """Resolve a device argument (ada0, /dev/ada0p1) to a provider."""
+    name = name.removeprefix('/dev/')
+    found = providers(state)
+    if name not in found:
+        raise SimError(f'{name}: No such file or directory')
+    return name, found[name]
+
+
+def geom_family(state, geom):
+    """Names of a geom and of the tables nested in its entries."""
+    pattern = re.compile(rf'^{re.escape(geom)}([ps]\d+)?$')
+    return [name for name in state['geoms'] if pattern.match(name)]
+
+
+def parse_size(value, sectorsize):
+    """Parse a gpart size or offset: sectors, or bytes with a K/M/G/T suffix."""
+    match = re.fullmatch(r'(\d+)([kKmMgGtT]?)[bB]?', value)
+    if not match:
+        raise SimError(f'Invalid value: {value}')
+    number = int(match.group(1))
+    if not match.group(2):
+        return number
+    return number * 1024 ** ' KMGT'.index(match.group(2).upper()) // sectorsize
+
+
+def free_segments(table):
+    """List (start, end) of the free space of a table."""
+    segments = []
+    next_free = table['first']
+    for entry in sorted(table['entries'], key=lambda entry: entry['start']):
+        if entry['start'] > next_free:
+            segments.append((next_free, entry['start'] - 1))
+        next_free = entry['end'] + 1
+    if table['last'] >= next_free:
+        segments.append((next_free, table['last']))
+    return segments
+
+
+def begin_change(state, geom, flags):
+    """Keep the committed tables of a geom before a change made with -f x."""
+    if 'x' in flags and geom not in state['pending']:
+        state['pending'][geom] = {
+            name: copy.deepcopy(state['geoms'][name])
+            for name in geom_family(state, geom)
+        }
+
+
+def end_change(state, geom, flags):
+    """Commit a change made without -f x right away."""
+    if 'x' not in flags:
+        state['pending'].pop(geom, None)
+
+
+def gpart_show(state, args):
+    for geom in args.geom or sorted(state['geoms']):
+        table = state['geoms'].get(geom)
+        if table is None:
+            raise SimError(f'No such geom: {geom}.')
+        sectorsize = device(state, geom)[1][1]
+        size = table['last'] - table['first'] + 1
+        print(f"=>{table['first']:>11}{size:>11}  {geom}  {table['scheme']}"
+              f"  ({human_size(size * sectorsize)})")
+        rows = [
+            (entry['start'], entry['end'] - entry['start'] + 1,
+             entry_name(geom, table, entry['index']), entry['type'])
+            for entry in table['entries']
+        ]
+        rows.extend(
+            (start, end - start + 1, '-', 'free') for start, end in free_segments(table)
+        )
+        for start, size, name, entry_type in sorted(rows):
+            if entry_type == 'free':
+                line = f'{start:>13}{size:>11}        - free -'
+            else:
+                line = f'{start:>13}{size:>11}  {name}  {entry_type}'
+            print(f'{line}  ({human_size(size * sectorsize)})')
+        print()
+
+
+def gpart_create(state, args):
+    geom, (size, _sectorsize, _entry) = device(state, args.geom)
+    if geom in state['geoms']:
+        raise SimError(f'Device busy: {geom} already has a partition table')
+    scheme = args.s.upper()
+    if scheme == 'GPT':
+        first, last = 40, size - 34
+    elif scheme == 'MBR':
+        first, last = 63, size - 1
+    elif scheme == 'BSD':
+        first, last = 16, size - 1
+    else:
+        raise SimError(f'scheme {args.s}: Invalid argument')
+    begin_change(state, geom, args.f)
+    state['geoms'][geom] = {'scheme': scheme, 'first': first, 'last': last, 'entries': []}
+    end_change(state, geom, args.f)
+    print(f'{geom} created')
+
+
+def gpart_destroy(state, args):
+    geom = args.geom.removeprefix('/dev/')
+    table = state['geoms'].get(geom)
+    if table is None:
+        raise SimError(f'No such geom: {geom}.')
+    if table['entries'] and not args.F:
+        raise SimError('Device busy')
+    begin_change(state, geom, args.f)
+    for name in geom_family(state, geom):
+        del state['geoms'][name]
+    end_change(state, geom, args.f)
+    print(f'{geom} destroyed')
+
+
+def gpart_add(state, args):
+    geom = args.geom.removeprefix('/dev/')
+    table = state['geoms'].get(geom)
+    if table is None:
+        raise SimError(f'No such geom: {geom}.')
+    sectorsize = device(state, geom)[1][1]
+    align = max(1, parse_size(args.a, sectorsize)) if args.a else 1
+    used = {entry['index'] for entry in table['entries']}
+    index = int(args.i) if args.i else min(
+        i for i in range(1, max_entries[table['scheme']] + 2) if i not in used
+    )
+    if index in used or index > max_entries[table['scheme']]:
+        raise SimError(f'index {index}: Invalid argument')
+    size = parse_size(args.s, sectorsize) if args.s else None
+    if size is not None and align > 1:
+        size = size // align * align
+    # Like gpart, without -b the first free segment the entry fits in is used.
+    for free_start, free_end in free_segments(table):
+        start = parse_size(args.b, sectorsize) if args.b else free_start
+        start = -(-start // align) * align
+        if not free_start <= start <= free_end:
+            continue
+        end = free_end if size is None else start + size - 1
+        if free_end >= end >= start:
+            break
+        if args.b:
+            raise SimError('No space left on device')
+    else:
+        raise SimError('No space left on device')
+    begin_change(state, geom, args.f)
+    table['entries'].append({
+        'index': index, 'start': start, 'end': end, 'type': args.t, 'filesystem': None
+    })
+    table['entries'].sort(key=lambda entry: entry['start'])
+    end_change(state, geom, args.f)
+    print(f'{entry_name(geom, table, index)} added')
+
+
+def gpart_delete(state, args):
+    geom = args.geom.removeprefix('/dev/')
+    table = state['geoms'].get(geom)
+    if table is None:
+        raise SimError(f'No such geom: {geom}.')
+    index = int(args.i)
+    entries = [entry for entry in table['entries'] if entry['index'] == index]
+    if not entries:
+        raise SimError(f'index {index}: Invalid argument')
+    begin_change(state, geom, args.f)
+    table['entries'].remove(entries[0])
+    state['geoms'].pop(entry_name(geom, table, index), None)
+    end_change(state, geom, args.f)
+    print(f'{entry_name(geom, table, index)} deleted')
+
+
+def gpart_commit(state, args):
+    geom = args.geom.removeprefix('/dev/')
+    if geom not in state['geoms'] and geom not in state['pending']:
+        raise SimError(f'No such geom: {geom}.')
+    state['pending'].pop(geom, None)
+
+
+def gpart_undo(state, args):
+    geom = args.geom.removeprefix('/dev/')
+    committed = state['pending'].pop(geom, None)
+    if committed is None:
+        return
+    for name in geom_family(state, geom):
+        del state['geoms'][name]
+    state['geoms'].update(committed)
+
+
+def gpart(argv):
+    parser = argparse.ArgumentParser(prog='gpart')
+    commands = parser.add_subparsers(dest='command', required=True)
+    show = commands.add_parser('show')
+    show.add_argument('-p', action='store_true')
+    show.add_argument('-l', action='store_true')
+    show.add_argument('geom', nargs='*')
+    create = commands.add_parser('create')
+    create.add_argument('-s', required=True)
+    destroy = commands.add_parser('destroy')
+    destroy.add_argument('-F', action='store_true')
+    add = commands.add_parser('add')
+    add.add_argument('-t', required=True)
+    for option in ('-a', '-b', '-s', '-i', '-l'):
+        add.add_argument(option)
+    delete = commands.add_parser('delete')
+    delete.add_argument('-i', required=True)
+    for command in (create, destroy, add, delete):
+        command.add_argument('-f', default='C')
+    for command in (create, destroy, add, delete,
+                    commands.add_parser('commit'), commands.add_parser('undo')):
+        command.add_argument('geom')
+    args = parser.parse_args(argv)
+    with locked_state(write=args.command != 'show') as state:
+        state.setdefault('pending', {})
+        globals()[f'gpart_{args.command}'](state, args)
+
+
+def confxml(state):
+    """Render the GEOM tree as kern.geom.confxml does."""
+    mesh = ElementTree.Element('mesh')
+    found = providers(state)
+    disk_class = ElementTree.SubElement(mesh, 'class', id='DISK')
+    ElementTree.SubElement(disk_class, 'name').text = 'DISK'
+    for name, disk in state['disks'].items():
+        geom = ElementTree.SubElement(disk_class, 'geom', id=f'disk-{name}')
+        ElementTree.SubElement(geom, 'name').text = name
+        provider = ElementTree.SubElement(geom, 'provider', id=f'prov-{name}')
+        for tag in ('name', 'mediasize', 'sectorsize', 'stripesize'):
+            value = name if tag == 'name' else disk[tag]
+            ElementTree.SubElement(provider, tag).text = str(value)
+        config = ElementTree.SubElement(provider, 'config')
+        ElementTree.SubElement(config, 'descr').text = disk['descr']
+        ElementTree.SubElement(config, 'ident').text = disk['ident']
+        ElementTree.SubElement(config, 'rotationrate').text = str(disk['rotation_rate'])
+    part_class = ElementTree.SubElement(mesh, 'class', id='PART')
+    ElementTree.SubElement(part_class, 'name').text = 'PART'
+    for name, table in state['geoms'].items():
+        if name not in found:
+            continue
+        sectorsize = found[name][1]
+        geom = ElementTree.SubElement(part_class, 'geom', id=f'part-{name}')
+        ElementTree.SubElement(geom, 'name').text = name
+        config = ElementTree.SubElement(geom, 'config')
+        for tag in ('scheme', 'first', 'last'):
+            ElementTree.SubElement(config, tag).text = str(table[tag])
+        consumer = ElementTree.SubElement(geom, 'consumer', id=f'cons-{name}')
+        ElementTree.SubElement(consumer, 'provider', ref=f'prov-{name}')
+        for entry in table['entries']:
+            entry_provider = entry_name(name, table, entry['index'])
+            provider = ElementTree.SubElement(geom, 'provider', id=f'prov-{entry_provider}')
+            ElementTree.SubElement(provider, 'name').text = entry_provider
+            size = entry['end'] - entry['start'] + 1
+            ElementTree.SubElement(provider, 'mediasize').text = str(size * sectorsize)
+            ElementTree.SubElement(provider, 'sectorsize').text = str(sectorsize)
+            ElementTree.SubElement(provider, 'stripesize').text = '0'
+            provider_config = ElementTree.SubElement(provider, 'config')
+            for tag in ('start', 'end', 'type', 'index'):
+                ElementTree.SubElement(provider_config, tag).text = str(entry[tag])
+    return ElementTree.tostring(mesh, encoding='unicode')
+
+
+def sysctl(argv):
+    names = [arg for arg in argv if not arg.startswith('-')]
+    with locked_state(write=False) as state:
+        values = {
+            'kern.disks': ' '.join(sorted(state['disks'], reverse=True)),
+            'machdep.bootmethod': state['bootmethod'],
+        }
+        for name in names:
+            if name == 'kern.geom.confxml':
+                print(confxml(state))
+            elif name in values:
+                print(values[name] if '-n' in argv else f'{name}: {values[name]}')
+            else:
+                raise SimError(f'unknown oid \'{name}\'')
+
+
+def diskinfo(argv):
+    names = [arg for arg in argv if not arg.startswith('-')]
+    with locked_state(write=False) as state:
+        for name in names:
+            name, (sectors, sectorsize, _entry) = device(state, name)
+            disk = state['disks'].get(name, {})
+            mediasize = sectors * sectorsize
+            print(name)
+            print(f'\t{sectorsize}\t# sectorsize')
+            print(f'\t{mediasize}\t# mediasize in bytes ({human_size(mediasize)})')
+            print(f'\t{sectors}\t# mediasize in sectors')
+            print(f"\t{disk.get('stripesize', 0)}\t# stripesize")
+            print('\t0\t# stripeoffset')
+            print(f'\t{sectors // 1008}\t# Cylinders according to firmware.')
+            print('\t16\t# Heads according to firmware.')
+            print('\t63\t# Sectors according to firmware.')
+            print(f"\t{disk.get('descr', '')}\t# Disk descr.")
+            print(f"\t{disk.get('ident', '')}\t# Disk ident.")
+            print(f"\t{disk.get('rotation_rate', 0)}\t# Rotation rate in RPM")
+            print()
+
+
+def zpool(argv):
+    if not argv or argv[0] != 'labelclear':
+        raise SimError(f"unsupported command: {' '.join(argv)}")
+    with locked_state(write=True) as state:
+        _name, (_sectors, _sectorsize, entry) = device(state, argv[-1])
+        if entry is not None:
+            entry['filesystem'] = None
+
+
+def newfs_msdos(argv):
+    with locked_state(write=True) as state:
+        _name, (_sectors, _sectorsize, entry) = device(state, argv[-1])
+        if entry is not None:
+            entry['filesystem'] = 'msdosfs'
+
+
+def dd(argv):
+    operands = dict(arg.split('=', 1) for arg in argv if '=' in arg)
+    with locked_state(write=True) as state:
+        name, _provider = device(state, operands.get('of', ''))
+        # Zeroing the head of a disk wipes its primary partition table.
+        if name in state['disks']:
+            for geom in geom_family(state, name):
+                del state['geoms'][geom]
+
+
+def sudo(argv):
+    os.execvp(argv[0], argv)
+
+
+def init(argv):
+    parser = argparse.ArgumentParser(prog='simdisk.py init')
+    parser.add_argument('state')
+    parser.add_argument('--disks', type=int, default=1)
+    parser.add_argument('--size-gb', type=int, default=64)
+    parser.add_argument('--sectorsize', type=int, default=512)
+    parser.add_argument('--layout', choices=('mixed', 'gpt', 'mbr', 'empty'),
+                        default='mixed')
+    parser.add_argument('--bootmethod', choices=('UEFI', 'BIOS'), default='UEFI')
+    args = parser.parse_args(argv)
+    state = {'bootmethod': args.bootmethod, 'disks': {}, 'geoms': {}, 'pending': {}}
+    mib = 1048576 // args.sectorsize
+    for number in range(args.disks):
+        name = f'ada{number}'
+        sectors = args.size_gb * 1024 * mib
+        state['disks'][name] = {
+            'sectorsize': args.sectorsize,
+            'mediasize': sectors * args.sectorsize,
+            'stripesize': 4096,
+            'descr': f'SIMDISK {args.size_gb}G',
+            'ident': f'SIM{number:06d}',
+            'rotation_rate': 0,
+        }
+        layout = args.layout
+        if layout == 'mixed':
+            layout = ('gpt', 'mbr', 'empty')[number % 3]
+        if layout == 'gpt':
+            half = sectors // 2 // mib * mib
+            state['geoms'][name] = {
+                'scheme': 'GPT', 'first': 40, 'last': sectors - 34, 'entries': [
+                    {'index': 1, 'start': 40, 'end': 409639, 'type': 'efi',
+                     'filesystem': 'msdosfs'},
+                    {'index': 2, 'start': 409640, 'end': half - 1,
+                     'type': 'freebsd-zfs', 'filesystem': None},
+                ]
+            }
+        elif layout == 'mbr':
+            half = sectors // 2 // mib * mib
+            state['geoms'][name] = {
+                'scheme': 'MBR', 'first': 63, 'last': sectors - 1, 'entries': [
+                    {'index': 1, 'start': 63, 'end': half - 1, 'type': 'freebsd',
+                     'filesystem': None},
+                ]
+            }
+            swap = 2048 * mib
+            state['geoms'][f'{name}s1'] = {
+                'scheme': 'BSD', 'first': 16, 'last': half - 64, 'entries': [
+                    {'index': 1, 'start': 16, 'end': half - 64 - swap,
+                     'type': 'freebsd-ufs', 'filesystem': None},
+                    {'index': 2, 'start': half - 63 - swap, 'end': half - 64,
+                     'type': 'freebsd-swap', 'filesystem': None},
+                ]
+            }
+    with open(args.state, 'w') as state_file:
+        json.dump(state, state_file)
+    sync_devfs(state)
+
+
+def install_bin(argv):
+    directory = argv[0]
+    os.makedirs(directory, exist_ok=True)
+    for tool in tools:
+        link = os.path.join(directory, tool)
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(os.path.abspath(__file__), link)
+
+
+def main():
+    tool = os.path.basename(sys.argv[0])
+    argv = sys.argv[1:]
+    if tool not in tools:
+        commands = {'init': init, 'install-bin': install_bin}
+        if not argv or argv[0] not in commands:
+            sys.exit(__doc__)
+        return commands[argv[0]](argv[1:])
+    if tool != 'sudo':
+        time.sleep(float(os.environ.get('SIMDISK_LATENCY', 0)))
+    try:
+        globals()[tool](argv)
+    except SimError as e:
+        print(f'{tool}: {e}', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()